@@ -0,0 +1,252 @@
+"""Times the hot paths of the simulator and writes the results as JSON.
+
+Run from the root folder of the repository:
+
+    python -m benchmarks.hot_paths -o bench.json
+
+Every benchmark is repeated and the fastest time is kept. Compare two result files with
+--compare to catch regressions, e.g. before and after a change:
+
+    python -m benchmarks.hot_paths --compare before.json bench.json
+"""
+from datetime import datetime, timezone
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+from benchmarks.latency_constraints import random_instance
+from scheduler.milp_sched import place_servers_carbon_greedy, sched_reqs_carbon_greedy
+from scheduler.parser import parse_arguments
+from scheduler.plot import Plot
+from scheduler.region import Region, load_regions
+from scheduler.server import ServerManager
+
+REGION_COUNTS = (4, 10, 50, 200)
+FLEET_SIZES = (1_000, 10_000, 100_000)
+# Region kinds with their number of regions and a date covered by their traces
+REGION_KINDS = {"europe": "2021-10-22", "north_america_old": "2022-04-25", "north_america": "2022-08-05"}
+RUN_ARGV = ["-p", "europe", "-t", "24", "-r", "10", "-d", "2021-10-22", "-m", "200", "-l", "20", "--no-plot"]
+MAX_LATENCY = 30
+
+
+def best_of(function, repeat):
+    """
+    Args:
+        function: Function to time, called without arguments
+        repeat: Number of calls
+
+    Returns:
+        Fastest time of a call in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def synthetic_manager(n_regions):
+    """ServerManager over n_regions regions without loading any data
+
+    Args:
+        n_regions: Number of regions
+
+    Returns:
+        ServerManager object
+    """
+    conf = parse_arguments([])
+    regions = [Region(f"region_{i}", (0, 0), 0, None) for i in range(n_regions)]
+    return ServerManager(conf, regions=regions)
+
+
+def bench_place_servers(region_counts, repeat):
+    results = []
+    for n_regions in region_counts:
+        request_rates, capacities, latencies, carbon_intensities, max_servers = random_instance(n_regions)
+        seconds = best_of(
+            lambda: place_servers_carbon_greedy(
+                request_rates, capacities, latencies, carbon_intensities, max_servers, MAX_LATENCY
+            ),
+            repeat,
+        )
+        results.append({"name": "place_servers_carbon_greedy", "params": {"regions": n_regions}, "seconds": seconds})
+    return results
+
+
+def bench_sched_reqs(region_counts, repeat):
+    results = []
+    for n_regions in region_counts:
+        request_rates, capacities, latencies, carbon_intensities, max_servers = random_instance(n_regions)
+        servers, _, _ = place_servers_carbon_greedy(
+            request_rates, capacities, latencies, carbon_intensities, max_servers, MAX_LATENCY
+        )
+        seconds = best_of(
+            lambda: sched_reqs_carbon_greedy(
+                request_rates, capacities, latencies, carbon_intensities, servers, MAX_LATENCY
+            ),
+            repeat,
+        )
+        results.append({"name": "sched_reqs_carbon_greedy", "params": {"regions": n_regions}, "seconds": seconds})
+    return results
+
+
+def bench_server_manager(region_counts, fleet_sizes, repeat):
+    results = []
+    rng = np.random.default_rng(0)
+    for n_regions in region_counts:
+        for fleet_size in fleet_sizes:
+            server_manager = synthetic_manager(n_regions)
+            # Two placements of the same fleet size, moving between them shuffles most servers
+            placements = [rng.multinomial(fleet_size, np.full(n_regions, 1 / n_regions)) for _ in range(2)]
+            placement = iter(placements * repeat)
+            params = {"regions": n_regions, "servers": fleet_size}
+            seconds = best_of(lambda: server_manager.move(next(placement)), repeat)
+            results.append({"name": "ServerManager.move", "params": params, "seconds": seconds})
+
+            # Every region gets 10% more requests than its servers can handle
+            capacity = server_manager.capacity_per_region()
+            requests_per_region = np.diag((capacity * 1.1).astype(np.int64))
+
+            def send():
+                server_manager.send(requests_per_region)
+                server_manager.reset()
+
+            results.append({"name": "ServerManager.send", "params": params, "seconds": best_of(send, repeat)})
+    return results
+
+
+def bench_plot_add(repeat, rows=1000):
+    results = []
+    for kind, date in REGION_KINDS.items():
+        conf = parse_arguments(["-p", kind, "-d", date, "-t", "1"])
+        server_manager = ServerManager(conf)
+        n_regions = len(server_manager.regions)
+        server_manager.move([1] * n_regions)
+        requests_per_region = np.full((n_regions, n_regions), 100)
+        dropped = np.zeros(n_regions)
+        carbon_intensity = server_manager.carbon_intensities[:, 0]
+
+        def add():
+            plot = Plot(conf)
+            for row in range(rows):
+                plot.add(
+                    server_manager, server_manager.latencies, carbon_intensity, requests_per_region, dropped, row, 0, 6
+                )
+
+        seconds = best_of(add, repeat) / rows
+        results.append({"name": "Plot.add", "params": {"region_kind": kind, "regions": n_regions}, "seconds": seconds})
+    return results
+
+
+def bench_load_regions(repeat):
+    results = []
+    for kind, date in REGION_KINDS.items():
+        conf = parse_arguments(["-p", kind, "-d", date])
+        # The first load in a process reads the traces, later loads only slice them
+        cold = best_of(lambda: load_regions(conf), 1)
+        warm = best_of(lambda: load_regions(conf), repeat)
+        for cache, seconds in [("cold", cold), ("warm", warm)]:
+            results.append(
+                {"name": "load_regions", "params": {"region_kind": kind, "cache": cache}, "seconds": seconds}
+            )
+    return results
+
+
+def bench_full_run(repeat):
+    command = [sys.executable, "-m", "scheduler", *RUN_ARGV]
+    seconds = best_of(lambda: subprocess.run(command, check=True, capture_output=True), repeat)
+    return [{"name": "python -m scheduler", "params": {"argv": " ".join(RUN_ARGV)}, "seconds": seconds}]
+
+
+def run(region_counts=REGION_COUNTS, fleet_sizes=FLEET_SIZES, repeat=3):
+    """Runs every benchmark
+
+    Args:
+        region_counts: Number of regions of the synthetic instances. Defaults to REGION_COUNTS.
+        fleet_sizes: Number of servers for ServerManager.move/send. Defaults to FLEET_SIZES.
+        repeat: Number of repetitions of every benchmark. Defaults to 3.
+
+    Returns:
+        Dict with information about the machine and the list of results
+    """
+    results = []
+    results += bench_place_servers(region_counts, repeat)
+    results += bench_sched_reqs(region_counts, repeat)
+    results += bench_server_manager(region_counts, fleet_sizes, repeat)
+    # Before anything else loads the traces, so the first load is cold
+    results += bench_load_regions(repeat)
+    results += bench_plot_add(repeat)
+    results += bench_full_run(repeat)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "meta": {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "commit": commit,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(before, after, threshold=1.2):
+    """Ratio of the times of two result files
+
+    Args:
+        before: Results, see run()
+        after: Results, see run()
+        threshold: Ratio above which a benchmark counts as a regression. Defaults to 1.2.
+
+    Returns:
+        List of (name, params, ratio, regression)
+    """
+    key = lambda result: (result["name"], json.dumps(result["params"], sort_keys=True))
+    previous = {key(result): result["seconds"] for result in before["results"]}
+    rows = []
+    for result in after["results"]:
+        if key(result) in previous:
+            ratio = result["seconds"] / previous[key(result)]
+            rows.append((result["name"], result["params"], ratio, ratio > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the scheduler hot paths")
+    parser.add_argument("-o", "--output", type=str, help="Path of the JSON results. Defaults to stdout")
+    parser.add_argument("--repeat", type=int, help="Number of repetitions of every benchmark", default=3)
+    parser.add_argument("--regions", type=int, nargs="+", help="Region counts", default=list(REGION_COUNTS))
+    parser.add_argument("--servers", type=int, nargs="+", help="Fleet sizes", default=list(FLEET_SIZES))
+    parser.add_argument("--compare", type=str, nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        rows = compare(before, after)
+        for name, params, ratio, regression in rows:
+            print(f"{name:>30} {json.dumps(params):<50} {ratio:6.2f}x{'  REGRESSION' if regression else ''}")
+        sys.exit(int(any(regression for *_, regression in rows)))
+
+    results = json.dumps(run(args.regions, args.servers, args.repeat), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(results)
+    else:
+        print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Compares the CAP model with one latency constraint per region pair against the model
+that only builds variables for latency-feasible pairs.
+
+Run from the root folder of the repository:
+
+    python -m benchmarks.latency_constraints
+"""
+import time
+import numpy as np
+import pulp as plp
+
+from scheduler.latency import haversine_distances, latency_from_distance
+from scheduler.milp_sched import carbon_greedy_model, place_servers_carbon_greedy
+
+
+def random_instance(n_regions, seed=0):
+    """Random regions spread over North America with loads that fit the server pool
+
+    Args:
+        n_regions: Number of regions
+        seed: Seed for the random generator. Defaults to 0.
+
+    Returns:
+        request_rates, capacities, latencies, carbon_intensities, max_servers
+    """
+    rng = np.random.default_rng(seed)
+    locations = np.column_stack([rng.uniform(25, 50, n_regions), rng.uniform(-125, -70, n_regions)])
+    latencies = latency_from_distance(haversine_distances(locations))
+    request_rates = rng.integers(10_000, 100_000, n_regions)
+    capacities = [100_000] * n_regions
+    carbon_intensities = rng.uniform(20, 600, n_regions)
+    max_servers = int(np.ceil(request_rates.sum() / 100_000)) + n_regions
+    return request_rates, capacities, latencies, carbon_intensities, max_servers
+
+
+def dense_model(request_rates, capacities, latencies, carbon_intensities, max_servers, max_latency):
+    """The CAP formulation with a latency constraint x_ij * (L_ij - max_latency) <= 0 for every pair
+
+    Returns:
+        PuLP problem
+    """
+    opt_model = plp.LpProblem(name="model")
+    set_R = range(len(carbon_intensities))
+    x_vars = {(i, j): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"x_{i}_{j}") for i in set_R for j in set_R}
+    s_vars = {i: plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"s_{i}") for i in set_R}
+    opt_model += plp.lpSum(s_vars.values()) <= max_servers, "max_server"
+    for j in set_R:
+        opt_model += plp.lpSum(x_vars[i, j] for i in set_R) - s_vars[j] * capacities[j] <= 0, f"capacity_const{j}"
+    for i in set_R:
+        opt_model += plp.lpSum(x_vars[i, j] for j in set_R) == request_rates[i], f"sched_all_reqs_const{i}"
+    for i in set_R:
+        for j in set_R:
+            opt_model += x_vars[i, j] * (latencies[i][j] - max_latency) <= 0, f"latency_const{i}_{j}"
+    opt_model.setObjective(plp.lpSum(x_vars[i, j] * carbon_intensities[j] for i in set_R for j in set_R))
+    return opt_model
+
+
+def run(sizes=(4, 10, 25, 50, 100), max_latency=30):
+    """Builds and solves both formulations for every region count
+
+    Returns:
+        List of dicts, one per region count
+    """
+    results = []
+    for n_regions in sizes:
+        request_rates, capacities, latencies, carbon_intensities, max_servers = random_instance(n_regions)
+
+        start = time.perf_counter()
+        opt_model = dense_model(request_rates, capacities, latencies, carbon_intensities, max_servers, max_latency)
+        opt_model.solve(plp.PULP_CBC_CMD(msg=0))
+        dense_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, _, obj_val = place_servers_carbon_greedy(
+            request_rates, capacities, latencies, carbon_intensities, max_servers, max_latency
+        )
+        sparse_time = time.perf_counter() - start
+
+        sparse_model, _, _ = carbon_greedy_model(
+            request_rates, capacities, latencies, carbon_intensities, max_servers, max_latency
+        )
+        results.append(
+            {
+                "regions": n_regions,
+                "dense_variables": opt_model.numVariables(),
+                "dense_constraints": opt_model.numConstraints(),
+                "dense_seconds": dense_time,
+                "sparse_variables": sparse_model.numVariables(),
+                "sparse_constraints": sparse_model.numConstraints(),
+                "sparse_seconds": sparse_time,
+                "same_objective": bool(np.isclose(plp.value(opt_model.objective), obj_val)),
+            }
+        )
+    return results
+
+
+if __name__ == "__main__":
+    columns = [
+        "regions",
+        "dense_variables",
+        "dense_constraints",
+        "dense_seconds",
+        "sparse_variables",
+        "sparse_constraints",
+        "sparse_seconds",
+        "same_objective",
+    ]
+    print(" ".join(f"{column:>18}" for column in columns))
+    for result in run():
+        values = [f"{value:.3f}" if isinstance(value, float) else str(value) for value in map(result.get, columns)]
+        print(" ".join(f"{value:>18}" for value in values))
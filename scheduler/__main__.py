@@ -2,10 +2,16 @@ from scheduler.server import ServerManager
 from scheduler.request import RequestBatch
 from scheduler.parser import parse_arguments
 from scheduler.plot import Plot
-from scheduler.util import save_file, ui
+from scheduler.sink import StreamingPlot
+from scheduler.util import save_file, saved_path, ui
 from scheduler.milp_sched import schedule_requests, schedule_servers
+from scheduler.horizon import RollingHorizonProvisioner
+from scheduler.cache import get_solution_cache
+from scheduler.resolution import Timeline
+from scheduler.forecast import ForecastStage
 import sys
 import random
+import numpy as np
 
 
 def main():
@@ -20,33 +26,70 @@ def main():
     #     plot.plot()
     #     exit()
 
-    plot = Plot(conf)
-    server_manager = ServerManager(conf)
+    plot = simulate(conf)
 
+    if not conf.no_plot:
+        plot.plot(path=conf.plot_file)
+
+
+def simulate(conf, regions=None):
+    """Runs the simulation for one set of runtime configurations
+
+    Args:
+        conf: Runtime configurations
+        regions: Already loaded regions, e.g. shared between runs of a sweep. Defaults to None.
+
+    Returns:
+        Plot object holding the data gathered during the run
+    """
+    if conf.stream_every:
+        plot = StreamingPlot(conf, saved_path(conf, extension=conf.stream_format))
+    else:
+        plot = Plot(conf)
+    server_manager = ServerManager(conf, regions=regions)
     #Frequency of which to create more requests
     request_update_interval = 60 // conf.request_update_interval
+    timeline = Timeline(
+        server_manager.regions,
+        conf.timesteps + 1,
+        request_update_interval,
+        rate=conf.rate,
+        interpolate=conf.interpolate,
+    )
+    provisioner = None
+    if conf.horizon and conf.type_scheduler == "carbon":
+        provisioner = RollingHorizonProvisioner(conf, server_manager, timeline=timeline)
+    forecaster = None
+    if conf.forecast != "perfect":
+        forecaster = ForecastStage(conf, server_manager)
 
     for t in range(conf.timesteps + 1):
         # Move all the servers given the next hour's requests rates
-        move(conf, server_manager, t)
+        move(conf, server_manager, t, provisioner, timeline, forecaster)
 
         for i in range(request_update_interval):
             # get number of requests for timeframe
-            batches = build_batches(conf, server_manager, t, request_update_interval=request_update_interval)
+            batches = timeline.batches(server_manager.regions, t, i)
 
             # call the scheduling algorithm
             latency, carbon_intensity, requests_per_region = schedule_requests(
-                conf, batches, server_manager, t, request_update_interval, max_latency=conf.latency
+                conf,
+                batches,
+                server_manager,
+                t,
+                request_update_interval,
+                max_latency=conf.latency,
+                carbon_intensities=timeline.carbon_intensities[t, i],
             )
 
-            # send requests to servers
-            server_manager.send(requests_per_region)
-
-            # dropped requests
-            dropped_requests_per_region = [0] * len(batches)
-            if len(server_manager.servers) == 0:
-                for i in range(len(batches)):
-                    dropped_requests_per_region[i] = batches[i].load
+            # send requests to servers, requests that do not fit on the servers of a region are dropped
+            served_requests_per_region, dropped_requests_per_region = server_manager.send(
+                requests_per_region, request_update_interval
+            )
+            # Servers placed for forecasts may be too few, the CAS then leaves requests unallocated
+            unscheduled_requests_per_region = np.array([batch.load for batch in batches]) - np.sum(
+                requests_per_region, axis=1
+            )
 
             # save data to plot object
             plot.add(
@@ -58,6 +101,8 @@ def main():
                 t,
                 i,
                 request_update_interval,
+                served_requests_per_region=served_requests_per_region,
+                unscheduled_requests_per_region=unscheduled_requests_per_region,
             )
 
             # reset server utilization for every server before scheduling requests again
@@ -68,10 +113,16 @@ def main():
         if conf.verbose:
             ui(conf, t, requests_per_region, server_manager.servers, server_manager.servers_per_region())
 
-    if conf.save:
+    if conf.verbose:
+        print(f"Solution cache: {get_solution_cache(conf).stats()}")
+        print(f"Servers moved between regions: {server_manager.moved_servers}")
+
+    plot.close()
+    # Streamed results are already in /saved
+    if conf.save and not conf.stream_every:
         save_file(conf, plot)
 
-    plot.plot()
+    return plot
 
 
 def build_batches(conf, server_manager, t, request_update_interval=None):
@@ -100,18 +151,41 @@ def build_batches(conf, server_manager, t, request_update_interval=None):
     return batches
 
 
-def move(conf, server_manager, t):
-    """_summary_
+def move(conf, server_manager, t, provisioner=None, timeline=None, forecaster=None):
+    """Places the servers for the next hour and moves them between regions
 
     Args:
-        conf: _description_
-        server_manager: _description_
-        t: _description_
+        conf: Runtime configurations
+        server_manager: Central server manager object that i.e. holds regions
+        t: current timestep
+        provisioner: Plans over several hours if set, see RollingHorizonProvisioner. Defaults to None.
+        timeline: Requests of every interval, servers are placed for the busiest interval of the hour
+        when the traces are interpolated. Defaults to None.
+        forecaster: Places the servers for forecasts instead of the true traces if set, see ForecastStage.
+        Defaults to None.
     """
-    batches = build_batches(conf, server_manager, t)
-    servers_per_region = schedule_servers(
-        conf, batches, server_manager, t, max_latency=conf.latency, max_servers=conf.max_servers
-    )
+    if provisioner is not None:
+        servers_per_region = provisioner.servers_per_region(t)
+    else:
+        carbon_intensities = None
+        if forecaster is not None:
+            request_rates, carbon_intensities = forecaster.forecast(t)
+            if conf.rate:
+                request_rates[:] = conf.rate
+            batches = [RequestBatch("", rate, region) for rate, region in zip(request_rates, server_manager.regions)]
+        elif conf.interpolate and timeline is not None:
+            batches = timeline.peak_batches(server_manager.regions, t)
+        else:
+            batches = build_batches(conf, server_manager, t)
+        servers_per_region = schedule_servers(
+            conf,
+            batches,
+            server_manager,
+            t,
+            max_latency=conf.latency,
+            max_servers=conf.max_servers,
+            carbon_intensities=carbon_intensities,
+        )
     # move servers to regions according to scheduling estimation the next hour
     server_manager.move(servers_per_region)
 
@@ -0,0 +1,114 @@
+"""Vectorized engine for the carbon greedy and latency greedy schedulers.
+
+Without a cap on the number of servers, the CAP/CAS reduce to sending all requests of a region to its
+cheapest allowed region: the lowest carbon intensity within max_latency, or the lowest latency. That
+allocation has a closed form, so whole time series, and any number of scenarios stacked on leading
+axes, are evaluated as array operations instead of one MILP per step. For example
+
+    rates = rng.uniform(0.5, 1.5, (1000, 1, 1)) * server_manager.request_rates.T[:24]
+    result = evaluate(rates, server_manager.carbon_intensities.T[:24], server_manager.latencies, max_latency=50)
+
+evaluates 1000 scaled versions of the first 24 hours at once. Scenarios that need more servers than
+max_servers are flagged in result["feasible"], use the MILPs in milp_sched for those.
+"""
+import numpy as np
+
+
+def greedy_destinations(carbon_intensities, latencies, objective="carbon", max_latency=None):
+    """Cheapest allowed destination of every region
+
+    Args:
+        carbon_intensities: carbon_intensities[..., j] is the carbon intensity in region j
+        latencies: latencies[i][j] is the latency from region i to j
+        objective: What to minimize, carbon/latency. Defaults to "carbon".
+        max_latency: max_latency is the maximum latency allowed, only used when minimizing carbon.
+        Defaults to None.
+
+    Returns:
+        destinations[..., i] is the region the requests from region i are sent to, -1 if no region is allowed
+    """
+    assert objective in ["carbon", "latency"], objective
+    carbon_intensities = np.asarray(carbon_intensities, dtype=float)
+    latencies = np.asarray(latencies, dtype=float)
+    if objective == "latency":
+        destinations = np.argmin(latencies, axis=-1)
+        return np.broadcast_to(destinations, carbon_intensities.shape).copy()
+
+    mask = np.ones(latencies.shape, dtype=bool) if max_latency is None else latencies <= max_latency
+    # cost[..., i, j] is the carbon intensity of j if requests from i may be sent there
+    cost = np.where(mask, carbon_intensities[..., None, :], np.inf)
+    destinations = np.argmin(cost, axis=-1)
+    return np.where(mask.any(axis=-1), destinations, -1)
+
+
+def allocate(request_rates, destinations):
+    """
+    Args:
+        request_rates: request_rates[..., i] is the number of requests from region i
+        destinations: See greedy_destinations()
+
+    Returns:
+        x[..., i, j] is the number of requests from region i that are sent to region j
+    """
+    request_rates = np.asarray(request_rates)
+    n_regions = request_rates.shape[-1]
+    one_hot = destinations[..., None] == np.arange(n_regions)
+    return request_rates[..., None] * one_hot
+
+
+def evaluate(
+    request_rates,
+    carbon_intensities,
+    latencies,
+    objective="carbon",
+    max_latency=None,
+    server_capacity=100_000,
+    max_servers=None,
+):
+    """Schedules every step of every scenario at once
+
+    Args:
+        request_rates: request_rates[..., t, i] is the number of requests per hour from region i at hour t
+        carbon_intensities: carbon_intensities[..., t, i] is the carbon intensity in region i at hour t,
+        broadcast against request_rates
+        latencies: latencies[i][j] is the latency from region i to j
+        objective: What to minimize, carbon/latency. Defaults to "carbon".
+        max_latency: max_latency is the maximum latency allowed. Defaults to None.
+        server_capacity: The capacity of each server. Defaults to 100_000.
+        max_servers: Maximum pool of servers. Defaults to None, i.e. no limit.
+
+    Returns:
+        Dict of arrays over the leading axes and t:
+        requests[..., t, i, j], servers[..., t, j], carbon_emissions[..., t], mean_latency[..., t]
+        (averaged over the regions receiving requests, like Plot) and feasible[..., t]
+    """
+    request_rates = np.asarray(request_rates)
+    carbon_intensities = np.asarray(carbon_intensities, dtype=float)
+    latencies = np.asarray(latencies, dtype=float)
+    request_rates, carbon_intensities = np.broadcast_arrays(request_rates, carbon_intensities)
+
+    destinations = greedy_destinations(carbon_intensities, latencies, objective, max_latency)
+    requests = allocate(request_rates, destinations)
+
+    requests_to_region = requests.sum(axis=-2)
+    servers = np.ceil(requests_to_region / server_capacity).astype(np.int64)
+    carbon_emissions = np.sum(requests_to_region * carbon_intensities, axis=-1)
+
+    # Latency of every region receiving requests, weighted by where they come from
+    received = requests_to_region > 0
+    latency_to_region = np.sum(requests * latencies, axis=-2) / np.where(received, requests_to_region, 1)
+    n_received = received.sum(axis=-1)
+    mean_latency = np.sum(latency_to_region, axis=-1) / np.where(n_received > 0, n_received, 1)
+    mean_latency = np.where(n_received > 0, mean_latency, np.nan)
+
+    feasible = np.all(destinations >= 0, axis=-1)
+    if max_servers is not None:
+        feasible &= servers.sum(axis=-1) <= max_servers
+
+    return {
+        "requests": requests,
+        "servers": servers,
+        "carbon_emissions": carbon_emissions,
+        "mean_latency": mean_latency,
+        "feasible": feasible,
+    }
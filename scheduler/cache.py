@@ -0,0 +1,132 @@
+"""Cache of solved CAP/CAS instances.
+
+The solvers are deterministic, so a solution only depends on the inputs of the problem. Solutions are
+kept in a bounded in-memory LRU and, if a directory is given, in one pickle file per instance which
+is shared between processes, e.g. the workers of a sweep over the same dates.
+"""
+from collections import OrderedDict
+import copy
+import hashlib
+import os
+import pickle
+import tempfile
+import numpy as np
+
+# Solution caches of this process, keyed by (maxsize, directory)
+_SOLUTION_CACHES = {}
+
+
+def solution_key(*inputs):
+    """Hash of the inputs of a problem
+
+    Args:
+        inputs: Name of the problem and its inputs, numbers, strings, lists or NumPy arrays
+
+    Returns:
+        Hex digest identifying the problem
+    """
+    h = hashlib.sha1()
+    for value in inputs:
+        if isinstance(value, (list, tuple, np.ndarray)):
+            array = np.ascontiguousarray(value, dtype=float)
+            h.update(repr(array.shape).encode())
+            h.update(array.tobytes())
+        else:
+            h.update(repr(value).encode())
+        h.update(b"|")
+    return h.hexdigest()
+
+
+class SolutionCache:
+    """
+    Bounded LRU of solutions with an optional on-disk tier.
+    """
+
+    def __init__(self, maxsize=1024, directory=None) -> None:
+        """
+        Args:
+            maxsize: Maximum number of solutions kept in memory, 0 disables the cache. Defaults to 1024.
+            directory: Directory of the on-disk tier. Defaults to None, i.e. memory only.
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+        self.solutions = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.solutions)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        """
+        Args:
+            key: See solution_key()
+
+        Returns:
+            Copy of the cached solution, None if it is not cached
+        """
+        if self.maxsize == 0:
+            return None
+        if key in self.solutions:
+            self.solutions.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(self.solutions[key])
+        if self.directory is not None and os.path.exists(self._path(key)):
+            with open(self._path(key), "rb") as f:
+                solution = pickle.load(f)
+            self.disk_hits += 1
+            self._remember(key, solution)
+            return copy.deepcopy(solution)
+        self.misses += 1
+        return None
+
+    def put(self, key, solution):
+        """
+        Args:
+            key: See solution_key()
+            solution: Solution to cache, a copy is stored
+        """
+        if self.maxsize == 0:
+            return
+        solution = copy.deepcopy(solution)
+        self._remember(key, solution)
+        if self.directory is not None:
+            # Written to a temporary file first, so other processes never read a partial solution
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(solution, f)
+            os.replace(tmp, self._path(key))
+
+    def _remember(self, key, solution):
+        self.solutions[key] = solution
+        self.solutions.move_to_end(key)
+        while len(self.solutions) > self.maxsize:
+            self.solutions.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns:
+            Dict of hits (in memory), disk hits, misses and the number of solutions in memory
+        """
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "size": len(self)}
+
+
+def get_solution_cache(conf):
+    """Returns the solution cache for the runtime configurations, building it on first use.
+
+    Args:
+        conf: Runtime configurations
+
+    Returns:
+        SolutionCache shared between every run of this process with the same settings
+    """
+    key = (conf.solution_cache, conf.solution_cache_dir)
+    if key not in _SOLUTION_CACHES:
+        _SOLUTION_CACHES[key] = SolutionCache(conf.solution_cache, conf.solution_cache_dir)
+    return _SOLUTION_CACHES[key]
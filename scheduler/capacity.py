@@ -0,0 +1,100 @@
+"""Server classes and their capacities per region.
+
+By default every server has --server-capacity. With --server-classes a JSON file defines the instance
+types that can be started, their capacity and their cost per server and hour, in the unit of the
+carbon objective of the CAP, and optionally what a class handles in a specific region:
+
+    {
+        "classes": {"small": {"capacity": 50000, "cost": 100}, "large": {"capacity": 200000, "cost": 350}},
+        "regions": {"DE": {"large": 180000}}
+    }
+
+The CAP then places servers per region and class, picking the cheapest mix of classes that fits the
+requests.
+"""
+import json
+import numpy as np
+
+
+class ServerClass:
+    """
+    An instance type servers can be started as.
+    """
+
+    def __init__(self, name, capacity, cost=0) -> None:
+        """
+        Args:
+            name: Name of the class
+            capacity: Requests per hour a server of the class handles
+            cost: Cost per server and hour. Defaults to 0.
+        """
+        assert capacity > 0, (name, capacity)
+        assert cost >= 0, (name, cost)
+        self.name = name
+        self.capacity = int(capacity)
+        self.cost = cost
+
+    def __repr__(self) -> str:
+        return f"ServerClass({self.name}, capacity={self.capacity}, cost={self.cost})"
+
+
+class CapacityModel:
+    """
+    capacities[i][k] is the capacity of a server of class k in region i.
+    """
+
+    def __init__(self, region_names, classes, region_capacities=None) -> None:
+        """
+        Args:
+            region_names: Names of the regions, in-place order
+            classes: List of ServerClass
+            region_capacities: Dict of region name -> dict of class name -> capacity of that class in the
+            region, overriding the capacity of the class. Defaults to None.
+        """
+        assert len(classes) > 0, "At least one server class is needed"
+        self.classes = list(classes)
+        self.class_names = [c.name for c in self.classes]
+        self.costs = np.array([c.cost for c in self.classes], dtype=float)
+        self.capacities = np.tile(np.array([c.capacity for c in self.classes], dtype=np.int64), (len(region_names), 1))
+
+        index = {name: k for k, name in enumerate(self.class_names)}
+        for region, overrides in (region_capacities or {}).items():
+            # Regions of other region kinds may share the file
+            if region not in region_names:
+                continue
+            for name, capacity in overrides.items():
+                assert name in index, f"Unknown server class {name} for region {region}"
+                assert capacity > 0, (region, name, capacity)
+                self.capacities[region_names.index(region), index[name]] = capacity
+
+    @property
+    def n_classes(self):
+        return len(self.classes)
+
+    @property
+    def uniform_capacity(self):
+        """
+        Returns:
+            Capacity of every server if there is one free class with the same capacity in all regions, else None
+        """
+        if self.n_classes == 1 and self.costs[0] == 0 and np.all(self.capacities == self.capacities[0, 0]):
+            return int(self.capacities[0, 0])
+        return None
+
+
+def load_capacity_model(conf, region_names):
+    """
+    Args:
+        conf: Runtime configurations, reads the file at conf.server_classes if set
+        region_names: Names of the regions, in-place order
+
+    Returns:
+        CapacityModel, a single class with conf.server_capacity without a file
+    """
+    if not conf.server_classes:
+        return CapacityModel(region_names, [ServerClass("default", conf.server_capacity)])
+
+    with open(conf.server_classes) as f:
+        config = json.load(f)
+    classes = [ServerClass(name, **spec) for name, spec in config["classes"].items()]
+    return CapacityModel(region_names, classes, config.get("regions"))
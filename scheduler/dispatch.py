@@ -0,0 +1,163 @@
+"""Per-request dispatch in line with an allocation matrix.
+
+Every row requests[i] of an allocation from the CAS becomes one weighted selector of destinations:
+
+- AliasTable: Walker's alias method, O(1) random selection after an O(N) build, and batch sampling
+  of any number of destinations in one NumPy call.
+- SmoothWeightedRoundRobin: deterministic, every run of sum(weights) selections hits destination j
+  exactly weights[j] times, spread as evenly as possible.
+"""
+import random
+import numpy as np
+
+
+class AliasTable:
+    """
+    Walker's alias table over the indices of a weight vector.
+    """
+
+    def __init__(self, weights) -> None:
+        """Builds the table with Vose's method in O(N)
+
+        Args:
+            weights: weights[j] >= 0 is the relative probability of j, at least one weight must be positive
+        """
+        weights = np.asarray(weights, dtype=float)
+        total = weights.sum()
+        assert total > 0, "At least one weight must be positive"
+        n = len(weights)
+        scaled = list(weights * n / total)
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [j for j in range(n) if scaled[j] < 1]
+        large = [j for j in range(n) if scaled[j] >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            prob[s] = scaled[s]
+            alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+        # Whatever is left has probability 1 up to rounding errors
+        for j in small + large:
+            prob[j] = 1.0
+
+        self.n = n
+        # Lists for single draws, arrays for batches
+        self.prob = prob
+        self.alias = alias
+        self.prob_array = np.array(prob)
+        self.alias_array = np.array(alias)
+
+    def sample(self, u=None):
+        """Draws one index in O(1)
+
+        Args:
+            u: Uniform random number in [0, 1). Defaults to None, i.e. drawn from random.
+
+        Returns:
+            Index j with probability weights[j] / sum(weights)
+        """
+        if u is None:
+            u = random.random()
+        x = u * self.n
+        j = int(x)
+        return j if x - j < self.prob[j] else self.alias[j]
+
+    def sample_batch(self, size, rng=None):
+        """Draws many indices at once
+
+        Args:
+            size: Number of indices
+            rng: NumPy random generator. Defaults to None, i.e. a fresh default_rng().
+
+        Returns:
+            Array of size indices
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        j = rng.integers(self.n, size=size)
+        return np.where(rng.random(size) < self.prob_array[j], j, self.alias_array[j])
+
+
+class SmoothWeightedRoundRobin:
+    """
+    Deterministic weighted round-robin that interleaves destinations instead of sending runs of
+    requests to the same one, e.g. weights [5, 1, 1] give a a a b c a a.
+
+    The k-th selection of j is placed at the middle of its quota, (k + 1/2) / weights[j] cycles, ties
+    go to the lower index. Only the weights and the position in the cycle are kept, a batch generates
+    the selections around its window of positions in O(size + N).
+    """
+
+    def __init__(self, weights) -> None:
+        """Built in O(N)
+
+        Args:
+            weights: weights[j] >= 0 is the number of selections of j per cycle, at least one weight must be positive
+        """
+        weights = np.asarray(weights, dtype=np.int64)
+        self.total = int(weights.sum())
+        assert self.total > 0, "At least one weight must be positive"
+        self.weights = weights
+        self.indices = np.flatnonzero(weights)
+        self.positive = weights[self.indices]
+        self.position = 0
+
+    def selections_before(self, q):
+        """
+        Args:
+            q: Position, in units of 1 / sum(weights) cycles
+
+        Returns:
+            Array of the number of selections of each positive weight before q
+        """
+        # Selection k of j is before q iff (2k + 1) * total < 2 * q * weights[j]
+        return ((2 * q * self.positive - 1) // self.total + 1) // 2
+
+    def sample(self, u=None):
+        """Next index of the cycle, u is ignored and only accepted to match AliasTable
+
+        Returns:
+            Index j
+        """
+        return int(self.sample_batch(1)[0])
+
+    def sample_batch(self, size, rng=None):
+        """
+        Args:
+            size: Number of indices
+            rng: Ignored, only accepted to match AliasTable
+
+        Returns:
+            Array of the next size indices of the cycle
+        """
+        # The number of selections before q is within N / 2 of q, so the selections between these two
+        # bounds cover the positions position to position + size
+        n = len(self.indices)
+        first = self.selections_before(max(self.position - n, 0))
+        last = self.selections_before(self.position + size + n)
+        counts = last - first
+        owners = np.repeat(np.arange(n), counts)
+        k = np.repeat(first - np.cumsum(counts) + counts, counts) + np.arange(owners.size)
+        order = np.lexsort((owners, (2 * k + 1) / self.positive[owners]))
+        start = self.position - int(first.sum())
+        self.position = (self.position + size) % self.total
+        return self.indices[owners[order[start : start + size]]].astype(int)
+
+
+DISPATCHERS = {"alias": AliasTable, "round_robin": SmoothWeightedRoundRobin}
+
+
+def build_selectors(requests, method="alias"):
+    """One selector per source region, rebuilt in O(N) per row when the schedule changes
+
+    Args:
+        requests: requests[i][j] is the number of requests from region i that should be sent to region j
+        method: alias/round_robin. Defaults to "alias".
+
+    Returns:
+        List where [i] selects destinations for region i, None if region i has no scheduled requests
+    """
+    assert method in DISPATCHERS, method
+    selector = DISPATCHERS[method]
+    return [selector(row) if np.sum(row) > 0 else None for row in np.asarray(requests)]
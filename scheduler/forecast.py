@@ -0,0 +1,221 @@
+"""Forecasts of the request rates and carbon intensities the CAP places servers for.
+
+By default the CAP knows the next hour exactly. With --forecast it instead gets the one hour ahead
+forecast of a model that has only seen the hours before. Every model keeps a constant amount of
+state per region and is updated in O(1) per new hour, vectorized over the regions:
+
+- seasonal_naive: the value one season (24 hours) earlier
+- ewma: exponentially weighted moving average
+- holt_winters: additive Holt-Winters with a daily season
+"""
+from datetime import datetime, timezone
+import logging
+import os
+import numpy as np
+from scheduler.store import get_trace, CARBON_INTENSITY_COLUMN, REQUESTS_COLUMN
+from scheduler.util import load_carbon_intensity, load_request_rate
+
+# Hours of history before the start date the models are primed with
+HISTORY_HOURS = 24
+
+
+class SeasonalNaive:
+    """
+    Forecasts the value one season earlier.
+    """
+
+    def __init__(self, season=24) -> None:
+        self.season = season
+        self.history = None
+        self.n_observed = 0
+
+    def update(self, y):
+        """
+        Args:
+            y: y[i] is the observed value of region i in the next hour
+        """
+        y = np.asarray(y, dtype=float)
+        if self.history is None:
+            self.history = np.zeros((self.season,) + y.shape)
+        self.history[self.n_observed % self.season] = y
+        self.n_observed += 1
+
+    def predict(self):
+        """
+        Returns:
+            Forecast of the next hour, the last value until a whole season has been observed
+        """
+        assert self.n_observed > 0, "Nothing observed yet"
+        if self.n_observed < self.season:
+            return self.history[self.n_observed - 1].copy()
+        return self.history[self.n_observed % self.season].copy()
+
+
+class EWMA:
+    """
+    Exponentially weighted moving average, level = alpha * y + (1 - alpha) * level.
+    """
+
+    def __init__(self, alpha=0.5) -> None:
+        assert 0 < alpha <= 1, alpha
+        self.alpha = alpha
+        self.level = None
+
+    def update(self, y):
+        y = np.asarray(y, dtype=float)
+        if self.level is None:
+            self.level = y.copy()
+        else:
+            self.level += self.alpha * (y - self.level)
+
+    def predict(self):
+        assert self.level is not None, "Nothing observed yet"
+        return self.level.copy()
+
+
+class HoltWinters:
+    """
+    Additive Holt-Winters. The first season initializes the level (mean), trend (0) and seasonal
+    components (deviation from the mean), after that every hour updates them with the usual recursions.
+    """
+
+    def __init__(self, alpha=0.5, beta=0.05, gamma=0.3, season=24) -> None:
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self.season = season
+        self.level = None
+        self.trend = None
+        self.seasonal = None
+        self.n_observed = 0
+
+    def update(self, y):
+        y = np.asarray(y, dtype=float)
+        if self.seasonal is None:
+            self.seasonal = np.zeros((self.season,) + y.shape)
+        k = self.n_observed % self.season
+        self.n_observed += 1
+
+        if self.n_observed <= self.season:
+            # Collect the first season, the seasonal buffer holds the raw values until then
+            self.seasonal[k] = y
+            if self.n_observed == self.season:
+                self.level = self.seasonal.mean(axis=0)
+                self.trend = np.zeros_like(self.level)
+                self.seasonal -= self.level
+            return
+
+        level = self.alpha * (y - self.seasonal[k]) + (1 - self.alpha) * (self.level + self.trend)
+        self.trend = self.beta * (level - self.level) + (1 - self.beta) * self.trend
+        self.seasonal[k] = self.gamma * (y - level) + (1 - self.gamma) * self.seasonal[k]
+        self.level = level
+
+    def predict(self):
+        """
+        Returns:
+            Forecast of the next hour, the last value until a whole season has been observed
+        """
+        assert self.n_observed > 0, "Nothing observed yet"
+        if self.n_observed < self.season:
+            return self.seasonal[self.n_observed - 1].copy()
+        return self.level + self.trend + self.seasonal[self.n_observed % self.season]
+
+
+FORECASTERS = {"seasonal_naive": SeasonalNaive, "ewma": EWMA, "holt_winters": HoltWinters}
+
+
+def history_available(conf, regions, hours=HISTORY_HOURS):
+    """Whether the traces reach back far enough for load_history()
+
+    Args:
+        conf: Runtime configurations
+        regions: List of region objects
+        hours: Number of hours. Defaults to HISTORY_HOURS.
+
+    Returns:
+        True if the windows load_history() reads lie within the traces
+    """
+    # The same windows as load_request_rate() and load_carbon_intensity()
+    start_date = datetime.fromisoformat(conf.start_date).replace(tzinfo=timezone.utc)
+    length = conf.timesteps + 24
+    requests = get_trace("api/requests.csv", REQUESTS_COLUMN, name="request rate data")
+    for region in regions:
+        path = os.path.join("api", conf.region_kind, f"{region.name}.csv")
+        carbon = get_trace(path, CARBON_INTENSITY_COLUMN, name="electricity map data")
+        if not carbon.covers(int(start_date.timestamp()), length, region.offset - hours):
+            return False
+        if not requests.covers(int(start_date.replace(year=2021).timestamp()), length, region.offset - hours):
+            return False
+    return True
+
+
+def load_history(conf, regions, hours=HISTORY_HOURS):
+    """Traces of the hours before the start date
+
+    Args:
+        conf: Runtime configurations
+        regions: List of region objects
+        hours: Number of hours. Defaults to HISTORY_HOURS.
+
+    Returns:
+        return1: requests[h][i] is the request rate of region i, hours before the first timestep
+        return2: carbon[h][i] is the carbon intensity of region i, hours before the first timestep
+    """
+    requests, carbon = [], []
+    for region in regions:
+        path = os.path.join("api", conf.region_kind, f"{region.name}.csv")
+        requests.append(load_request_rate("api/requests.csv", region.offset - hours, conf, conf.start_date)[:hours])
+        carbon.append(load_carbon_intensity(path, region.offset - hours, conf, conf.start_date)[:hours])
+    return np.array(requests).T, np.array(carbon).T
+
+
+class ForecastStage:
+    """
+    Feeds the CAP forecasts instead of the true request rates and carbon intensities. Before hour t is
+    forecast, the models observe the true values of every hour before it.
+    """
+
+    def __init__(self, conf, server_manager, model=None) -> None:
+        """
+        Args:
+            conf: Runtime configurations
+            server_manager: Central server manager object that i.e. holds regions
+            model: Name of the model, see FORECASTERS. Defaults to conf.forecast.
+        """
+        model = model or conf.forecast
+        assert model in FORECASTERS, model
+        self.conf = conf
+        self.server_manager = server_manager
+        self.requests = FORECASTERS[model]()
+        self.carbon = FORECASTERS[model]()
+        self.n_observed = 0
+
+        self.primed = history_available(conf, server_manager.regions)
+        if self.primed:
+            requests, carbon = load_history(conf, server_manager.regions)
+            for h in range(len(requests)):
+                self.requests.update(requests[h])
+                self.carbon.update(carbon[h])
+        else:
+            # Not enough data before the start date, the first hour is then known exactly
+            logging.warning(f"No history before {conf.start_date} to prime the forecasts with")
+
+    def forecast(self, t):
+        """
+        Args:
+            t: time-step
+
+        Returns:
+            return1: request_rates[i] is the forecast requests per hour from region i at hour t
+            return2: carbon_intensities[i] is the forecast carbon intensity of region i at hour t
+        """
+        while self.n_observed < t:
+            self.requests.update(self.server_manager.request_rates[:, self.n_observed])
+            self.carbon.update(self.server_manager.carbon_intensities[:, self.n_observed])
+            self.n_observed += 1
+
+        if self.n_observed == 0 and not self.primed:
+            return self.server_manager.request_rates[:, t].copy(), self.server_manager.carbon_intensities[:, t].copy()
+        request_rates = np.maximum(np.rint(self.requests.predict()), 0).astype(np.int64)
+        carbon_intensities = np.maximum(self.carbon.predict(), 0)
+        return request_rates, carbon_intensities
@@ -0,0 +1,124 @@
+import numpy as np
+import logging
+from scheduler.milp_sched import place_servers_horizon
+
+
+class RollingHorizonProvisioner:
+    """Plans the server placement jointly over a lookahead window of several hours.
+
+       A plan covers the hours [start, start + horizon). It is reused for the next `step` hours,
+       after which the window rolls forward. The overlapping hours of the previous plan are handed
+       to the solver as a warm start, so mostly the new tail of the window has to be searched, and
+       the current placement is the starting point for the migration cost.
+    """
+
+    def __init__(self, conf, server_manager, horizon=None, step=None, migration_cost=None, timeline=None):
+        """
+
+        Args:
+            conf: Runtime configurations
+            server_manager: Central server manager object that i.e. holds regions
+            horizon: Number of hours in the lookahead window. Defaults to conf.horizon.
+            step: Number of hours a plan is reused before re-planning. Defaults to conf.horizon_step or horizon // 2.
+            migration_cost: Cost per server started in a region. Defaults to conf.migration_cost.
+            timeline: Requests of every interval, with --interpolate the hours of the run are planned for
+            their busiest interval. Defaults to None.
+        """
+        self.conf = conf
+        self.server_manager = server_manager
+        self.horizon = horizon if horizon is not None else conf.horizon
+        if step is None:
+            step = conf.horizon_step or max(1, self.horizon // 2)
+        self.step = step
+        self.migration_cost = migration_cost if migration_cost is not None else conf.migration_cost
+        self.timeline = timeline
+        assert 1 <= self.step <= self.horizon, (self.step, self.horizon)
+
+        self.start = None
+        self.servers = None
+        self.requests = None
+        self.solves = 0
+
+    def request_rates(self, t, n_hours):
+        """
+        Returns:
+            rates[h][i] is the requests per hour from region i at hour t + h
+        """
+        if self.conf.rate:
+            rates = np.full((n_hours, len(self.server_manager.regions)), self.conf.rate)
+        else:
+            rates = self.server_manager.request_rates[:, t : t + n_hours].T.copy()
+        if self.conf.interpolate and self.timeline is not None:
+            # Intervals above the hourly average would not fit otherwise, the window may reach past the
+            # run, those hours keep their hourly rates
+            n_run = min(n_hours, len(self.timeline.requests) - t)
+            rates[:n_run] = np.maximum(rates[:n_run], self.timeline.peak_rates(t, n_run))
+        return rates
+
+    def carbon_intensities(self, t, n_hours):
+        """
+        Returns:
+            carbon[h][i] is the carbon intensity of region i at hour t + h
+        """
+        return self.server_manager.carbon_intensities[:, t : t + n_hours].T
+
+    def plan(self, t):
+        """Solves the placement for the window starting at hour t.
+
+        Args:
+            t: time-step
+        """
+        # The traces hold 24 hours after the last timestep, so the window may have to shrink at the end
+        n_hours = min(self.horizon, self.server_manager.carbon_intensities.shape[1] - t)
+        assert n_hours > 0, (t, n_hours)
+
+        warm_start = None
+        if self.start is not None and t < self.start + len(self.servers):
+            offset = t - self.start
+            warm_start = (self.servers[offset:], self.requests[offset:])
+
+        # The plan over several hours has one server type, the capacity may still differ per region
+        capacity_model = self.server_manager.capacity_model
+        assert capacity_model.n_classes == 1, "Planning over a horizon does not support several server classes"
+        capacities = capacity_model.capacities[:, 0].tolist()
+        request_rates = self.request_rates(t, n_hours)
+        servers, requests, obj_val = place_servers_horizon(
+            request_rates,
+            capacities,
+            self.server_manager.latencies,
+            self.carbon_intensities(t, n_hours),
+            self.conf.max_servers,
+            self.conf.latency,
+            initial_servers=self.server_manager.servers_per_region(),
+            migration_cost=self.migration_cost,
+            warm_start=warm_start,
+        )
+        self.solves += 1
+        if obj_val < 0:
+            logging.warning(
+                f"Could not place servers! t={t} hours: {n_hours} reqs: {request_rates[0]} "
+                f"max_servers: {self.conf.max_servers}"
+            )
+            raise Exception("Could not place, look above for more info")
+
+        # If we never plan to schedule at a region, we set the servers in that region to 0.
+        # With a migration cost idle servers may be kept on purpose to avoid restarting them later.
+        if self.migration_cost == 0:
+            servers[np.sum(requests, axis=1) == 0] = 0
+
+        self.start = t
+        self.servers = servers
+        self.requests = requests
+
+    def servers_per_region(self, t):
+        """Placement for hour t, re-planning when the current plan has been used for `step` hours
+
+        Args:
+            t: time-step
+
+        Returns:
+            server[i] - number of servers in region i.
+        """
+        if self.start is None or t >= self.start + self.step or t - self.start >= len(self.servers):
+            self.plan(t)
+        return self.servers[t - self.start]
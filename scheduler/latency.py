@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+from scheduler.constants import REGION_LOCATIONS
+
+
+CLOUDPING_PATH = "api/cloudping/latency_50th.csv"
+EARTH_RADIUS = 6371
+
+# Process-wide cache of latency matrices, keyed by file path or region set
+_LATENCY_MATRICES = {}
+
+
+class LatencyMatrix:
+    """Read-only latency matrix where rows and columns are keyed by region name.
+
+       NOTE:
+       The underlying array is flagged as non-writeable as the same object is shared between
+       every Region and ServerManager in the process.
+    """
+
+    def __init__(self, names, values):
+        """
+
+        Args:
+            names: Region names, in-place order of the rows and columns
+            values: values[i][j] is the round-trip latency from region i to j in milliseconds
+        """
+        values = np.array(values, dtype=float)
+        assert values.shape == (len(names), len(names)), (values.shape, len(names))
+        values.setflags(write=False)
+
+        self.names = list(names)
+        self.values = values
+        # Keep the first occurrence if a name is duplicated in the source data
+        self.index = {}
+        for i, name in enumerate(self.names):
+            self.index.setdefault(name, i)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.names)
+
+    def get(self, src, dst):
+        """
+        Args:
+            src: Name of region sending a request
+            dst: Name of region recieving the request
+
+        Returns:
+            Latency from region "src" to region "dst"
+        """
+        return self.values[self.index[src], self.index[dst]]
+
+    def submatrix(self, names):
+        """
+        Args:
+            names: Region names to select, in-place order
+
+        Returns:
+            Read-only array where [i][j] is the latency from names[i] to names[j]
+        """
+        indices = [self.index[name] for name in names]
+        values = self.values[np.ix_(indices, indices)]
+        values.setflags(write=False)
+        return values
+
+
+def cloudping_latencies(path=CLOUDPING_PATH):
+    """Loads the cloudping latency data once per process, see README
+
+    Args:
+        path: Path of cloudping data. Defaults to CLOUDPING_PATH.
+
+    Returns:
+        LatencyMatrix shared by every caller
+    """
+    if path not in _LATENCY_MATRICES:
+        df = pd.read_csv(path)
+        # pandas mangles duplicated column names as "name.1", strip it to key on the region name
+        names = [str(name).split(".")[0] for name in df.columns]
+        _LATENCY_MATRICES[path] = LatencyMatrix(names, df.to_numpy())
+    return _LATENCY_MATRICES[path]
+
+
+def latency_from_distance(distance):
+    """Latency model L=0.022*0.62*d+m [ms] where d [km] is the distance between two points.
+    Works for scalars as well as arrays.
+    """
+    return 0.022 * 0.62 * distance + 4.862
+
+
+def haversine_distances(src, dst=None):
+    """Vectorized haversine distance between every pair of points.
+
+    Args:
+        src: Array-like of shape (N, 2) with (latitude, longitude) in degrees
+        dst: Array-like of shape (M, 2). Defaults to src.
+
+    Returns:
+        Array of shape (N, M) where [i][j] is the distance from src[i] to dst[j] in km
+    """
+    src = np.radians(np.asarray(src, dtype=float).reshape(-1, 2))
+    dst = src if dst is None else np.radians(np.asarray(dst, dtype=float).reshape(-1, 2))
+
+    lat1 = src[:, 0, None]
+    lat2 = dst[None, :, 0]
+    dlat = lat2 - lat1
+    dlon = dst[None, :, 1] - src[:, 1, None]
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    # Rounding can push a slightly outside [0, 1] for antipodal or identical points
+    a = np.clip(a, 0, 1)
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return EARTH_RADIUS * c
+
+
+def haversine_latencies(names, locations=None):
+    """Builds the latency matrix for a set of regions in one pass, cached per region set.
+
+    Args:
+        names: Region names, in-place order
+        locations: Mapping from name to (latitude, longitude). Defaults to REGION_LOCATIONS.
+
+    Returns:
+        LatencyMatrix shared by every caller with the same region set
+    """
+    if locations is None:
+        locations = REGION_LOCATIONS
+    points = tuple(tuple(locations[name]) for name in names)
+    key = (tuple(names), points)
+    if key not in _LATENCY_MATRICES:
+        values = latency_from_distance(haversine_distances(points))
+        _LATENCY_MATRICES[key] = LatencyMatrix(names, values)
+    return _LATENCY_MATRICES[key]
+
+
+def region_latencies(regions):
+    """Builds the latency matrix between regions once per set of regions.
+
+    Args:
+        regions: List of region objects, in-place order
+
+    Returns:
+        Read-only array where [i][j] is the latency from region i to j
+    """
+    names = [region.name for region in regions]
+    locations = {region.name: region.location for region in regions}
+    return haversine_latencies(names, locations).values
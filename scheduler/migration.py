@@ -0,0 +1,88 @@
+"""Incremental server migration between two placements.
+
+A new placement servers_per_region only says how many servers every region should have. The planner
+diffs it against the current placement in O(N) and turns the difference into explicit moves: every
+server a region has too many of is moved to a region that has too few, servers are only started or
+stopped for the change in the total number of servers. Every move costs warm-up time in production,
+so the number of moved servers is the minimum possible, min(surplus, deficit). With several server
+classes, placements are servers_per_region[i][k] and servers only move within their class.
+"""
+import numpy as np
+
+
+class MigrationPlan:
+    """
+    Moves, starts and stops that turn one placement into another.
+    """
+
+    def __init__(self, moves, started, stopped, classes=None) -> None:
+        """
+        Args:
+            moves: List of (source, destination, n), n servers are moved from region source to destination
+            started: started[i] (or started[i][k]) is the number of servers started in region i
+            stopped: stopped[i] (or stopped[i][k]) is the number of servers stopped in region i
+            classes: classes[m] is the server class of moves[m]. Defaults to None, i.e. all class 0.
+        """
+        self.moves = moves
+        self.started = started
+        self.stopped = stopped
+        self.classes = classes if classes is not None else [0] * len(moves)
+
+    @property
+    def n_moved(self):
+        return sum(n for _, _, n in self.moves)
+
+    def __len__(self):
+        return len(self.moves)
+
+    def __repr__(self) -> str:
+        return f"MigrationPlan(moves={self.moves}, started={self.started.tolist()}, stopped={self.stopped.tolist()})"
+
+
+def plan_migrations(current, target):
+    """Diffs two placements, walking the regions with too many and too few servers side by side
+
+    Args:
+        current: current[i] (or current[i][k] per server class k) is the number of servers in region i
+        target: target[i] (or target[i][k]) is the number of servers region i should have
+
+    Returns:
+        MigrationPlan, the moves are sorted by class and source region and there are fewer than 2N per class
+    """
+    current = np.asarray(current, dtype=np.int64)
+    target = np.asarray(target, dtype=np.int64)
+    assert current.shape == target.shape, (current.shape, target.shape)
+    assert np.all(target >= 0), target
+    if current.ndim == 2:
+        plans = [plan_migrations(current[:, k], target[:, k]) for k in range(current.shape[1])]
+        return MigrationPlan(
+            [move for plan in plans for move in plan.moves],
+            np.stack([plan.started for plan in plans], axis=1),
+            np.stack([plan.stopped for plan in plans], axis=1),
+            [k for k, plan in enumerate(plans) for _ in plan.moves],
+        )
+
+    surplus = np.maximum(current - target, 0)
+    deficit = np.maximum(target - current, 0)
+    sources = np.flatnonzero(surplus)
+    destinations = np.flatnonzero(deficit)
+
+    moves = []
+    left = surplus[sources].tolist()
+    needed = deficit[destinations].tolist()
+    s = d = 0
+    while s < len(sources) and d < len(destinations):
+        n = min(left[s], needed[d])
+        moves.append((int(sources[s]), int(destinations[d]), n))
+        left[s] -= n
+        needed[d] -= n
+        if left[s] == 0:
+            s += 1
+        if needed[d] == 0:
+            d += 1
+
+    stopped = np.zeros_like(current)
+    stopped[sources] = left
+    started = np.zeros_like(current)
+    started[destinations] = needed
+    return MigrationPlan(moves, started, stopped)
@@ -2,10 +2,20 @@ import numpy as np
 import pulp as plp
 import logging
 from scheduler.util import load_request_matrix
+from scheduler.transport import (
+    sched_reqs_carbon_transport,
+    sched_reqs_latency_transport,
+    sched_reqs_overflow_transport,
+)
+from scheduler.cache import get_solution_cache, solution_key
 
+# Persistent CAS models, keyed by region set, objective and maximum latency
+_REQUEST_SCHEDULERS = {}
 
 
-def schedule_servers(conf, request_batches, server_manager, t, max_servers=4, max_latency=100):
+def schedule_servers(
+    conf, request_batches, server_manager, t, max_servers=4, max_latency=100, carbon_intensities=None
+):
     """
     Wrapper around the CAP (place_servers()).
 
@@ -18,23 +28,61 @@ def schedule_servers(conf, request_batches, server_manager, t, max_servers=4, ma
         t: time-step
         max_servers: Maximum number of servers. Defaults to 4.
         max_latency: Maximum latency tolerated. Defaults to 100.
+        carbon_intensities: carbon_intensities[i] is the (forecast) carbon intensity in region i.
+        Defaults to None, i.e. the carbon intensity of the hour.
 
     Returns:
-        server[i] - number of servers in region i.
+        server[i] - number of servers in region i, server[i][k] per server class k with several classes.
     """
 
-    carbon_intensities = [region.carbon_intensity[t] for region in server_manager.regions]
-    latencies = np.array(
-        [[region.latency(batch.region) for region in server_manager.regions] for batch in request_batches]
-    )
-    capacities = [conf.server_capacity] * len(server_manager.regions)
+    if carbon_intensities is None:
+        carbon_intensities = server_manager.carbon_intensities[:, t]
+    latencies = server_manager.latencies
+    capacity_model = server_manager.capacity_model
+    if capacity_model.uniform_capacity is not None:
+        capacities = [capacity_model.uniform_capacity] * len(server_manager.regions)
+        server_costs = None
+    else:
+        capacities = capacity_model.capacities
+        server_costs = capacity_model.costs
     request_rates = [batch.load for batch in request_batches]
 
     # reqs are the tentative requests
     scheduler = conf.type_scheduler
-    servers, reqs, obj_val = place_servers(
-        scheduler, request_rates, capacities, latencies, carbon_intensities, max_servers, max_latency
+    if scheduler == "carbon":
+        # Fails early with the names of regions whose requests can not be sent anywhere
+        check_reachable(latencies, max_latency, request_rates, server_manager.region_names)
+    # The current placement only matters to the solution when migrations cost something
+    migration_cost = conf.migration_cost if scheduler == "carbon" else 0
+    current_servers = None
+    if migration_cost > 0:
+        current_servers = (
+            server_manager.servers_per_region() if server_costs is None else server_manager.servers_per_class()
+        )
+    cache = get_solution_cache(conf)
+    key = solution_key(
+        "cap", scheduler, request_rates, capacities, latencies, carbon_intensities, max_servers, max_latency
     )
+    if server_costs is not None:
+        key = solution_key(key, server_costs)
+    if migration_cost > 0:
+        key = solution_key(key, current_servers, migration_cost)
+    solution = cache.get(key)
+    if solution is None:
+        solution = place_servers(
+            scheduler,
+            request_rates,
+            capacities,
+            latencies,
+            carbon_intensities,
+            max_servers,
+            max_latency,
+            current_servers,
+            migration_cost,
+            server_costs,
+        )
+        cache.put(key, solution)
+    servers, reqs, obj_val = solution
     if obj_val < 0:
         logging.warning(
             f"Could not place servers! t={t} reqs: {request_rates} caps: {capacities} max_servers: {max_servers}"
@@ -42,21 +90,48 @@ def schedule_servers(conf, request_batches, server_manager, t, max_servers=4, ma
         raise Exception("Could not place, look above for more info")
     # print(f"At t={t} servers placed: {servers} obj_val:{obj_val}")
     # If we never plan to schedule at a region, we set the servers in that region to 0.
-    mask = np.sum(reqs, axis=0) == 0
-    servers[mask] = 0
+    # With a migration cost idle servers may be kept on purpose to avoid restarting them later.
+    if migration_cost == 0:
+        mask = np.sum(reqs, axis=0) == 0
+        servers[mask] = 0
 
     return servers
 
-def place_servers(scheduler, request_rates, capacities, latencies, carbon_intensities, max_servers, max_latency):
-    """Organizes choice of scheduler
+def place_servers(
+    scheduler,
+    request_rates,
+    capacities,
+    latencies,
+    carbon_intensities,
+    max_servers,
+    max_latency,
+    current_servers=None,
+    migration_cost=0,
+    server_costs=None,
+):
+    """Organizes choice of scheduler, the migration cost only applies to the carbon scheduler
     """
     assert str(scheduler) in ["latency", "carbon"], scheduler
     if scheduler == "carbon":
-        return place_servers_carbon_greedy(request_rates, capacities, latencies, carbon_intensities, max_servers, max_latency)
+        return place_servers_carbon_greedy(
+            request_rates,
+            capacities,
+            latencies,
+            carbon_intensities,
+            max_servers,
+            max_latency,
+            current_servers,
+            migration_cost,
+            server_costs,
+        )
     elif scheduler == "latency":
-        return place_servers_latency_greedy(request_rates, capacities, latencies, carbon_intensities, max_servers)
+        return place_servers_latency_greedy(
+            request_rates, capacities, latencies, carbon_intensities, max_servers, server_costs
+        )
 
-def schedule_requests(conf, request_batches, server_manager, t, request_update_interval, max_latency=100):
+def schedule_requests(
+    conf, request_batches, server_manager, t, request_update_interval, max_latency=100, carbon_intensities=None
+):
     """
     Wrapper around the CAS (sched_reqs()).
 
@@ -69,28 +144,43 @@ def schedule_requests(conf, request_batches, server_manager, t, request_update_i
         t: time-step
         request_update_interval: Interval in minutes in which requests are scheduled.
         max_latency: Maximum latency tolerated. Defaults to 100.
+        carbon_intensities: carbon_intensities[i] is the carbon intensity in region i during the interval.
+        Defaults to None, i.e. the carbon intensity of the hour.
 
     Returns:
         requests[i,j] - number of requests from region i to j.
     """
 
-    carbon_intensities = [region.carbon_intensity[t] for region in server_manager.regions]
-    latencies = np.array(
-        [[region.latency(batch.region) for region in server_manager.regions] for batch in request_batches]
-    )
-    capacities = [conf.server_capacity // request_update_interval] * len(server_manager.regions)
+    if carbon_intensities is None:
+        carbon_intensities = server_manager.carbon_intensities[:, t]
+    latencies = server_manager.latencies
     request_rates = [batch.load for batch in request_batches]
-    servers = server_manager.servers_per_region()
-
-    obj_val = 0
-    if conf.type_scheduler == "carbon":
-        requests, obj_val = sched_reqs_carbon_greedy(request_rates, capacities, latencies, carbon_intensities, servers, max_latency)
-        check_obj_valid(obj_val)
-        return latencies, carbon_intensities, requests
-
-    elif conf.type_scheduler == "latency":
-        requests, obj_val = sched_reqs_latency_greedy(request_rates, capacities, latencies, carbon_intensities, servers)
-        check_obj_valid(obj_val)
+    capacities, servers = request_capacities(server_manager, request_update_interval)
+
+    if conf.type_scheduler in ["carbon", "latency"]:
+        cache = get_solution_cache(conf)
+        # Forecast runs fall back to dropping requests, so their solutions differ from perfect runs
+        overflow = conf.forecast != "perfect"
+        key = solution_key(
+            "cas",
+            conf.solver,
+            conf.type_scheduler,
+            overflow,
+            request_rates,
+            capacities,
+            latencies,
+            carbon_intensities,
+            servers,
+            max_latency,
+        )
+        solution = cache.get(key)
+        if solution is None:
+            solution = solve_requests(
+                conf, server_manager, request_rates, capacities, latencies, carbon_intensities, servers, max_latency
+            )
+            check_obj_valid(solution[1])
+            cache.put(key, solution)
+        requests, obj_val = solution
         return latencies, carbon_intensities, requests
 
     elif conf.type_scheduler == "replay":
@@ -99,6 +189,197 @@ def schedule_requests(conf, request_batches, server_manager, t, request_update_i
 
     # print(f"At t={t}, obj_val={obj_val:e} g C02 requests scheduled at: \n{requests}")
 
+def request_capacities(server_manager, request_update_interval):
+    """Capacities and servers the CAS schedules an interval for
+
+    Args:
+        server_manager: server manager object
+        request_update_interval: Number of intervals per hour
+
+    Returns:
+        return1: capacities[i] is the capacity per server in region i during the interval
+        return2: servers[i] is the number of servers in region i, servers[i] * capacities[i] is the
+        capacity send() fills
+    """
+    servers = server_manager.servers_per_region()
+    uniform_capacity = server_manager.capacity_model.uniform_capacity
+    if uniform_capacity is not None:
+        return [uniform_capacity // request_update_interval] * len(server_manager.regions), servers
+    # Servers of a region differ in capacity, every region is handed to the CAS as one server with
+    # the capacity of all of them
+    capacities = server_manager.capacity_per_region(request_update_interval).tolist()
+    return capacities, [min(n, 1) for n in servers]
+
+
+def solve_requests(
+    conf, server_manager, request_rates, capacities, latencies, carbon_intensities, servers, max_latency
+):
+    """Organizes choice of solver for the CAS
+
+    Returns:
+        return1: x[i][j] is the number of requests from region i that should
+        be sent to region j.
+        return2: objective value.
+    """
+    if conf.solver == "transport" and conf.type_scheduler == "carbon":
+        requests, obj_val = sched_reqs_carbon_transport(
+            request_rates, capacities, latencies, carbon_intensities, servers, max_latency
+        )
+    elif conf.solver == "transport" and conf.type_scheduler == "latency":
+        requests, obj_val = sched_reqs_latency_transport(
+            request_rates, capacities, latencies, carbon_intensities, servers
+        )
+    else:
+        scheduler = get_request_scheduler(server_manager, conf.type_scheduler, max_latency)
+        requests, obj_val = scheduler.solve(request_rates, capacities, carbon_intensities, servers)
+
+    # Servers placed for forecasts may be too few, the requests that do not fit are then dropped
+    if obj_val < 0 and conf.forecast != "perfect":
+        requests, obj_val = sched_reqs_overflow_transport(
+            request_rates, capacities, latencies, carbon_intensities, servers, max_latency, conf.type_scheduler
+        )
+    return requests, obj_val
+
+
+def get_request_scheduler(server_manager, objective, max_latency):
+    """Returns the persistent CAS model for the regions of the server manager, building it on first use.
+
+    Args:
+        server_manager: server manager object
+        objective: What to minimize, carbon/latency
+        max_latency: Maximum latency tolerated
+
+    Returns:
+        RequestScheduler shared between every interval of the simulation
+    """
+    key = (
+        tuple(region.name for region in server_manager.regions),
+        objective,
+        max_latency if objective == "carbon" else None,
+    )
+    if key not in _REQUEST_SCHEDULERS:
+        _REQUEST_SCHEDULERS[key] = RequestScheduler(server_manager.latencies, objective, max_latency)
+    return _REQUEST_SCHEDULERS[key]
+
+def feasible_pairs(latencies, max_latency=None):
+    """Region pairs that requests are allowed to be sent between.
+
+    Args:
+        latencies: latencies[i][j] is the latency from region i to j
+        max_latency: Maximum latency tolerated. Defaults to None, i.e. every pair is allowed.
+
+    Returns:
+        List of (i, j) such that latencies[i][j] <= max_latency
+    """
+    return [(int(i), int(j)) for i, j in zip(*np.nonzero(feasible_mask(latencies, max_latency)))]
+
+def feasible_mask(latencies, max_latency=None):
+    """
+    Returns:
+        mask[i][j] is True if latencies[i][j] <= max_latency, see feasible_pairs()
+    """
+    latencies = np.asarray(latencies)
+    if max_latency is None:
+        return np.ones(latencies.shape, dtype=bool)
+    return latencies <= max_latency
+
+def check_reachable(latencies, max_latency, request_rates, region_names=None):
+    """Regions without a latency-feasible destination have no variables, which CBC would only report
+    as an infeasible model once they have requests
+
+    Args:
+        latencies: latencies[i][j] is the latency from region i to j
+        max_latency: Maximum latency tolerated
+        request_rates: request_rates[i] (or request_rates[h][i] per hour) is the number of requests from region i
+        region_names: Names of the regions for the error message. Defaults to None, i.e. their index.
+    """
+    has_requests = np.any(np.atleast_2d(request_rates) > 0, axis=0)
+    unreachable = np.flatnonzero(has_requests & ~feasible_mask(latencies, max_latency).any(axis=1))
+    if len(unreachable) > 0:
+        names = [str(region_names[i]) if region_names is not None else f"region {i}" for i in unreachable]
+        raise ValueError(f"No region within max_latency={max_latency} of {', '.join(names)}")
+
+def server_variables(capacities):
+    """Integer number of servers per region, or per region and server class if capacities is 2D.
+
+    Args:
+        capacities: capacities[i] is the average capacity per server in region i, or capacities[i][k]
+        the capacity of a server of class k in region i
+
+    Returns:
+        return1: Dict of the server variables, keyed by i or (i, k)
+        return2: servers[i] is the expression of the number of servers in region i
+        return3: capacity[i] is the expression of the capacity of the servers in region i
+    """
+    n_regions = len(capacities)
+    if np.ndim(capacities) == 1:
+        s_vars = {i: plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"s_{i}") for i in range(n_regions)}
+        return s_vars, s_vars, {i: s_vars[i] * capacities[i] for i in range(n_regions)}
+
+    n_classes = len(capacities[0])
+    s_vars = {
+        (i, k): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"s_{i}_{k}")
+        for i in range(n_regions)
+        for k in range(n_classes)
+    }
+    servers = {i: plp.lpSum(s_vars[i, k] for k in range(n_classes)) for i in range(n_regions)}
+    capacity = {i: plp.lpSum(s_vars[i, k] * capacities[i][k] for k in range(n_classes)) for i in range(n_regions)}
+    return s_vars, servers, capacity
+
+def server_cost_gap(server_costs):
+    """Absolute optimality gap for problems with server costs. Proving that no mix of classes is cheaper
+    by less than the cost of a single server takes CBC long next to objectives of millions.
+
+    Returns:
+        Cost of the cheapest server class, None without server costs
+    """
+    if server_costs is None:
+        return None
+    return float(np.min(server_costs))
+
+def cheapest_server_mix(loads, capacities, server_costs, max_servers):
+    """Cheapest servers of every class that handle a fixed load per region.
+
+    Args:
+        loads: loads[i] is the number of requests sent to region i
+        capacities: capacities[i][k] is the capacity of a server of class k in region i
+        server_costs: server_costs[k] is the cost per server of class k
+        max_servers: max_servers is the maximum number of servers
+
+    Returns:
+        return1: n_servers[i][k] is the number of servers of class k that should be started in region i.
+        return2: cost of the servers, negative if the loads do not fit on max_servers servers.
+    """
+    opt_model = plp.LpProblem(name="model")
+    s_vars, region_servers, region_capacity = server_variables(capacities)
+    opt_model.addConstraint(
+        plp.LpConstraint(
+            e=plp.lpSum(region_servers.values()), sense=plp.LpConstraintLE, rhs=max_servers, name="max_server"
+        )
+    )
+    for j, capacity in region_capacity.items():
+        opt_model.addConstraint(
+            plp.LpConstraint(e=capacity, sense=plp.LpConstraintGE, rhs=loads[j], name=f"capacity_const{j}")
+        )
+
+    objective = plp.lpSum(s * server_costs[k] for (i, k), s in s_vars.items())
+    opt_model.setObjective(objective)
+    opt_model.solve(plp.PULP_CBC_CMD(msg=0))
+
+    if opt_model.sol_status != 1:
+        return np.zeros(np.shape(capacities)), -10000
+    return server_values(s_vars, capacities), objective.value() or 0
+
+def server_values(s_vars, capacities):
+    """
+    Returns:
+        n_servers[i] (or n_servers[i][k]) is the number of servers that should be started, see server_variables()
+    """
+    servers = np.zeros(np.shape(capacities), dtype=int)
+    for key, s in s_vars.items():
+        servers[key] = int(s.varValue)
+    return servers
+
 def check_obj_valid(obj_val):
     if obj_val < 0:
         logging.warning(
@@ -106,7 +387,10 @@ def check_obj_valid(obj_val):
         )
         raise Exception("Could not schedule, look above for more info")
 
-def place_servers_latency_greedy(request_rates, capacities, latencies, carbon_intensities, max_servers):
+
+def place_servers_latency_greedy(
+    request_rates, capacities, latencies, carbon_intensities, max_servers, server_costs=None
+):
     """
     This is the latency greedy scheduler to compare with the Carbon Aware Scheduler. The placement
     of servers are determined by latency rather than by carbon.
@@ -119,24 +403,25 @@ def place_servers_latency_greedy(request_rates, capacities, latencies, carbon_in
         latencies: latencies[i][j] is the latency from region i to j
         carbon_intensities: carbon_intensities[i] is the carbon intensity in region i
         max_servers: max_servers is the maximum number of servers
-        max_latency: max_latency is the maximum latency allowed
+        server_costs: server_costs[k] is the cost per server of class k, only with capacities[i][k].
+        Defaults to None.
     Returns:
         return1: x[i][j] is the number of requests from region i that should
         be sent to region j.
-        return2: n_servers[i] is the number of servers that should be started
-        in region i.
+        return2: n_servers[i] (or n_servers[i][k] per server class) is the number of servers that should
+        be started in region i.
         return3: objective value.
     """
     opt_model = plp.LpProblem(name="model")
     n_regions = len(carbon_intensities)
     set_R = range(n_regions)  # Region set
     x_vars = {(i, j): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"x_{i}_{j}") for i in set_R for j in set_R}
-    s_vars = {i: plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"s_{i}") for i in set_R}
+    s_vars, region_servers, region_capacity = server_variables(capacities)
 
     # Cap the number of servers
     opt_model.addConstraint(
         plp.LpConstraint(
-            e=plp.lpSum(s_vars[i] for i in set_R), sense=plp.LpConstraintLE, rhs=max_servers, name="max_server"
+            e=plp.lpSum(region_servers[i] for i in set_R), sense=plp.LpConstraintLE, rhs=max_servers, name="max_server"
         )
     )
 
@@ -144,7 +429,7 @@ def place_servers_latency_greedy(request_rates, capacities, latencies, carbon_in
     for j in set_R:
         opt_model.addConstraint(
             plp.LpConstraint(
-                e=plp.lpSum(x_vars[i, j] for i in set_R) - s_vars[j] * capacities[j],
+                e=plp.lpSum(x_vars[i, j] for i in set_R) - region_capacity[j],
                 sense=plp.LpConstraintLE,
                 rhs=0,
                 name=f"capacity_const{j}",
@@ -171,44 +456,55 @@ def place_servers_latency_greedy(request_rates, capacities, latencies, carbon_in
         requests[i, j] = int(x_vars[i, j].varValue)
 
     if opt_model.sol_status != 1:
-        return np.zeros(n_regions), requests, -10000
-
-    return np.array([int(s.varValue) for s in s_vars.values()]), requests, objective.value()
-
+        return np.zeros(np.shape(capacities)), requests, -10000
+
+    if server_costs is None:
+        return server_values(s_vars, capacities), requests, objective.value()
+
+    # Latency comes first, the classes are then picked as cheap as possible for the requests placed.
+    # Weighing both in one model leaves CBC proving tiny cost differences next to the latencies.
+    servers, cost = cheapest_server_mix(np.sum(requests, axis=0), capacities, server_costs, max_servers)
+    if cost < 0:
+        return servers, requests, -10000
+    return servers, requests, objective.value() + cost
+
+
+def carbon_greedy_model(
+    request_rates,
+    capacities,
+    latencies,
+    carbon_intensities,
+    max_servers,
+    max_latency,
+    current_servers=None,
+    migration_cost=0,
+    server_costs=None,
+):
+    """The CAP model of place_servers_carbon_greedy(), built without solving it
 
-def place_servers_carbon_greedy(request_rates, capacities, latencies, carbon_intensities, max_servers, max_latency):
-    """
-    This is the Carbon Aware Provisioner (CAP) where the placement of servers are determined.
-    For example if one region have a low carbon intensity for the next hours, more servers
-    should be allocated there.
-
-    If problem was not solved, a negative objective value is returned
-
-    Args:
-        request_rates: request_rates[i] is the number of requests from region i
-        capacities: capacities[i] is the average capacity per server in region i
-        latencies: latencies[i][j] is the latency from region i to j
-        carbon_intensities: carbon_intensities[i] is the carbon intensity in region i
-        max_servers: max_servers is the maximum number of servers
-        max_latency: max_latency is the maximum latency allowed
     Returns:
-        return1: x[i][j] is the number of requests from region i that should
-        be sent to region j.
-        return2: n_servers[i] is the number of servers that should be started
-        in region i.
-        return3: objective value.
+        return1: PuLP problem
+        return2: x_vars[i, j] is the variable of the requests from region i to j, for feasible pairs only
+        return3: s_vars of the servers, see server_variables()
     """
-
     opt_model = plp.LpProblem(name="model")
     n_regions = len(carbon_intensities)
     set_R = range(n_regions)  # Region set
-    x_vars = {(i, j): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"x_{i}_{j}") for i in set_R for j in set_R}
-    s_vars = {i: plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"s_{i}") for i in set_R}
+    # Requests are only allowed between latency-feasible pairs, so those are the only variables
+    check_reachable(latencies, max_latency, request_rates)
+    pairs = feasible_pairs(latencies, max_latency)
+    x_vars = {(i, j): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"x_{i}_{j}") for i, j in pairs}
+    s_vars, region_servers, region_capacity = server_variables(capacities)
+    incoming = {j: [] for j in set_R}
+    outgoing = {i: [] for i in set_R}
+    for (i, j), x in x_vars.items():
+        incoming[j].append(x)
+        outgoing[i].append(x)
 
     # Cap the number of servers
     opt_model.addConstraint(
         plp.LpConstraint(
-            e=plp.lpSum(s_vars[i] for i in set_R), sense=plp.LpConstraintLE, rhs=max_servers, name="max_server"
+            e=plp.lpSum(region_servers[i] for i in set_R), sense=plp.LpConstraintLE, rhs=max_servers, name="max_server"
         )
     )
 
@@ -216,7 +512,7 @@ def place_servers_carbon_greedy(request_rates, capacities, latencies, carbon_int
     for j in set_R:
         opt_model.addConstraint(
             plp.LpConstraint(
-                e=plp.lpSum(x_vars[i, j] for i in set_R) - s_vars[j] * capacities[j],
+                e=plp.lpSum(incoming[j]) - region_capacity[j],
                 sense=plp.LpConstraintLE,
                 rhs=0,
                 name=f"capacity_const{j}",
@@ -227,111 +523,259 @@ def place_servers_carbon_greedy(request_rates, capacities, latencies, carbon_int
     for i in set_R:
         opt_model.addConstraint(
             plp.LpConstraint(
-                e=plp.lpSum(x_vars[i, j] for j in set_R),
+                e=plp.lpSum(outgoing[i]),
                 sense=plp.LpConstraintEQ,
                 rhs=request_rates[i],
                 name=f"sched_all_reqs_const{i}",
             )
         )
 
-    # Latency constraint
-    for i in set_R:
-        for j in set_R:
+    objective = plp.lpSum(x_vars[i, j] * carbon_intensities[j] for i, j in pairs)
+
+    if server_costs is not None:
+        objective += plp.lpSum(s * server_costs[k] for (i, k), s in s_vars.items())
+
+    # m_vars[j] >= servers started in region j (of class k)
+    if migration_cost > 0 and current_servers is not None:
+        current_servers = np.asarray(current_servers)
+        m_vars = {}
+        for key, s in s_vars.items():
+            suffix = "_".join(str(index) for index in np.atleast_1d(key))
+            m_vars[key] = plp.LpVariable(lowBound=0, name=f"m_{suffix}")
             opt_model.addConstraint(
                 plp.LpConstraint(
-                    e=x_vars[i, j] * (latencies[i][j] - max_latency),
-                    sense=plp.LpConstraintLE,
+                    e=m_vars[key] - s + current_servers[key],
+                    sense=plp.LpConstraintGE,
                     rhs=0,
-                    name=f"latency_const{i}_{j}",
+                    name=f"migration_const{suffix}",
                 )
             )
-
-    objective = plp.lpSum(x_vars[i, j] * carbon_intensities[j] for i in set_R for j in set_R)
+        objective += migration_cost * plp.lpSum(m_vars.values())
 
     opt_model.setObjective(objective)
-    opt_model.solve(plp.PULP_CBC_CMD(msg=0))
-    requests = np.zeros((len(set_R), len(set_R)), dtype=int)
-    for i, j in x_vars.keys():
-        requests[i, j] = int(x_vars[i, j].varValue)
+    return opt_model, x_vars, s_vars
+
+def place_servers_carbon_greedy(
+    request_rates,
+    capacities,
+    latencies,
+    carbon_intensities,
+    max_servers,
+    max_latency,
+    current_servers=None,
+    migration_cost=0,
+    server_costs=None,
+):
+    """
+    This is the Carbon Aware Provisioner (CAP) where the placement of servers are determined.
+    For example if one region have a low carbon intensity for the next hours, more servers
+    should be allocated there. Every server started in a region costs migration_cost, so with
+    current_servers set the placement avoids churn that saves less carbon than it costs. With
+    capacities per server class, the servers of every class are placed and each one costs
+    server_costs[k], so the cheapest mix of classes that fits the requests is picked.
 
-    if opt_model.sol_status != 1:
-        return np.zeros(n_regions), requests, -10000
+    If problem was not solved, a negative objective value is returned
 
-    return np.array([int(s.varValue) for s in s_vars.values()]), requests, objective.value()
+    Args:
+        request_rates: request_rates[i] is the number of requests from region i
+        capacities: capacities[i] is the average capacity per server in region i
+        latencies: latencies[i][j] is the latency from region i to j
+        carbon_intensities: carbon_intensities[i] is the carbon intensity in region i
+        max_servers: max_servers is the maximum number of servers
+        max_latency: max_latency is the maximum latency allowed
+        current_servers: current_servers[i] (or current_servers[i][k]) is the number of servers in
+        region i now. Defaults to None, i.e. no migration cost.
+        migration_cost: Cost per server started in a region. Defaults to 0.
+        server_costs: server_costs[k] is the cost per server of class k, only with capacities[i][k].
+        Defaults to None.
+    Returns:
+        return1: x[i][j] is the number of requests from region i that should
+        be sent to region j.
+        return2: n_servers[i] (or n_servers[i][k] per server class) is the number of servers that should
+        be started in region i.
+        return3: objective value.
+    """
 
+    opt_model, x_vars, s_vars = carbon_greedy_model(
+        request_rates,
+        capacities,
+        latencies,
+        carbon_intensities,
+        max_servers,
+        max_latency,
+        current_servers,
+        migration_cost,
+        server_costs,
+    )
+    n_regions = len(carbon_intensities)
+    opt_model.solve(plp.PULP_CBC_CMD(msg=0, gapAbs=server_cost_gap(server_costs)))
 
-def sched_reqs_carbon_greedy(request_rates, capacities, latencies, carbon_intensities, servers, max_latency):
+    if opt_model.sol_status != 1:
+        return np.zeros(np.shape(capacities)), np.zeros((n_regions, n_regions), dtype=int), -10000
+
+    requests = np.zeros((n_regions, n_regions), dtype=int)
+    for (i, j), x in x_vars.items():
+        requests[i, j] = int(x.varValue)
+
+    return server_values(s_vars, capacities), requests, opt_model.objective.value()
+
+
+def place_servers_horizon(
+    request_rates,
+    capacities,
+    latencies,
+    carbon_intensities,
+    max_servers,
+    max_latency,
+    initial_servers=None,
+    migration_cost=0,
+    warm_start=None,
+):
     """
-    This is the Carbon Aware Scheduler (CAS).
-    CAS schedules the requests given a fixed server placement that has been determined by
-    the CAP.
+    The CAP solved jointly over several hours. Servers started in a region from one hour to the next
+    cost migration_cost each, which lets the placement trade carbon against churn.
+
     If problem was not solved, a negative objective value is returned
 
     Args:
-        param1: req_rates[i] is the number of requests from region i
-        param2: capacities[i] is the aggregate capacity of servers in region i
-        param3: latencies[i][j] is the latency from region i to j
-        param4: carb_intensities[i] is the carb intensity in region i
-        param5: max_servers is the maximum number of servers
-        param6: max_latency is the maximum latency allowed
+        request_rates: request_rates[h][i] is the number of requests from region i in hour h
+        capacities: capacities[i] is the average capacity per server in region i
+        latencies: latencies[i][j] is the latency from region i to j
+        carbon_intensities: carbon_intensities[h][i] is the carbon intensity in region i in hour h
+        max_servers: max_servers is the maximum number of servers per hour
+        max_latency: max_latency is the maximum latency allowed
+        initial_servers: initial_servers[i] is the number of servers in region i before the first hour.
+        Defaults to None, i.e. no migration cost for the first hour.
+        migration_cost: Cost per server started in a region. Defaults to 0.
+        warm_start: (servers, requests) from a previous plan, servers[h][i] and requests[h][i][j],
+        for the first hours of the window. Defaults to None.
     Returns:
-        return1: x[i][j] is the number of requests from region i that should
-        be sent to region j.
-        return2: n_servers[i] is the number of servers that should be started
-        in region i.
+        return1: n_servers[h][i] is the number of servers that should be started
+        in region i in hour h.
+        return2: x[h][i][j] is the number of requests from region i that should
+        be sent to region j in hour h.
         return3: objective value.
     """
-
     opt_model = plp.LpProblem(name="model")
-    n_regions = len(carbon_intensities)
+    n_hours = len(request_rates)
+    n_regions = len(capacities)
+    set_H = range(n_hours)  # Hour set
     set_R = range(n_regions)  # Region set
-    x_vars = {(i, j): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"x_{i}_{j}") for i in set_R for j in set_R}
-
-    for j in set_R:
+    check_reachable(latencies, max_latency, request_rates)
+    pairs = feasible_pairs(latencies, max_latency)
+    x_vars = {
+        (h, i, j): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"x_{h}_{i}_{j}")
+        for h in set_H
+        for i, j in pairs
+    }
+    s_vars = {(h, j): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"s_{h}_{j}") for h in set_H for j in set_R}
+    incoming = {(h, j): [] for h in set_H for j in set_R}
+    outgoing = {(h, i): [] for h in set_H for i in set_R}
+    for (h, i, j), x in x_vars.items():
+        incoming[h, j].append(x)
+        outgoing[h, i].append(x)
+
+    for h in set_H:
+        # Cap the number of servers
         opt_model.addConstraint(
             plp.LpConstraint(
-                e=plp.lpSum(x_vars[i, j] for i in set_R) - servers[j] * capacities[j],
+                e=plp.lpSum(s_vars[h, j] for j in set_R),
                 sense=plp.LpConstraintLE,
-                rhs=0,
-                name=f"capacity_const{j}",
+                rhs=max_servers,
+                name=f"max_server{h}",
             )
         )
 
-    # Sum of request rates lambda must be equal to number of
-    # requests scheduled
-    for i in set_R:
-        opt_model.addConstraint(
-            plp.LpConstraint(
-                e=plp.lpSum(x_vars[i, j] for j in set_R),
-                sense=plp.LpConstraintEQ,
-                rhs=request_rates[i],
-                name=f"sched_all_reqs_const{i}",
-            )
-        )
-
-    # Latency constraint
-    for i in set_R:
+        # Per server max capacity
         for j in set_R:
             opt_model.addConstraint(
                 plp.LpConstraint(
-                    e=x_vars[i, j] * (latencies[i][j] - max_latency),
+                    e=plp.lpSum(incoming[h, j]) - s_vars[h, j] * capacities[j],
                     sense=plp.LpConstraintLE,
                     rhs=0,
-                    name=f"latency_const{i}_{j}",
+                    name=f"capacity_const{h}_{j}",
                 )
             )
 
-    objective = plp.lpSum(x_vars[i, j] * carbon_intensities[j] for i in set_R for j in set_R)
+        # All requests from a region must go somewhere.
+        for i in set_R:
+            opt_model.addConstraint(
+                plp.LpConstraint(
+                    e=plp.lpSum(outgoing[h, i]),
+                    sense=plp.LpConstraintEQ,
+                    rhs=request_rates[h][i],
+                    name=f"sched_all_reqs_const{h}_{i}",
+                )
+            )
+
+    objective = plp.lpSum(x * carbon_intensities[h][j] for (h, i, j), x in x_vars.items())
+
+    # m_vars[h, j] >= servers started in region j at hour h
+    if migration_cost > 0:
+        m_vars = {(h, j): plp.LpVariable(lowBound=0, name=f"m_{h}_{j}") for h in set_H for j in set_R}
+        for h in set_H:
+            if h == 0 and initial_servers is None:
+                continue
+            for j in set_R:
+                previous = s_vars[h - 1, j] if h > 0 else initial_servers[j]
+                opt_model.addConstraint(
+                    plp.LpConstraint(
+                        e=m_vars[h, j] - s_vars[h, j] + previous,
+                        sense=plp.LpConstraintGE,
+                        rhs=0,
+                        name=f"migration_const{h}_{j}",
+                    )
+                )
+        objective += migration_cost * plp.lpSum(m_vars.values())
+
     opt_model.setObjective(objective)
-    opt_model.solve(plp.PULP_CBC_CMD(msg=0))
-    requests = np.zeros((len(set_R), len(set_R)), dtype=int)
-    for i, j in x_vars.keys():
-        requests[i, j] = int(x_vars[i, j].varValue)
+
+    if warm_start is not None:
+        warm_servers, warm_requests = warm_start
+        for h in range(min(n_hours, len(warm_servers))):
+            for j in set_R:
+                s_vars[h, j].setInitialValue(warm_servers[h][j])
+            for i, j in pairs:
+                x_vars[h, i, j].setInitialValue(warm_requests[h][i][j])
+    opt_model.solve(plp.PULP_CBC_CMD(msg=0, warmStart=warm_start is not None))
 
     if opt_model.sol_status != 1:
-        #        print("[x] Did not find a request schedule! Returning all 0's")
-        return np.zeros((n_regions, n_regions)), -10000
-    return requests, objective.value()
+        return np.zeros((n_hours, n_regions), dtype=int), np.zeros((n_hours, n_regions, n_regions), dtype=int), -10000
+
+    servers = np.zeros((n_hours, n_regions), dtype=int)
+    for (h, j), s in s_vars.items():
+        servers[h, j] = int(s.varValue)
+    requests = np.zeros((n_hours, n_regions, n_regions), dtype=int)
+    for (h, i, j), x in x_vars.items():
+        requests[h, i, j] = int(x.varValue)
+
+    return servers, requests, opt_model.objective.value()
+
+
+def sched_reqs_carbon_greedy(request_rates, capacities, latencies, carbon_intensities, servers, max_latency):
+    """
+    This is the Carbon Aware Scheduler (CAS).
+    CAS schedules the requests given a fixed server placement that has been determined by
+    the CAP.
+    If problem was not solved, a negative objective value is returned
+
+    Args:
+        param1: req_rates[i] is the number of requests from region i
+        param2: capacities[i] is the aggregate capacity of servers in region i
+        param3: latencies[i][j] is the latency from region i to j
+        param4: carb_intensities[i] is the carb intensity in region i
+        param5: max_servers is the maximum number of servers
+        param6: max_latency is the maximum latency allowed
+    Returns:
+        return1: x[i][j] is the number of requests from region i that should
+        be sent to region j.
+        return2: n_servers[i] is the number of servers that should be started
+        in region i.
+        return3: objective value.
+    """
+
+    scheduler = RequestScheduler(latencies, "carbon", max_latency)
+    return scheduler.solve(request_rates, capacities, carbon_intensities, servers)
 
 def sched_reqs_latency_greedy(request_rates, capacities, latencies, carbon_intensities, servers):
     """
@@ -355,41 +799,113 @@ def sched_reqs_latency_greedy(request_rates, capacities, latencies, carbon_inten
         return3: objective value.
     """
 
-    opt_model = plp.LpProblem(name="model")
-    n_regions = len(carbon_intensities)
-    set_R = range(n_regions)  # Region set
-    x_vars = {(i, j): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"x_{i}_{j}") for i in set_R for j in set_R}
+    scheduler = RequestScheduler(latencies, "latency")
+    return scheduler.solve(request_rates, capacities, carbon_intensities, servers)
 
-    for j in set_R:
-        opt_model.addConstraint(
-            plp.LpConstraint(
-                e=plp.lpSum(x_vars[i, j] for i in set_R) - servers[j] * capacities[j],
-                sense=plp.LpConstraintLE,
-                rhs=0,
-                name=f"capacity_const{j}",
+
+class RequestScheduler:
+    """
+    Persistent model of the CAS. The variables and constraints are built once for a set of regions,
+    every call to solve() only updates the request rates, server capacities and carbon costs
+    and re-solves with the previous solution as a warm start.
+    """
+
+    def __init__(self, latencies, objective="carbon", max_latency=None):
+        """
+
+        Args:
+            latencies: latencies[i][j] is the latency from region i to j
+            objective: What to minimize, carbon/latency. Defaults to "carbon".
+            max_latency: max_latency is the maximum latency allowed, only used when minimizing carbon.
+        """
+        assert objective in ["carbon", "latency"], objective
+        self.objective = objective
+        self.n_regions = len(latencies)
+        self.opt_model = plp.LpProblem(name="model")
+        set_R = range(self.n_regions)  # Region set
+        # When minimizing carbon, requests are only allowed between latency-feasible pairs
+        max_latency = max_latency if objective == "carbon" else None
+        pairs = feasible_pairs(latencies, max_latency)
+        # Regions without a feasible destination can only be solved while they have no requests
+        self.latencies = latencies
+        self.max_latency = max_latency
+        self.unreachable = ~feasible_mask(latencies, max_latency).any(axis=1)
+        self.x_vars = {(i, j): plp.LpVariable(cat=plp.LpInteger, lowBound=0, name=f"x_{i}_{j}") for i, j in pairs}
+        incoming = {j: [] for j in set_R}
+        outgoing = {i: [] for i in set_R}
+        for (i, j), x in self.x_vars.items():
+            incoming[j].append(x)
+            outgoing[i].append(x)
+
+        # Capacity of servers in region j, rhs is set in solve()
+        self.capacity_consts = []
+        for j in set_R:
+            const = plp.LpConstraint(
+                e=plp.lpSum(incoming[j]), sense=plp.LpConstraintLE, rhs=0, name=f"capacity_const{j}"
             )
-        )
+            self.opt_model.addConstraint(const)
+            self.capacity_consts.append(const)
+
+        # Sum of request rates lambda must be equal to number of
+        # requests scheduled, rhs is set in solve()
+        self.request_consts = []
+        for i in set_R:
+            const = plp.LpConstraint(
+                e=plp.lpSum(outgoing[i]), sense=plp.LpConstraintEQ, rhs=0, name=f"sched_all_reqs_const{i}"
+            )
+            self.opt_model.addConstraint(const)
+            self.request_consts.append(const)
 
-    # Sum of request rates lambda must be equal to number of
-    # requests scheduled
-    for i in set_R:
-        opt_model.addConstraint(
-            plp.LpConstraint(
-                e=plp.lpSum(x_vars[i, j] for j in set_R),
-                sense=plp.LpConstraintEQ,
-                rhs=request_rates[i],
-                name=f"sched_all_reqs_const{i}",
+        if objective == "latency":
+            # The latencies never change, so neither does the objective
+            self.opt_model.setObjective(
+                plp.LpAffineExpression([(x, latencies[i][j]) for (i, j), x in self.x_vars.items()])
             )
-        )
 
-    objective = plp.lpSum(x_vars[i, j] * latencies[i][j] for i in set_R for j in set_R)
-    opt_model.setObjective(objective)
-    opt_model.solve(plp.PULP_CBC_CMD(msg=0))
-    requests = np.zeros((len(set_R), len(set_R)), dtype=int)
-    for i, j in x_vars.keys():
-        requests[i, j] = int(x_vars[i, j].varValue)
+        self.solver = plp.PULP_CBC_CMD(msg=0, warmStart=True)
+        self.warm = False
+
+    def solve(self, request_rates, capacities, carbon_intensities, servers):
+        """Updates the model with the current interval and re-solves it.
+
+        If problem was not solved, a negative objective value is returned
+
+        Args:
+            request_rates: request_rates[i] is the number of requests from region i
+            capacities: capacities[i] is the average capacity per server in region i
+            carbon_intensities: carbon_intensities[i] is the carbon intensity in region i
+            servers: servers[i] is the number of servers in region i
+
+        Returns:
+            return1: x[i][j] is the number of requests from region i that should
+            be sent to region j.
+            return2: objective value.
+        """
+        n_regions = self.n_regions
+        if np.any(np.asarray(request_rates)[self.unreachable] > 0):
+            check_reachable(self.latencies, self.max_latency, request_rates)
+        for j, const in enumerate(self.capacity_consts):
+            const.changeRHS(servers[j] * capacities[j])
+        for i, const in enumerate(self.request_consts):
+            const.changeRHS(request_rates[i])
+
+        if self.objective == "carbon":
+            self.opt_model.setObjective(
+                plp.LpAffineExpression([(x, carbon_intensities[j]) for (i, j), x in self.x_vars.items()])
+            )
 
-    if opt_model.sol_status != 1:
-        #        print("[x] Did not find a request schedule! Returning all 0's")
-        return np.zeros((n_regions, n_regions)), -10000
-    return requests, objective.value()
+        # Start from the previous solution, CBC discards it if it is no longer feasible
+        if self.warm:
+            for x in self.x_vars.values():
+                x.setInitialValue(x.varValue)
+        self.opt_model.solve(self.solver)
+
+        if self.opt_model.sol_status != 1:
+            self.warm = False
+            return np.zeros((n_regions, n_regions)), -10000
+
+        self.warm = True
+        requests = np.zeros((n_regions, n_regions), dtype=int)
+        for (i, j), x in self.x_vars.items():
+            requests[i, j] = int(x.varValue)
+        return requests, self.opt_model.objective.value()
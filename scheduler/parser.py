@@ -22,12 +22,21 @@ def parse_arguments(argv):
         "-r",
         "--request-update-interval",
         type=int,
-        help="The number of minutes between each scheduling",
-        choices=range(0, 61),
-        metavar="[0-60]",
+        help="The number of minutes between each scheduling, a divisor of 60 so every hour is split into whole "
+        "intervals",
+        # Other lengths would leave the end of every hour unscheduled
+        choices=[minutes for minutes in range(1, 61) if 60 % minutes == 0],
+        metavar="{1,2,3,4,5,6,10,12,15,20,30,60}",
         default=10,
     )
 
+    parser.add_argument(
+        "--interpolate",
+        help="Interpolate the hourly request rates and carbon intensities within the hour, keeping the requests "
+        "of every hour exact, instead of splitting each hour evenly (rounded down)",
+        action="store_true",
+    )
+
     parser.add_argument(
         "--load", type=str, help="Name of file to load and plot",
     )
@@ -60,9 +69,102 @@ def parse_arguments(argv):
         "-c", "--server-capacity", type=int, help="The capacity of each server", default=100_000,
     )
 
+    parser.add_argument(
+        "--server-classes",
+        type=str,
+        help="JSON file of server classes with their capacity and cost, optionally per region, see "
+        "scheduler.capacity. Replaces --server-capacity",
+    )
+
     parser.add_argument(
         "-ty", "--type-scheduler", type=str, help="Define what you wish to minimize: carbon/latency", default="carbon"
     )
 
-    return parser.parse_args(argv)
+    parser.add_argument(
+        "--solver",
+        type=str,
+        choices=["cbc", "transport"],
+        help="Solver for scheduling requests. cbc: MILP through PuLP, transport: in-process transportation problem",
+        default="cbc",
+    )
+
+    parser.add_argument(
+        "--solution-cache",
+        type=int,
+        help="Number of solved CAP/CAS instances kept in memory and reused for identical inputs, 0 disables it",
+        default=1024,
+    )
+
+    parser.add_argument(
+        "--solution-cache-dir",
+        type=str,
+        help="Also keep solved instances in this directory, shared between processes (e.g. the workers of a sweep)",
+    )
+
+    parser.add_argument(
+        "--forecast",
+        type=str,
+        choices=["perfect", "seasonal_naive", "ewma", "holt_winters"],
+        help="How the servers are placed for the next hour. perfect: the true traces, otherwise forecasts from the "
+        "hours before",
+        default="perfect",
+    )
+
+    parser.add_argument(
+        "--horizon",
+        type=int,
+        help="Number of hours to plan the server placement over, 0 plans one hour at a time (carbon only)",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--horizon-step",
+        type=int,
+        help="Number of hours a plan is reused before re-planning, defaults to horizon // 2",
+    )
+
+    parser.add_argument(
+        "--migration-cost",
+        type=float,
+        help="Cost per server started in a region, in the unit of the carbon objective, makes the placement avoid "
+        "churn",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        help="Maximum memory in MB for the gathered metrics, longer runs are spilled to disk in chunks",
+    )
+
+    parser.add_argument(
+        "--stream-every",
+        type=int,
+        help="Write the results to /saved every N intervals while running instead of keeping them in memory",
+    )
+
+    parser.add_argument(
+        "--stream-format",
+        type=str,
+        choices=["csv", "parquet"],
+        help="File format of the streamed results, parquet requires pyarrow",
+        default="csv",
+    )
+
+    parser.add_argument(
+        "--no-plot", help="Headless mode, skip matplotlib and the summary figure entirely", action="store_true",
+    )
+
+    parser.add_argument(
+        "--plot-file", type=str, help="Render the summary figure to this file (e.g. PNG) instead of showing it",
+    )
+
+    parser.add_argument(
+        "--label", type=str, help="Appended to the names of saved files, a sweep sets it to the grid values of a run",
+    )
 
+    args = parser.parse_args(argv)
+    # The rolling horizon plans on the true traces and would silently take precedence over the forecasts
+    if args.horizon and args.forecast != "perfect":
+        parser.error("--horizon cannot be combined with --forecast")
+    return args
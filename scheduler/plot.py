@@ -1,6 +1,7 @@
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+import os
+import tempfile
 from scheduler.util import get_regions
 
 
@@ -8,16 +9,20 @@ class Plot:
     """
     Holds data during runtime and plots it at end of simulation.
     """
-    def __init__(self, conf) -> None:
+    def __init__(self, conf, memory_budget=None) -> None:
         """_summary_
 
         Args:
             conf: Runtime configurations
+            memory_budget: Maximum size of the in-memory buffer in bytes. Longer runs are spilled to
+            disk in chunks of this size. Defaults to conf.memory_budget (MB) if set, otherwise unbounded.
 
         Attributes:
             region_names: Which continent to load (containing several regions)
             columns : Column labels for dataframe to simplify plotting
-            data : Data for plotting, appended during runtime
+            data : Preallocated buffer, data[k] is the k:th row added since the last spill
+            n_rows : Number of rows added in total
+            chunks : Paths of the chunks spilled to disk
 
         """
         self.conf = conf
@@ -35,14 +40,61 @@ class Plot:
             *[f"{name}_latency" for name in self.region_names],
             "total_dropped_requests",
             *[f"{name}_dropped_requests" for name in self.region_names],
+            "total_served_requests",
+            *[f"{name}_served_requests" for name in self.region_names],
             "total_utilization",
             *[f"{name}_utilization" for name in self.region_names],
             "total_servers",
             *[f"{name}_servers" for name in self.region_names],
         ]
-        self.data = []
         self.mean_latency = 0
 
+        # Position of every group of columns in a row, in the order of self.columns
+        n_regions = len(self.region_names)
+        groups = [
+            ("timestep", False),
+            ("interval", False),
+            ("total_requests", False),
+            ("requests_from", True),
+            ("requests_to", True),
+            ("carbon_intensity", True),
+            ("total_carbon_emissions", False),
+            ("carbon_emissions", True),
+            ("mean_latency", False),
+            ("latency", True),
+            ("total_dropped_requests", False),
+            ("dropped_requests", True),
+            ("total_served_requests", False),
+            ("served_requests", True),
+            ("total_utilization", False),
+            ("utilization", True),
+            ("total_servers", False),
+            ("servers", True),
+        ]
+        self.slices = {}
+        offset = 0
+        for name, per_region in groups:
+            if per_region:
+                self.slices[name] = slice(offset, offset + n_regions)
+                offset += n_regions
+            else:
+                self.slices[name] = offset
+                offset += 1
+        assert offset == len(self.columns), (offset, len(self.columns))
+
+        # One row per scheduling interval
+        expected_rows = (conf.timesteps + 1) * (60 // max(conf.request_update_interval, 1))
+        if memory_budget is None and getattr(conf, "memory_budget", None):
+            memory_budget = conf.memory_budget * 2 ** 20
+        self.chunk_rows = None
+        if memory_budget is not None:
+            self.chunk_rows = max(1, int(memory_budget) // (len(self.columns) * 8))
+            expected_rows = min(expected_rows, self.chunk_rows)
+        self.data = np.zeros((max(expected_rows, 1), len(self.columns)))
+        self.n_rows = 0
+        self.chunks = []
+        self.spill_dir = None
+
     def add(
         self,
         server_manager,
@@ -53,6 +105,8 @@ class Plot:
         t,
         interval,
         request_update_interval,
+        served_requests_per_region=None,
+        unscheduled_requests_per_region=None,
     ):
         """Adds data during runtime to data
 
@@ -65,11 +119,20 @@ class Plot:
             t: _description_
             interval: _description_
             request_update_interval: _description_
+            served_requests_per_region: Requests placed at servers per region. Defaults to every
+            request that was not dropped.
+            unscheduled_requests_per_region: Requests of each region the CAS could not allocate, they are
+            dropped at their source and count for neither carbon emissions nor latency. Defaults to None.
         """
         total_requests_to_region = np.sum(requests_per_region, axis=0)
+        if served_requests_per_region is None:
+            served_requests_per_region = total_requests_to_region - np.asarray(dropped_requests_per_region)
         total_requests_from_region = np.sum(requests_per_region, axis=1)
 
         assert sum(total_requests_from_region) == sum(total_requests_to_region)
+        if unscheduled_requests_per_region is not None:
+            total_requests_from_region = total_requests_from_region + unscheduled_requests_per_region
+            dropped_requests_per_region = np.asarray(dropped_requests_per_region) + unscheduled_requests_per_region
 
         mask = total_requests_to_region != 0
 
@@ -85,30 +148,78 @@ class Plot:
 
         mean_latency = np.mean(latencies[mask])
         total_carbon_emissions = np.sum(carbon_emissions[mask])
-        total_requests = np.sum(total_requests_to_region)
+        total_requests = np.sum(total_requests_from_region)
         total_dropped_requests = np.sum(dropped_requests_per_region)
+        total_served_requests = np.sum(served_requests_per_region)
         total_utilization = np.mean(total_requests / np.sum(capacities + (capacities == 0)))
         total_servers = np.sum(servers_per_region)
 
-        frame = (
-            t,
-            interval,
-            total_requests,
-            *total_requests_from_region,
-            *total_requests_to_region,
-            *carbon_intensity,
-            total_carbon_emissions,
-            *carbon_emissions,
-            mean_latency,
-            *latencies,
-            total_dropped_requests,
-            *dropped_requests_per_region,
-            total_utilization,
-            *utilization_per_region,
-            total_servers,
-            *servers_per_region,
-        )
-        self.data.append(frame)
+        # next_row() may grow or spill the buffer, so only look it up afterwards
+        index = self.next_row()
+        row = self.data[index]
+        row[self.slices["timestep"]] = t
+        row[self.slices["interval"]] = interval
+        row[self.slices["total_requests"]] = total_requests
+        row[self.slices["requests_from"]] = total_requests_from_region
+        row[self.slices["requests_to"]] = total_requests_to_region
+        row[self.slices["carbon_intensity"]] = carbon_intensity
+        row[self.slices["total_carbon_emissions"]] = total_carbon_emissions
+        row[self.slices["carbon_emissions"]] = carbon_emissions
+        row[self.slices["mean_latency"]] = mean_latency
+        row[self.slices["latency"]] = latencies
+        row[self.slices["total_dropped_requests"]] = total_dropped_requests
+        row[self.slices["dropped_requests"]] = dropped_requests_per_region
+        row[self.slices["total_served_requests"]] = total_served_requests
+        row[self.slices["served_requests"]] = served_requests_per_region
+        row[self.slices["total_utilization"]] = total_utilization
+        row[self.slices["utilization"]] = utilization_per_region
+        row[self.slices["total_servers"]] = total_servers
+        row[self.slices["servers"]] = servers_per_region
+
+    def next_row(self):
+        """Index in the buffer of the next row to write. Spills the buffer to disk when it is full and
+        a memory budget is set, otherwise the buffer grows.
+
+        Returns:
+            Row index into self.data
+        """
+        index = self.n_rows - self.spilled_rows()
+        if index == len(self.data):
+            if self.chunk_rows is not None:
+                self.spill()
+                index = 0
+            else:
+                self.data = np.concatenate((self.data, np.zeros_like(self.data)))
+        self.n_rows += 1
+        return index
+
+    def spilled_rows(self):
+        """
+        Returns:
+            Number of rows written to disk
+        """
+        return len(self.chunks) * len(self.data) if self.chunk_rows is not None else 0
+
+    def spill(self):
+        """Writes the full buffer to disk as a .npy chunk so the buffer can be reused"""
+        if self.spill_dir is None:
+            # Owned by the plot, the directory is removed with cleanup() or when the plot is collected
+            self._spill_dir = tempfile.TemporaryDirectory(prefix="casper_plot_")
+            self.spill_dir = self._spill_dir.name
+        path = os.path.join(self.spill_dir, f"chunk_{len(self.chunks)}.npy")
+        np.save(path, self.data)
+        self.chunks.append(path)
+
+    def close(self):
+        """Called at the end of the simulation. Nothing to flush for the in-memory buffer, the spilled
+        chunks are kept so the data can still be built afterwards."""
+
+    def cleanup(self):
+        """Removes the chunks spilled to disk, call it once the data of a spilled plot is no longer needed"""
+        if self.spill_dir is not None:
+            self._spill_dir.cleanup()
+            self.spill_dir = None
+            self.chunks = []
 
     def calculate_cumulative_avg_latency(self, df):
         """Gets the cumulative avg latency for ALL requests
@@ -136,15 +247,22 @@ class Plot:
         Returns:
             Data for a timestep
         """
-        return self.data[dt]
+        spilled = self.spilled_rows()
+        if dt < spilled:
+            return np.load(self.chunks[dt // len(self.data)], mmap_mode="r")[dt % len(self.data)]
+        return self.data[dt - spilled]
 
     def build_df(self):
         """Build DataFrame from data we've gathered during runtime.
 
         Returns:
-            Returns a dataframe with the data gathered.
+            Returns a dataframe with the data gathered. The dataframe is a view of the buffer unless
+            chunks have been spilled to disk.
         """
-        return pd.DataFrame(self.data, columns=self.columns)
+        data = self.data[: self.n_rows - self.spilled_rows()]
+        if self.chunks:
+            data = np.concatenate([np.load(path, mmap_mode="r") for path in self.chunks] + [data])
+        return pd.DataFrame(data, columns=self.columns, copy=False)
 
     def plot_total_carbon(self, group_df, labels):
         """Plots total carbon, called from notebook to compare
@@ -153,6 +271,8 @@ class Plot:
             group_df: A dataframe grouped by timesteps, see notebook
             labels: Labels the type of scheduler used
         """
+        import matplotlib.pyplot as plt
+
         fig, axs = plt.subplots(1, 1, figsize=(15,6))
 
         carbon = []
@@ -165,12 +285,21 @@ class Plot:
 
         return (carbon[0], carbon[1])
 
-    def plot(self, df=None):
+    def plot(self, df=None, path=None):
         """Displays region-specific data aswell as averages of regions for the plot
 
         Args:
             df: Data for regions. Defaults to None.
+            path: Render the figure to this file with a non-interactive backend instead of showing it.
+            Defaults to None.
         """
+        # matplotlib is only imported when something is rendered, it dominates the startup time otherwise
+        import matplotlib
+
+        if path is not None:
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
         if df is None:
             df = self.build_df()
         df = df.groupby("timestep")
@@ -185,8 +314,12 @@ class Plot:
                 self.conf.latency,
                 "max_servers:",
                 self.conf.max_servers,
-                "server_capacity:",
-                self.conf.server_capacity,
+                # --server-classes replaces the single server capacity
+                *(
+                    ["server_classes:", os.path.basename(self.conf.server_classes)]
+                    if self.conf.server_classes
+                    else ["server_capacity:", self.conf.server_capacity]
+                ),
             ]
         )
         avg_latency = self.calculate_cumulative_avg_latency(df)
@@ -238,4 +371,8 @@ class Plot:
             i += 1
 
         fig.legend(["Mean/Total"] + self.region_names, loc="upper center", bbox_to_anchor=(0.5, 0.11), ncol=3)
-        plt.show()
+        if path is not None:
+            fig.savefig(path)
+            plt.close(fig)
+        else:
+            plt.show()
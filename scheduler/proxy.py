@@ -0,0 +1,330 @@
+"""Online request routing with the CAS allocation.
+
+The routing daemon holds the latest requests[i][j] matrix from schedule_requests() as a routing table
+and answers, for every request from region i, which region to send it to. A background task re-solves
+the CAS every interval and swaps the new table in, so no solver runs while a request is routed.
+
+The daemon speaks a line protocol over TCP. A line "<region>" is answered with the destination
+region, a line "<region> <payload>" is forwarded to the backend of the destination (if backends are
+given) and its answer is relayed. For example, with stub backends for every region:
+
+    python -m scheduler.proxy -p europe -d 2021-10-22 -m 200 -l 20 --port 8080 --stub-backends
+
+The request rates and carbon intensities are replayed from the traces, one scheduling interval
+every --interval-seconds.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import sys
+import numpy as np
+from scheduler.dispatch import build_selectors
+from scheduler.parser import parse_arguments
+
+
+class RoutingTable:
+    """
+    Per-source weighted routing table built from a requests[i][j] matrix. Requests from region i are
+    sent to region j in proportion to requests[i][j], see scheduler.dispatch for the selectors.
+    """
+
+    def __init__(self, region_names, requests, method="alias") -> None:
+        """
+        Args:
+            region_names: Names of the regions, in the order of the matrix
+            requests: requests[i][j] is the number of requests from region i that should be sent to region j
+            method: How destinations are selected, alias (random) or round_robin (deterministic).
+            Defaults to "alias".
+        """
+        requests = np.asarray(requests)
+        assert requests.shape == (len(region_names), len(region_names)), requests.shape
+        self.region_names = list(region_names)
+        self.index = {name: i for i, name in enumerate(self.region_names)}
+        self.method = method
+        self.selectors = build_selectors(requests, method)
+
+    def route(self, source, u=None):
+        """Destination of one request, regions without scheduled requests keep their requests
+
+        Args:
+            source: Index of the region sending the request
+            u: Uniform random number in [0, 1) for the alias method. Defaults to None, i.e. drawn from random.
+
+        Returns:
+            Index of the region to send the request to
+        """
+        selector = self.selectors[source]
+        if selector is None:
+            return source
+        return selector.sample(u)
+
+    def route_batch(self, source, size, rng=None):
+        """Destinations of many requests at once
+
+        Args:
+            source: Index of the region sending the requests
+            size: Number of requests
+            rng: NumPy random generator for the alias method. Defaults to None.
+
+        Returns:
+            Array of the indices of the regions to send the requests to
+        """
+        selector = self.selectors[source]
+        if selector is None:
+            return np.full(size, source)
+        return selector.sample_batch(size, rng)
+
+    def route_name(self, source):
+        """
+        Args:
+            source: Name of the region sending the request
+
+        Returns:
+            Name of the region to send the request to
+        """
+        return self.region_names[self.route(self.index[source])]
+
+
+class LiveSchedule:
+    """
+    Replays the traces one scheduling interval at a time, placing the servers every hour and
+    scheduling the requests of every interval like the simulation does.
+    """
+
+    def __init__(self, conf, regions=None) -> None:
+        """
+        Args:
+            conf: Runtime configurations
+            regions: Already loaded regions. Defaults to None.
+        """
+        # Imported here, __main__ pulls in the plotting and sink modules the daemon does not need
+        from scheduler.__main__ import move
+        from scheduler.milp_sched import schedule_requests
+        from scheduler.resolution import Timeline
+        from scheduler.server import ServerManager
+
+        self._move = move
+        self._schedule_requests = schedule_requests
+        self.conf = conf
+        self.server_manager = ServerManager(conf, regions=regions)
+        self.intervals = 60 // conf.request_update_interval
+        self.timeline = Timeline(
+            self.server_manager.regions,
+            conf.timesteps + 1,
+            self.intervals,
+            rate=conf.rate,
+            interpolate=conf.interpolate,
+        )
+        self.steps = itertools.count()
+
+    @property
+    def region_names(self):
+        return [region.name for region in self.server_manager.regions]
+
+    def next(self):
+        """Schedules the next interval, starting over after the last timestep
+
+        Returns:
+            requests[i][j] is the number of requests from region i that should be sent to region j
+        """
+        t, i = divmod(next(self.steps), self.intervals)
+        t %= self.conf.timesteps + 1
+        if i == 0:
+            self._move(self.conf, self.server_manager, t, timeline=self.timeline)
+        _, _, requests = self._schedule_requests(
+            self.conf,
+            self.timeline.batches(self.server_manager.regions, t, i),
+            self.server_manager,
+            t,
+            self.intervals,
+            max_latency=self.conf.latency,
+            carbon_intensities=self.timeline.carbon_intensities[t, i],
+        )
+        return requests
+
+
+class StubBackend:
+    """
+    Local backend for testing, answers every line with "<region> <line>".
+    """
+
+    def __init__(self, region) -> None:
+        self.region = region
+        self.server = None
+        self.handled = 0
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Returns:
+            (host, port) the backend listens on
+        """
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def handle(self, reader, writer):
+        while line := await reader.readline():
+            self.handled += 1
+            writer.write(f"{self.region} {line.decode().strip()}\n".encode())
+            await writer.drain()
+        writer.close()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+class RoutingDaemon:
+    """
+    asyncio server routing requests with the latest routing table.
+    """
+
+    def __init__(self, region_names, requests=None, backends=None, method="alias") -> None:
+        """
+        Args:
+            region_names: Names of the regions, in the order of the matrices
+            requests: Initial requests[i][j] matrix. Defaults to None, i.e. every region keeps its requests.
+            backends: Dict of region name -> (host, port) to forward payloads to. Defaults to None.
+            method: How destinations are selected, see RoutingTable. Defaults to "alias".
+        """
+        if requests is None:
+            requests = np.eye(len(region_names), dtype=int)
+        self.table = RoutingTable(region_names, requests, method)
+        self.backends = backends or {}
+        self.server = None
+        self.updates = 0
+        # Payloads that could not be forwarded because the backend was unreachable
+        self.backend_errors = 0
+
+    def update(self, requests):
+        """Swaps in the routing table of a new schedule. The table is built before the swap, so a
+        request is always routed with either the old or the new table.
+
+        Args:
+            requests: requests[i][j] is the number of requests from region i that should be sent to region j
+        """
+        self.table = RoutingTable(self.table.region_names, requests, self.table.method)
+        self.updates += 1
+
+    async def refresh(self, schedule, period):
+        """Re-solves the schedule every period seconds, the solver runs in a worker thread so routing
+        is never blocked by it. The current table serves the first period, so the daemon has to be
+        started with the table of the current interval.
+
+        Args:
+            schedule: Object whose next() returns the next requests[i][j] matrix, e.g. LiveSchedule
+            period: Seconds between two schedules
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(period)
+            try:
+                requests = await loop.run_in_executor(None, schedule.next)
+                self.update(requests)
+            except Exception as e:
+                # Keep routing with the previous table
+                logging.warning(f"Could not update the routing table: {e}")
+
+    async def start(self, host="127.0.0.1", port=0):
+        """
+        Returns:
+            (host, port) the daemon listens on
+        """
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def handle(self, reader, writer):
+        connections = {}
+        try:
+            while line := await reader.readline():
+                source, _, payload = line.decode().strip().partition(" ")
+                if source not in self.table.index:
+                    writer.write(f"ERROR unknown region {source}\n".encode())
+                else:
+                    destination = self.table.route_name(source)
+                    if payload and destination in self.backends:
+                        writer.write(await self.forward(connections, destination, payload))
+                    else:
+                        writer.write(f"{destination}\n".encode())
+                await writer.drain()
+        finally:
+            for _, backend_writer in connections.values():
+                backend_writer.close()
+            writer.close()
+
+    async def forward(self, connections, destination, payload):
+        """Sends a payload to the backend of a region over a connection kept per client. A backend that
+        cannot be reached is counted in backend_errors and answered with an error line, its connection
+        is dropped and opened again for the next payload.
+
+        Returns:
+            Line answered by the backend
+        """
+        try:
+            if destination not in connections:
+                connections[destination] = await asyncio.open_connection(*self.backends[destination])
+            backend_reader, backend_writer = connections[destination]
+            backend_writer.write(f"{payload}\n".encode())
+            await backend_writer.drain()
+            answer = await backend_reader.readline()
+            if not answer:
+                raise ConnectionError("Connection closed by the backend")
+            return answer
+        except OSError as e:
+            # ConnectionError is a subclass of OSError
+            self.backend_errors += 1
+            logging.warning(f"Could not forward to the backend of {destination}: {e}")
+            if destination in connections:
+                connections.pop(destination)[1].close()
+            return f"ERROR backend of {destination} unreachable\n".encode()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+
+
+async def serve(conf, host, port, period, stub_backends=False, method="alias"):
+    schedule = LiveSchedule(conf)
+    region_names = schedule.region_names
+
+    backends = {}
+    stubs = []
+    if stub_backends:
+        for name in region_names:
+            stub = StubBackend(name)
+            backends[name] = await stub.start(host)
+            stubs.append(stub)
+
+    daemon = RoutingDaemon(region_names, schedule.next(), backends, method)
+    address = await daemon.start(host, port)
+    print(f"Routing {', '.join(region_names)} on {address[0]}:{address[1]}")
+    refresh = asyncio.create_task(daemon.refresh(schedule, period))
+    try:
+        await daemon.server.serve_forever()
+    finally:
+        refresh.cancel()
+        daemon.close()
+        for stub in stubs:
+            stub.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Routes requests with the CAS allocation")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--interval-seconds", type=float, help="Seconds between two schedules", default=60)
+    parser.add_argument("--stub-backends", help="Start a local stub backend for every region", action="store_true")
+    parser.add_argument(
+        "--dispatch",
+        type=str,
+        choices=["alias", "round_robin"],
+        help="Select destinations at random with alias tables or deterministically with smooth weighted round-robin",
+        default="alias",
+    )
+    args, argv = parser.parse_known_args(sys.argv[1:])
+    conf = parse_arguments(argv)
+    asyncio.run(serve(conf, args.host, args.port, args.interval_seconds, args.stub_backends, args.dispatch))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
 from fnmatch import translate
 import os
-import pandas as pd
 import math
+import numpy as np
 from scheduler.util import load_carbon_intensity, load_request_rate
 from scheduler.constants import REGION_LOCATIONS, REGION_OFFSETS
 from scheduler.util import get_regions
+from scheduler.latency import cloudping_latencies, latency_from_distance, EARTH_RADIUS
 
 
 class Region:
@@ -12,7 +13,7 @@ class Region:
     Region object to hold and get region-specific data.
     """
 
-    def __init__(self, name, location, carbon_intensity, requests_per_hour) -> None:
+    def __init__(self, name, location, carbon_intensity, requests_per_hour, offset=0) -> None:
         """Input properties when region is instantiated
 
         Args:
@@ -20,13 +21,14 @@ class Region:
             location: Deprecated for estimating latency
             carbon_intensity: Average carbon intensity during specified timeframe
             requests_per_hour: Requests per hour during specified timeframe
-            latency_df : Replaces latency estimation with real latency data
+            offset: Offset by hour of region. Defaults to 0.
         """
         self.name = name
         self.location = location
-        self.requests_per_interval = requests_per_hour
-        self.carbon_intensity = carbon_intensity
-        self.latency_df = pd.read_csv("api/cloudping/latency_50th.csv")
+        # Plain arrays, indexing a NumPy array is much cheaper than scalar access on a Series
+        self.requests_per_interval = None if requests_per_hour is None else np.ascontiguousarray(requests_per_hour)
+        self.carbon_intensity = np.ascontiguousarray(carbon_intensity)
+        self.offset = offset
 
     def get_requests_per_interval(self, t):
         """Get requests per hour for a timestep
@@ -37,7 +39,7 @@ class Region:
         Returns:
             Integer of requests for that hour
         """
-        return self.requests_per_interval.iloc[t]
+        return self.requests_per_interval[t]
 
     # def latency(self, other):
     #     (x1, y1) = self.location
@@ -54,10 +56,7 @@ class Region:
         Returns:
             Returns round-trip latency from region "self" to region "other"
         """
-        df = self.latency_df
-        i = df.columns.get_loc(self.name)
-        j = df.columns.get_loc(other.name)
-        return df.iloc[i, j]
+        return cloudping_latencies().get(self.name, other.name)
 
     #  def __repr__(self) -> str:
     #      return self.name
@@ -84,21 +83,38 @@ class Region:
 
         a = math.sin(dlat / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
         c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        d = 6371 * c
+        d = EARTH_RADIUS * c
 
-        return 0.022 * 0.62 * d + 4.862
+        return latency_from_distance(d)
 
 
-def load_regions(conf):
-    """Loads data for all regions from csv files and returns all regions
+def stack_traces(regions, attribute):
+    """Stacks a trace of every region into one matrix
+
+    Args:
+        regions: List of region objects
+        attribute: "carbon_intensity" or "requests_per_interval"
+
+    Returns:
+        Read-only array where [i][t] is the value of region i at hour t
+    """
+    matrix = np.stack([getattr(region, attribute) for region in regions])
+    matrix.setflags(write=False)
+    return matrix
+
+
+def load_regions(conf, date=None):
+    """Loads data for all regions from csv files and returns all regions.
+    Each trace is read once per process, later calls only slice the window of the date.
 
     Args:
         conf: Decides which continent of regions to load
+        date: Date to begin loading from. Defaults to conf.start_date.
 
     Returns:
         List of all region objects containing their specific data
     """
-    date = conf.start_date
+    date = date or conf.start_date
     regions = []
     d = "api"
     kind = ""
@@ -122,6 +138,6 @@ def load_regions(conf):
         request_path = "api/requests.csv"
         requests_per_hour = load_request_rate(request_path, offset, conf, date)
         carbon_intensity = load_carbon_intensity(path, offset, conf, date)
-        region = Region(name, location, carbon_intensity, requests_per_hour)
+        region = Region(name, location, carbon_intensity, requests_per_hour, offset)
         regions.append(region)
     return regions
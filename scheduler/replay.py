@@ -39,14 +39,10 @@ def main_replay():
                 conf, batches, server_manager, t, request_update_interval, max_latency=conf.latency
             )
 
-            # send requests to servers
-            server_manager.send(requests_per_region)
-
-            # dropped requests
-            dropped_requests_per_region = [0] * len(batches)
-            if len(server_manager.servers) == 0:
-                for i in range(len(batches)):
-                    dropped_requests_per_region[i] = batches[i].load
+            # send requests to servers, requests that do not fit on the servers of a region are dropped
+            served_requests_per_region, dropped_requests_per_region = server_manager.send(
+                requests_per_region, request_update_interval
+            )
 
             # save data to plot object
             plot.add(
@@ -58,6 +54,7 @@ def main_replay():
                 t,
                 i,
                 request_update_interval,
+                served_requests_per_region=served_requests_per_region,
             )
 
             # reset server utilization for every server before scheduling requests again
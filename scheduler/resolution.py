@@ -0,0 +1,142 @@
+"""Hourly traces resampled to the scheduling intervals.
+
+The traces are hourly, but requests are scheduled every few minutes. Timeline precomputes the request
+rates and carbon intensities of every interval of a run up front, so the simulation loop only indexes arrays.
+"""
+import numpy as np
+from scheduler.request import RequestBatch
+from scheduler.region import stack_traces
+
+
+def interval_midpoints(n_hours, intervals):
+    """
+    Args:
+        n_hours: Number of hours
+        intervals: Number of intervals per hour
+
+    Returns:
+        Time in hours of the middle of every interval, shape (n_hours, intervals)
+    """
+    return np.arange(n_hours)[:, None] + (np.arange(intervals)[None, :] + 0.5) / intervals
+
+
+def interpolate_hourly(hourly, intervals):
+    """Linear interpolation of an hourly trace, where the value of an hour is taken at its middle
+
+    Args:
+        hourly: hourly[h] (or hourly[h][i] for region i) is the value in hour h
+        intervals: Number of intervals per hour
+
+    Returns:
+        Value in the middle of every interval, shape (hours, intervals) or (hours, intervals, regions)
+    """
+    hourly = np.asarray(hourly, dtype=float)
+    n_hours = len(hourly)
+    hours = np.arange(n_hours) + 0.5
+    points = interval_midpoints(n_hours, intervals).ravel()
+    if hourly.ndim == 1:
+        return np.interp(points, hours, hourly).reshape(n_hours, intervals)
+    columns = [np.interp(points, hours, hourly[:, i]) for i in range(hourly.shape[1])]
+    return np.stack(columns, axis=-1).reshape(n_hours, intervals, hourly.shape[1])
+
+
+def split_hourly(hourly, intervals, interpolate=True):
+    """Splits hourly request counts into whole requests per interval. The intervals of an hour always
+    add up to exactly the requests of the hour, the remainder of rounding goes to the intervals with
+    the largest fractional parts.
+
+    Args:
+        hourly: hourly[h] (or hourly[h][i] for region i) is the number of requests in hour h
+        intervals: Number of intervals per hour
+        interpolate: Shape the split after the linearly interpolated trace instead of a flat split.
+        Defaults to True.
+
+    Returns:
+        Requests in every interval, shape (hours, intervals) or (hours, intervals, regions)
+    """
+    hourly = np.asarray(hourly, dtype=np.int64)
+    if interpolate:
+        weights = interpolate_hourly(hourly, intervals)
+        weights_sum = weights.sum(axis=1, keepdims=True)
+        weights = np.where(weights_sum > 0, weights / np.where(weights_sum > 0, weights_sum, 1), 1 / intervals)
+    else:
+        weights = np.full((len(hourly), intervals) + hourly.shape[1:], 1 / intervals)
+
+    exact = hourly[:, None] * weights
+    split = np.floor(exact).astype(np.int64)
+    remainder = hourly - split.sum(axis=1)
+
+    # rank[h][k] is the position of interval k when sorted by decreasing fractional part
+    order = np.argsort(-(exact - split), axis=1, kind="stable")
+    rank = np.argsort(order, axis=1, kind="stable")
+    split += rank < remainder[:, None]
+    return split
+
+
+class Timeline:
+    """
+    Request rates and carbon intensities of every region for every interval of a run.
+    """
+
+    def __init__(self, regions, n_hours, intervals, rate=None, interpolate=False) -> None:
+        """
+        Args:
+            regions: List of region objects
+            n_hours: Number of hours of the run
+            intervals: Number of intervals per hour
+            rate: Constant request rate per hour for every region. Defaults to None, i.e. the request trace.
+            interpolate: Interpolate the hourly traces within the hour and conserve the requests of every hour.
+            Defaults to False, i.e. every interval gets the rate of the hour divided by intervals (rounded down)
+            and the carbon intensity of the hour.
+        """
+        self.intervals = intervals
+        # One extra hour, so the last hour can be interpolated towards the next one
+        n_points = n_hours + 1
+        if rate:
+            hourly_requests = np.full((n_points, len(regions)), rate, dtype=np.int64)
+        else:
+            hourly_requests = stack_traces(regions, "requests_per_interval")[:, :n_points].T.astype(np.int64)
+        hourly_carbon = stack_traces(regions, "carbon_intensity")[:, :n_points].T.astype(float)
+
+        if interpolate:
+            self.requests = split_hourly(hourly_requests, intervals)[:n_hours]
+            self.carbon_intensities = interpolate_hourly(hourly_carbon, intervals)[:n_hours]
+        else:
+            self.requests = np.repeat(hourly_requests[:n_hours, None] // intervals, intervals, axis=1)
+            self.carbon_intensities = np.repeat(hourly_carbon[:n_hours, None], intervals, axis=1)
+
+    def peak_batches(self, regions, t):
+        """Servers handle their capacity divided by intervals in every interval, so placing them for
+        the busiest interval of the hour keeps every interval of the hour schedulable
+
+        Args:
+            regions: List of region objects
+            t: current timestep
+
+        Returns:
+            Batch of requests of every region at the hourly rate of its busiest interval in hour t
+        """
+        return [RequestBatch("", load, region) for load, region in zip(self.peak_rates(t)[0], regions)]
+
+    def peak_rates(self, t, n_hours=1):
+        """
+        Args:
+            t: current timestep
+            n_hours: Number of hours from t, cut at the end of the run. Defaults to 1.
+
+        Returns:
+            rates[h][i] is the hourly rate of the busiest interval of region i in hour t + h
+        """
+        return self.requests[t : t + n_hours].max(axis=1) * self.intervals
+
+    def batches(self, regions, t, interval):
+        """
+        Args:
+            regions: List of region objects
+            t: current timestep
+            interval: Interval within the hour
+
+        Returns:
+            Batch of requests of every region in the interval
+        """
+        return [RequestBatch("", load, region) for load, region in zip(self.requests[t, interval], regions)]
@@ -1,5 +1,7 @@
-from scheduler.region import Region, load_regions
-from scheduler.util import get_regions
+from scheduler.region import Region, load_regions, stack_traces
+from scheduler.latency import region_latencies
+from scheduler.migration import plan_migrations
+from scheduler.capacity import load_capacity_model
 import numpy as np
 import logging
 
@@ -54,8 +56,53 @@ class Server:
         self.utilization = 0
 
 
+class ManagedServer(Server):
+    """A server owned by the ServerManager. Its capacity and utilization are stored in the manager's
+       arrays, so pushing load to it is reflected in every per-region aggregate.
+
+       NOTE:
+       The handle refers to a position in the arrays and is only valid until the next ServerManager.move().
+    """
+
+    def __init__(self, manager, index: int):
+        """
+
+        Args:
+            manager: ServerManager holding the server arrays
+            index: Position of the server in the arrays
+        """
+        self.manager = manager
+        self.index = index
+
+    @property
+    def region(self):
+        return self.manager.regions[self.manager.server_regions[self.index]]
+
+    @property
+    def capacity(self):
+        return int(self.manager.server_capacities[self.index])
+
+    @property
+    def server_class(self):
+        return self.manager.capacity_model.class_names[self.manager.server_classes[self.index]]
+
+    @property
+    def utilization(self):
+        return int(self.manager.server_utilizations[self.index])
+
+    @utilization.setter
+    def utilization(self, value):
+        self.manager.server_utilizations[self.index] = value
+
+
 class ServerManager:
     """Central manager keeping check of all regions and servers, handles request sourcing to servers etc.
+
+       NOTE:
+       Servers are stored column-wise, server k lives in region server_regions[k] (index in the in-place
+       order of regions) with capacity server_capacities[k] and utilization server_utilizations[k].
+       The arrays are sorted by region and servers of a region keep their relative order, the first
+       ones are filled first.
     """
     def __init__(self, conf, regions=None):
         """
@@ -63,35 +110,88 @@ class ServerManager:
         Args:
             conf: Runtime configurations
             regions: Only set to not None if running tests. Defaults to None.
-            servers: List of server objects
+            server_regions: Region index of every server
+            server_classes: Server class of every server, index in capacity_model.classes
+            server_capacities: Capacity of every server
+            server_utilizations: Utilization of every server, same unit as capacity
         """
         self.conf = conf
-        self.region_names = get_regions(conf)
         if regions is None:
             self.regions = load_regions(conf)
         else:
             self.regions = regions
-        self.servers = []
+        # The regions given may differ from the region kind of conf, e.g. synthetic ones in the benchmarks
+        self.region_names = [region.name for region in self.regions]
+        self.capacity_model = load_capacity_model(conf, self.region_names)
+        self.server_regions = np.zeros(0, dtype=int)
+        self.server_classes = np.zeros(0, dtype=int)
+        self.server_capacities = np.zeros(0, dtype=np.int64)
+        self.server_utilizations = np.zeros(0, dtype=np.int64)
+        # Number of servers moved between regions so far
+        self.moved_servers = 0
+        self._latencies = None
+        self._carbon_intensities = None
+        self._request_rates = None
+
+    def __len__(self):
+        return len(self.server_regions)
+
+    @property
+    def servers(self):
+        """
+        Returns:
+            List of handles to every server, see ManagedServer
+        """
+        return [ManagedServer(self, k) for k in range(len(self))]
+
+    @property
+    def latencies(self):
+        """Latency matrix between all regions, built once and shared with the schedulers.
+
+        Returns:
+            Read-only array where [i][j] is the latency from region i to j, in-place order
+        """
+        if self._latencies is None:
+            self._latencies = region_latencies(self.regions)
+        return self._latencies
+
+    @property
+    def carbon_intensities(self):
+        """Carbon intensity of all regions, built once so every timestep only takes a column.
+
+        Returns:
+            Read-only array where [i][t] is the carbon intensity of region i at hour t, in-place order
+        """
+        if self._carbon_intensities is None:
+            self._carbon_intensities = stack_traces(self.regions, "carbon_intensity")
+        return self._carbon_intensities
+
+    @property
+    def request_rates(self):
+        """Request rate of all regions, built once so every timestep only takes a column.
+
+        Returns:
+            Read-only array where [i][t] is the requests per hour from region i at hour t, in-place order
+        """
+        if self._request_rates is None:
+            self._request_rates = stack_traces(self.regions, "requests_per_interval")
+        return self._request_rates
 
     def reset(self):
         """
         Reset utilization for every server
         """
-        for server in self.servers:
-            server.reset_utilization()
+        self.server_utilizations[:] = 0
 
     def utilization_left_regions(self):
-        """Iterates servers and utilization of their respective region
+        """Sums the utilization left of the servers in each region
 
         Returns:
             List of utilization of all regions, in-place order
         """
-        utilization_left = {region: 0 for region in self.region_names}
-
-        for server in self.servers:
-            utilization_left[server.region.name] += server.utilization_left()
-
-        return [utilization_left[region] for region in self.region_names]
+        left = self.server_capacities - self.server_utilizations
+        utilization_left = np.bincount(self.server_regions, weights=left, minlength=len(self.region_names))
+        return utilization_left.astype(np.int64).tolist()
 
     def servers_per_region(self):
         """
@@ -99,39 +199,73 @@ class ServerManager:
         Returns:
             Number of servers in each region, in-place order
         """
-        count = {region: 0 for region in self.region_names}
+        return np.bincount(self.server_regions, minlength=len(self.region_names)).tolist()
 
-        for server in self.servers:
-            count[server.region.name] += 1
+    def servers_per_class(self):
+        """
+        Returns:
+            servers[i][k] is the number of servers of class k in region i, in-place order
+        """
+        n_classes = self.capacity_model.n_classes
+        groups = self.server_regions * n_classes + self.server_classes
+        return np.bincount(groups, minlength=len(self.region_names) * n_classes).reshape(-1, n_classes).tolist()
 
-        return [count[region] for region in self.region_names]
+    def capacity_per_region(self, request_update_interval=1):
+        """Sums the capacity of the servers in each region.
 
-    def capacity_per_region(self):
-        """Calculates the regional capacity using a static integer set in runtime configurations.
+        Args:
+            request_update_interval: Number of intervals per hour, sums the capacity of a server per interval
+            like send() uses it. Defaults to 1.
 
         Returns:
             Regional capacity, in-place order
         """
-        servers = np.array(self.servers_per_region())
-        return servers * self.conf.server_capacity
+        capacities = np.bincount(
+            self.server_regions,
+            weights=self.server_capacities // request_update_interval,
+            minlength=len(self.region_names),
+        )
+        return capacities.astype(np.int64)
 
-    def send(self, requests_per_region):
+    def send(self, requests_per_region, request_update_interval=1):
         """ Distributes requests to each server for each region
 
         Args:
             requests_per_region: the n.o. requests to be distributed across servers in a region, in-place.
+            request_update_interval: Number of intervals per hour, a server handles its capacity divided by
+            this per interval, same as the schedulers assume. Defaults to 1.
+
+        Returns:
+            return1: Number of requests per region that were placed at servers, in-place order
+            return2: Number of requests per region that did not fit on the servers, in-place order
         """
-        for i in range(len(self.region_names)):
-            region = self.region_names[i]
-            # All requests to a {region}
-            requests = sum(requests_per_region[:, i])
-            # All servers in the {region} we should send our request batches
-            servers = [s for s in self.servers if s.region.name == region]
-            # Craete request batches that are destined to {region}
-            server_loads = self.build_server_loads(servers, requests)
+        requests_to_region = np.sum(requests_per_region, axis=0)
+        loads = self.build_loads(requests_to_region, request_update_interval)
+        self.server_utilizations += loads
+
+        served = np.bincount(self.server_regions, weights=loads, minlength=len(self.region_names)).astype(np.int64)
+        return served, requests_to_region - served
 
-            for server, load in server_loads:
-                server.push(load)
+    def build_loads(self, requests_to_region, request_update_interval=1):
+        """Places requests at the servers of every region at once. The servers of a region are filled
+        in order, each taking what is left of the requests up to its free capacity.
+
+        Args:
+            requests_to_region: Number of requests sent to each region, in-place order.
+            request_update_interval: Number of intervals per hour. Defaults to 1.
+
+        Returns:
+            Load for every server, aligned with the server arrays
+        """
+        requests_to_region = np.asarray(requests_to_region, dtype=np.int64)
+        left = np.maximum(self.server_capacities // request_update_interval - self.server_utilizations, 0)
+        # Servers are grouped by region (see move()), so the free capacity of the servers before
+        # a server in its region is the running sum minus the running sum at the start of the region
+        count = np.bincount(self.server_regions, minlength=len(self.region_names))
+        cumulative = np.cumsum(left)
+        region_start = np.concatenate(([0], cumulative))[np.cumsum(count) - count]
+        before = cumulative - left - region_start[self.server_regions]
+        return np.minimum(np.maximum(requests_to_region[self.server_regions] - before, 0), left)
 
     def build_server_loads(self, servers, requests):
         """Places load from requests at servers. The servers are region-specific.
@@ -163,40 +297,66 @@ class ServerManager:
         """Moves the minimum amount of servers to satisfy the number of requests per region
 
         Args:
-            servers_per_region: Specifies the number of servers per region
-        """
-        count = {region: 0 for region in self.region_names}
-
-        for server in self.servers:
-            count[server.region.name] += 1
-
-        # self.servers = []
-        # for region, requested_count in zip(self.regions, servers_per_region):
-        #     for _ in range(requested_count):
-        #         server = Server(self.conf.server_capacity, region)
-        #         self.servers.append(server)
-
-        # Remove all abundant servers in each region
-        for region_name, requested_count in zip(self.region_names, servers_per_region):
-            if count[region_name] > requested_count:
-                indices = [i for i, s in enumerate(self.servers) if s.region.name == region_name]
-                n = count[region_name] - requested_count
-                assert n >= 0, n
-                assert n <= len(indices), (n, len(indices))
-                for i in range(n - 1, -1, -1):
-                    index = indices[i]
-                    self.servers.pop(index)
-
-        # Add servers to each region to satisfy the new server per region constraint
-        for region, requested_count in zip(self.regions, servers_per_region):
-            c = count[region.name]
-            while c < requested_count:
-                # TODO: Set server capacity in a more generic way
-                server = Server(self.conf.server_capacity, region)
-                self.servers.append(server)
-                c += 1
-            count[region.name] = c
-
-        for region, requested_count in zip(self.regions, servers_per_region):
-            s = sum([1 for s in self.servers if s.region.name == region.name])
-            assert s == requested_count, (s, requested_count, region)
+            servers_per_region: Specifies the number of servers per region, servers_per_region[i][k] per server
+            class k, without classes every server is of the first class
+
+        Returns:
+            MigrationPlan of the moves, starts and stops, see plan_migrations()
+        """
+        n_regions = len(self.region_names)
+        n_classes = self.capacity_model.n_classes
+        requested = np.asarray(servers_per_region, dtype=int)
+        if requested.ndim == 1:
+            requested = np.column_stack((requested, np.zeros((n_regions, n_classes - 1), dtype=int)))
+        # Servers are counted per group of region and class, group = region * n_classes + class
+        groups = self.server_regions * n_classes + self.server_classes
+        count = np.bincount(groups, minlength=n_regions * n_classes)
+        plan = plan_migrations(count.reshape(n_regions, n_classes), requested)
+
+        # The first servers of a group leave it, either moved to another region or stopped
+        surplus = np.maximum(count - requested.ravel(), 0)
+        by_group = np.argsort(groups, kind="stable")
+        rank = np.empty(len(self), dtype=int)
+        rank[by_group] = np.arange(len(self)) - (np.cumsum(count) - count)[groups[by_group]]
+        keep = rank >= surplus[groups]
+
+        # Leaving servers in group order, the moves of a source take its first leaving servers of the class
+        leaving = by_group[~keep[by_group]]
+        destinations = np.full(len(leaving), -1)
+        position = np.cumsum(surplus) - surplus
+        for (source, destination, n), k in zip(plan.moves, plan.classes):
+            group = source * n_classes + k
+            destinations[position[group] : position[group] + n] = destination
+            position[group] += n
+        moved = destinations >= 0
+
+        added = np.repeat(np.arange(n_regions * n_classes), plan.started.ravel())
+        server_regions = np.concatenate((self.server_regions[keep], destinations[moved], added // n_classes))
+        server_classes = np.concatenate(
+            (self.server_classes[keep], self.server_classes[leaving[moved]], added % n_classes)
+        )
+        # Moved and started servers warm up empty with the capacity of their class in their new region
+        arrived = slice(np.count_nonzero(keep), None)
+        server_capacities = np.concatenate(
+            (
+                self.server_capacities[keep],
+                self.capacity_model.capacities[server_regions[arrived], server_classes[arrived]],
+            )
+        )
+        server_utilizations = np.concatenate(
+            (self.server_utilizations[keep], np.zeros(len(server_regions) - np.count_nonzero(keep), dtype=np.int64))
+        )
+
+        # Keep the servers grouped by region, new servers come after the existing ones of their region
+        order = np.argsort(server_regions, kind="stable")
+        self.server_regions = server_regions[order]
+        self.server_classes = server_classes[order]
+        self.server_capacities = server_capacities[order]
+        self.server_utilizations = server_utilizations[order]
+        self.moved_servers += plan.n_moved
+
+        assert np.array_equal(
+            np.bincount(self.server_regions * n_classes + self.server_classes, minlength=n_regions * n_classes),
+            requested.ravel(),
+        ), (self.servers_per_class(), servers_per_region)
+        return plan
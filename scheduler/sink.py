@@ -0,0 +1,113 @@
+import os
+import numpy as np
+import pandas as pd
+from scheduler.plot import Plot
+
+
+class StreamingPlot(Plot):
+    """
+    Plot backend that writes the gathered data to disk every `every` intervals instead of keeping
+    the whole run in memory. A CSV sink appends to a single file, a Parquet sink writes one part
+    file per batch to a directory, so whatever has been flushed can be loaded while the
+    simulation is still running or after it was killed.
+    """
+
+    def __init__(self, conf, path, every=None, file_format=None) -> None:
+        """
+
+        Args:
+            conf: Runtime configurations
+            path: File (csv) or directory (parquet) to write to, replaced if it exists
+            every: Number of intervals between flushes. Defaults to conf.stream_every, or one hour of
+            intervals if that is not set either.
+            file_format: csv/parquet. Defaults to conf.stream_format.
+        """
+        every = every if every is not None else conf.stream_every
+        if every is None:
+            every = 60 // conf.request_update_interval
+        file_format = file_format if file_format is not None else conf.stream_format
+        assert file_format in ["csv", "parquet"], file_format
+        assert every >= 1, f"Flush interval must be at least 1 interval, got {every}"
+
+        self.path = path
+        self.file_format = file_format
+        self.flushed_rows = 0
+        self.batches = 0
+        super().__init__(conf, memory_budget=0)
+        self.chunk_rows = every
+        self.data = np.zeros((every, len(self.columns)))
+
+        if file_format == "parquet":
+            # Fail early rather than after the first batch
+            import pyarrow  # noqa: F401
+
+            os.makedirs(path, exist_ok=True)
+            for name in os.listdir(path):
+                if name.endswith(".parquet"):
+                    os.remove(os.path.join(path, name))
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def spilled_rows(self):
+        """
+        Returns:
+            Number of rows written to the sink
+        """
+        return self.flushed_rows
+
+    def add(self, *args, **kwargs):
+        """Adds a row like Plot.add() and flushes as soon as the batch is complete, so a run killed right
+        after it loses none of its rows"""
+        super().add(*args, **kwargs)
+        if self.n_rows - self.flushed_rows == self.chunk_rows:
+            self.flush()
+
+    def spill(self):
+        """Writes the full buffer to the sink so the buffer can be reused"""
+        self.flush()
+
+    def flush(self):
+        """Writes the rows gathered since the last flush to the sink"""
+        n_rows = self.n_rows - self.flushed_rows
+        if n_rows == 0:
+            return
+        df = pd.DataFrame(self.data[:n_rows], columns=self.columns, copy=False)
+        if self.file_format == "csv":
+            df.to_csv(self.path, mode="a", header=self.flushed_rows == 0, index=False)
+        else:
+            df.to_parquet(os.path.join(self.path, f"part-{self.batches:05d}.parquet"), index=False)
+        self.flushed_rows += n_rows
+        self.batches += 1
+
+    def close(self):
+        """Flushes the remaining rows at the end of the simulation"""
+        self.flush()
+
+    def get(self, dt: int):
+        """Return data for a timestep
+
+        Args:
+            dt: Timestep
+
+        Returns:
+            Data for a timestep
+        """
+        if dt < self.flushed_rows:
+            return self.build_df().iloc[dt].to_numpy()
+        return self.data[dt - self.flushed_rows]
+
+    def build_df(self):
+        """Reads back everything written to the sink, including the rows that are not flushed yet.
+
+        Returns:
+            Returns a dataframe with the data gathered.
+        """
+        frames = []
+        if self.flushed_rows > 0:
+            if self.file_format == "csv":
+                frames.append(pd.read_csv(self.path, float_precision="round_trip"))
+            else:
+                frames.append(pd.read_parquet(self.path))
+        pending = self.data[: self.n_rows - self.flushed_rows]
+        frames.append(pd.DataFrame(pending, columns=self.columns))
+        return pd.concat(frames, ignore_index=True)
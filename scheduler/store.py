@@ -0,0 +1,233 @@
+"""Binary store of the hourly traces in api/.
+
+Every trace CSV is converted once into two .npy files, a sorted int64 array of timestamps and
+a float64 array of values, which are memory-mapped on load. Run the conversion up front with
+
+    python -m scheduler.store
+
+otherwise a trace is converted the first time it is loaded (and again if the CSV is newer).
+"""
+from datetime import datetime, timezone
+import os
+import sys
+import glob
+import tempfile
+import numpy as np
+import pandas as pd
+
+STORE_DIR = os.path.join("api", "store")
+
+# Column holding the values of each kind of trace
+CARBON_INTENSITY_COLUMN = "carbon_intensity_avg"
+REQUESTS_COLUMN = "requests"
+
+# Traces loaded by this process, keyed by (path, column, store_dir)
+_TRACES = {}
+
+
+def store_paths(path, column, store_dir=STORE_DIR):
+    """
+    Args:
+        path: Path of the trace CSV
+        column: Column holding the values
+        store_dir: Directory of the store. Defaults to STORE_DIR.
+
+    Returns:
+        Paths of the timestamp and value arrays of the trace in the store
+    """
+    name = os.path.splitext(os.path.relpath(path, "api"))[0].replace(os.sep, "__")
+    base = os.path.join(store_dir, f"{name}.{column}")
+    return f"{base}.timestamps.npy", f"{base}.values.npy"
+
+
+def convert(path, column, store_dir=STORE_DIR):
+    """Converts a trace CSV into the binary store
+
+    Args:
+        path: Path of the trace CSV
+        column: Column holding the values
+        store_dir: Directory of the store. Defaults to STORE_DIR.
+
+    Returns:
+        Paths of the timestamp and value arrays
+    """
+    df = pd.read_csv(path, usecols=["timestamp", column])
+    timestamps = df["timestamp"].to_numpy(dtype=np.int64)
+    assert np.all(np.diff(timestamps) >= 0), f"Timestamps in {path} are not sorted"
+
+    timestamps_path, values_path = store_paths(path, column, store_dir)
+    os.makedirs(store_dir, exist_ok=True)
+    # Processes may convert the same trace at once, so the arrays are written to temporary files and
+    # renamed into place. The timestamps come last, a reader that finds them also finds the values.
+    save_atomic(values_path, df[column].to_numpy(dtype=np.float64))
+    save_atomic(timestamps_path, timestamps)
+    return timestamps_path, values_path
+
+
+def save_atomic(path, array):
+    """Saves an array so that path either does not exist or holds the whole array
+
+    Args:
+        path: Path of the .npy file
+        array: Array to save
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_trace(path, column, store_dir=STORE_DIR):
+    """Loads a trace from the binary store, converting the CSV first if needed
+
+    Args:
+        path: Path of the trace CSV
+        column: Column holding the values
+        store_dir: Directory of the store. Defaults to STORE_DIR.
+
+    Returns:
+        return1: Read-only memory-mapped int64 array of sorted timestamps
+        return2: Read-only memory-mapped float64 array of values
+    """
+    timestamps_path, values_path = store_paths(path, column, store_dir)
+    # The timestamps are written last by convert()
+    if not os.path.exists(timestamps_path) or os.path.getmtime(timestamps_path) < os.path.getmtime(path):
+        convert(path, column, store_dir)
+    return np.load(timestamps_path, mmap_mode="r"), np.load(values_path, mmap_mode="r")
+
+
+def find(timestamps, timestamp):
+    """Row of a timestamp in a sorted timestamp array in O(log n)
+
+    Args:
+        timestamps: Sorted timestamps
+        timestamp: Timestamp to look for
+
+    Returns:
+        Index of the first row with the timestamp, None if it does not exist
+    """
+    index = int(np.searchsorted(timestamps, timestamp))
+    if index < len(timestamps) and timestamps[index] == timestamp:
+        return index
+    return None
+
+
+def select(timestamps, values, start, end):
+    """Values with start <= timestamp < end in O(log n), without copying
+
+    Args:
+        timestamps: Sorted timestamps
+        values: Values aligned with timestamps
+        start: First timestamp to include
+        end: First timestamp to exclude
+
+    Returns:
+        return1: View of the timestamps in the range
+        return2: View of the values in the range
+    """
+    i, j = np.searchsorted(timestamps, [start, end])
+    return timestamps[i:j], values[i:j]
+
+
+class Trace:
+    """
+    Hourly trace held as a sorted timestamp index and the values aligned with it, from which
+    windows for any start date, length and regional offset are sliced without re-reading the file.
+    """
+
+    def __init__(self, timestamps, values, name="trace") -> None:
+        """
+        Args:
+            timestamps: Sorted timestamps
+            values: Values aligned with timestamps
+            name: Name of the trace used in error messages. Defaults to "trace".
+        """
+        self.timestamps = timestamps
+        self.values = values
+        self.name = name
+
+    def __len__(self):
+        return len(self.values)
+
+    def find(self, timestamp):
+        """See find()"""
+        return find(self.timestamps, timestamp)
+
+    def covers(self, timestamp, length, offset=0):
+        """
+        Args:
+            timestamp: Timestamp of the first hour
+            length: Number of hours
+            offset: Offset by hour of the region. Defaults to 0.
+
+        Returns:
+            True if window() of the same arguments lies within the trace
+        """
+        index = self.find(timestamp)
+        return index is not None and index + offset > 0 and index + offset + length < len(self)
+
+    def window(self, timestamp, length, offset=0):
+        """Values of the hours [timestamp + offset, timestamp + offset + length) in O(log n), without copying
+
+        Args:
+            timestamp: Timestamp of the first hour
+            length: Number of hours
+            offset: Offset by hour of the region. Defaults to 0.
+
+        Returns:
+            View of the values in the window
+        """
+        index = self.find(timestamp)
+        assert (
+            index is not None
+        ), f"Date [{datetime.fromtimestamp(timestamp, timezone.utc)}] does not exist in {self.name}"
+
+        start = index + offset
+        assert start > 0, start
+
+        end = start + length
+        assert end < len(self), f"The selected interval overflows the {self.name}"
+
+        return self.values[start:end]
+
+
+def get_trace(path, column, store_dir=STORE_DIR, name=None):
+    """Loads a trace once per process, later calls return the same Trace
+
+    Args:
+        path: Path of the trace CSV
+        column: Column holding the values
+        store_dir: Directory of the store. Defaults to STORE_DIR.
+        name: Name of the trace used in error messages. Defaults to the path.
+
+    Returns:
+        Trace object
+    """
+    key = (path, column, store_dir)
+    if key not in _TRACES:
+        timestamps, values = load_trace(path, column, store_dir)
+        _TRACES[key] = Trace(timestamps, values, name=name or path)
+    return _TRACES[key]
+
+
+def convert_all(store_dir=STORE_DIR):
+    """Converts the carbon intensity traces of every region kind and the request trace
+
+    Returns:
+        Number of converted traces
+    """
+    paths = [(path, CARBON_INTENSITY_COLUMN) for path in sorted(glob.glob(os.path.join("api", "*", "*.csv")))]
+    paths = [(path, column) for path, column in paths if column in pd.read_csv(path, nrows=0).columns]
+    paths.append((os.path.join("api", "requests.csv"), REQUESTS_COLUMN))
+    for path, column in paths:
+        convert(path, column, store_dir)
+    return len(paths)
+
+
+if __name__ == "__main__":
+    store_dir = sys.argv[1] if len(sys.argv) > 1 else STORE_DIR
+    print(f"Converted {convert_all(store_dir)} traces into {store_dir}")
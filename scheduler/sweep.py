@@ -0,0 +1,232 @@
+"""Runs the simulation for every combination of a grid of runtime configurations in parallel.
+
+For example, from the root folder of the repository:
+
+    python -m scheduler.sweep -p europe -t 48 -r 30 -d 2021-10-22 \
+        --grid '{"latency": [20, 50], "max_servers": [15, 30], "type_scheduler": ["carbon", "latency"]}'
+
+The grid is a JSON object (or a path to a JSON file) mapping argument names to the values to try,
+every other argument is passed on to each run. One row per run is written to --output.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import argparse
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import time
+import numpy as np
+import pandas as pd
+from scheduler.parser import parse_arguments
+from scheduler.region import load_regions
+from scheduler.util import fingerprint
+
+# Regions loaded by this worker process, keyed by what the loaded data depends on
+_REGIONS = {}
+
+
+def parse_sweep_arguments(argv):
+    """
+    Returns:
+        return1: Sweep arguments (grid, workers, output)
+        return2: Arguments passed on to every run
+    """
+    parser = argparse.ArgumentParser(description="Parameter sweep over python -m scheduler")
+    parser.add_argument(
+        "--grid", type=str, required=True, help="JSON object or path to a JSON file, argument name -> list of values",
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, help="Number of worker processes. Defaults to the number of CPUs", default=None,
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, help="Path of the results table. Defaults to saved/YYYY-MM-DD_sweep.csv",
+    )
+    return parser.parse_known_args(argv)
+
+
+def load_grid(grid):
+    """
+    Args:
+        grid: JSON object or path to a JSON file
+
+    Returns:
+        Dict of argument name -> list of values
+    """
+    if os.path.exists(grid):
+        with open(grid) as f:
+            grid = f.read()
+    grid = json.loads(grid)
+    return {name: values if isinstance(values, list) else [values] for name, values in grid.items()}
+
+
+def build_assignments(grid):
+    """
+    Args:
+        grid: Dict of argument name -> list of values
+
+    Returns:
+        List of dicts of argument name (with underscores) -> value, one per combination of the grid
+    """
+    names = list(grid)
+    return [
+        {name.replace("-", "_"): value for name, value in zip(names, values)}
+        for values in itertools.product(*(grid[name] for name in names))
+    ]
+
+
+def run_label(assignment):
+    """
+    Args:
+        assignment: Grid values of a run, see build_assignments()
+
+    Returns:
+        Label for the names of the saved files of the run, e.g. latency_20_solver_transport
+    """
+    label = "_".join(f"{name}_{os.path.basename(str(value))}" for name, value in assignment.items())
+    return re.sub(r"[^\w.-]+", "-", label)
+
+
+def build_runs(grid, base_argv):
+    """Arguments for every combination of the grid, later arguments override the base ones. The grid
+    values label the saved files of a run, so runs of a sweep saved with --save do not overwrite each other.
+
+    Args:
+        grid: Dict of argument name -> list of values
+        base_argv: Arguments passed on to every run
+
+    Returns:
+        List of argument lists
+    """
+    runs = []
+    for assignment in build_assignments(grid):
+        argv = list(base_argv)
+        for name, value in assignment.items():
+            flag = f"--{name.replace('_', '-')}"
+            # Booleans are store_true flags, given bare for true and left out for false
+            if isinstance(value, bool):
+                argv += [flag] if value else []
+            else:
+                argv += [flag, str(value)]
+        runs.append(argv + ["--label", run_label(assignment), "--no-plot"])
+    return runs
+
+
+def get_regions_for(conf):
+    """Loads the regions once per worker for every combination of data that is used
+
+    Args:
+        conf: Runtime configurations
+
+    Returns:
+        List of region objects
+    """
+    key = (conf.region_kind, conf.start_date, conf.timesteps)
+    if key not in _REGIONS:
+        _REGIONS[key] = load_regions(conf)
+    return _REGIONS[key]
+
+
+def summarize(df):
+    """
+    Args:
+        df: Data gathered during a run, see Plot.build_df()
+
+    Returns:
+        Dict of totals and averages over the whole run
+    """
+    total_requests = df["total_requests"].sum()
+    return {
+        "total_requests": total_requests,
+        "total_carbon_emissions": df["total_carbon_emissions"].sum(),
+        "mean_latency": (df["mean_latency"] * df["total_requests"]).sum() / max(total_requests, 1),
+        "total_dropped_requests": df["total_dropped_requests"].sum(),
+        "mean_servers": df["total_servers"].mean(),
+        "mean_utilization": df["total_utilization"].mean(),
+    }
+
+
+def run(argv, assignment=None):
+    """Runs the simulation for one combination, called in a worker process
+
+    Args:
+        argv: Arguments for the run
+        assignment: Grid values of the run, see build_assignments(). Defaults to None.
+
+    Returns:
+        Dict with the fingerprint of the run, its grid values, its summary and its solution cache lookups
+    """
+    # Imported here so the worker only pays for it once it runs something
+    from scheduler.__main__ import simulate
+    from scheduler.cache import get_solution_cache
+
+    random.seed(1234)
+    conf = parse_arguments(argv)
+    result = {
+        **fingerprint(conf),
+        "region_kind": conf.region_kind,
+        "request_update_interval": conf.request_update_interval,
+        # Every argument of the grid, parsed like the run sees it, so each row identifies its grid point
+        **{name: getattr(conf, name) for name in assignment or {}},
+    }
+    # The cache is shared by the runs of a worker, its lookups tell how much of the time it saved
+    cache = get_solution_cache(conf)
+    before = cache.stats()
+    start = time.perf_counter()
+    try:
+        plot = simulate(conf, regions=get_regions_for(conf))
+        result.update(summarize(plot.build_df()))
+        # Long runs spill to disk, a sweep would otherwise leave the chunks of every run behind
+        plot.cleanup()
+        result["error"] = ""
+    except Exception as e:
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    after = cache.stats()
+    for name in ["hits", "disk_hits", "misses"]:
+        result[f"cache_{name}"] = after[name] - before[name]
+    return result
+
+
+def sweep(grid, base_argv, workers=None):
+    """Runs every combination of the grid across a process pool
+
+    Args:
+        grid: Dict of argument name -> list of values
+        base_argv: Arguments passed on to every run
+        workers: Number of worker processes. Defaults to None.
+
+    Returns:
+        Dataframe with one row per run
+    """
+    runs = build_runs(grid, base_argv)
+    assignments = build_assignments(grid)
+    # Invalid arguments exit here with the usage, before any worker starts
+    for argv in runs:
+        parse_arguments(argv)
+    if workers == 1:
+        results = [run(argv, assignment) for argv, assignment in zip(runs, assignments)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run, runs, assignments))
+    return pd.DataFrame(results)
+
+
+def main():
+    args, base_argv = parse_sweep_arguments(sys.argv[1:])
+    df = sweep(load_grid(args.grid), base_argv, workers=args.workers)
+
+    output = args.output
+    if output is None:
+        os.makedirs("saved", exist_ok=True)
+        output = f"saved/{datetime.now().strftime('%Y-%m-%d')}_sweep.csv"
+    df.to_csv(output, index=False)
+
+    failed = np.sum(df["error"] != "")
+    print(f"{len(df)} runs, {failed} failed, results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import numpy as np
+
+
+def solve_transport(supply, capacity, cost, mask):
+    """Solves the transportation problem min sum(cost[i][j] * x[i][j]) such that every
+    source i sends exactly supply[i] and every destination j receives at most capacity[j].
+
+    The constraint matrix is totally unimodular, so with integer supplies and capacities
+    the simplex method ends in an integral vertex and no branch and bound is needed.
+
+    Args:
+        supply: supply[i] is the number of requests from region i
+        capacity: capacity[j] is the aggregate capacity of region j
+        cost: cost[i][j] is the cost of sending one request from region i to j
+        mask: mask[i][j] is True if requests from region i may be sent to j
+
+    Returns:
+        return1: x[i][j] is the number of requests from region i that should
+        be sent to region j, None if the problem is infeasible.
+        return2: objective value.
+    """
+    # scipy is only needed with --solver transport, keep it out of the startup time otherwise
+    from scipy.optimize import linprog
+    from scipy.sparse import coo_matrix
+
+    supply = np.asarray(supply, dtype=float)
+    capacity = np.asarray(capacity, dtype=float)
+    cost = np.asarray(cost, dtype=float)
+    n_src, n_dst = cost.shape
+
+    # Only edges that are allowed become variables
+    rows, cols = np.nonzero(mask)
+    n_vars = len(rows)
+    if n_vars == 0:
+        if np.any(supply > 0):
+            return None, -10000
+        return np.zeros((n_src, n_dst), dtype=int), 0
+
+    var = np.arange(n_vars)
+    ones = np.ones(n_vars)
+    A_eq = coo_matrix((ones, (rows, var)), shape=(n_src, n_vars)).tocsc()
+    A_ub = coo_matrix((ones, (cols, var)), shape=(n_dst, n_vars)).tocsc()
+
+    result = linprog(
+        cost[rows, cols], A_ub=A_ub, b_ub=capacity, A_eq=A_eq, b_eq=supply, bounds=(0, None), method="highs-ds"
+    )
+    if result.status != 0:
+        return None, -10000
+
+    requests = np.zeros((n_src, n_dst), dtype=int)
+    requests[rows, cols] = np.rint(result.x).astype(int)
+    assert np.all(requests.sum(axis=1) == np.rint(supply)), "Transportation solution is not integral"
+    return requests, float(np.sum(requests * cost))
+
+
+def sched_reqs_carbon_transport(request_rates, capacities, latencies, carbon_intensities, servers, max_latency):
+    """
+    Same as sched_reqs_carbon_greedy() but solved in-process as a transportation problem
+    instead of calling CBC. If problem was not solved, a negative objective value is returned
+
+    Args:
+        request_rates: request_rates[i] is the number of requests from region i
+        capacities: capacities[i] is the average capacity per server in region i
+        latencies: latencies[i][j] is the latency from region i to j
+        carbon_intensities: carbon_intensities[i] is the carbon intensity in region i
+        servers: servers[i] is the number of servers in region i
+        max_latency: max_latency is the maximum latency allowed
+    Returns:
+        return1: x[i][j] is the number of requests from region i that should
+        be sent to region j.
+        return2: objective value.
+    """
+    latencies = np.asarray(latencies)
+    n_regions = len(carbon_intensities)
+    cost = np.broadcast_to(np.asarray(carbon_intensities, dtype=float), (n_regions, n_regions))
+    capacity = np.asarray(servers) * np.asarray(capacities)
+    requests, obj_val = solve_transport(request_rates, capacity, cost, latencies <= max_latency)
+    if requests is None:
+        return np.zeros((n_regions, n_regions)), obj_val
+    return requests, obj_val
+
+
+def sched_reqs_latency_transport(request_rates, capacities, latencies, carbon_intensities, servers):
+    """
+    Same as sched_reqs_latency_greedy() but solved in-process as a transportation problem
+    instead of calling CBC. If problem was not solved, a negative objective value is returned
+
+    Args:
+        request_rates: request_rates[i] is the number of requests from region i
+        capacities: capacities[i] is the average capacity per server in region i
+        latencies: latencies[i][j] is the latency from region i to j
+        carbon_intensities: carbon_intensities[i] is the carbon intensity in region i
+        servers: servers[i] is the number of servers in region i
+    Returns:
+        return1: x[i][j] is the number of requests from region i that should
+        be sent to region j.
+        return2: objective value.
+    """
+    latencies = np.asarray(latencies, dtype=float)
+    n_regions = len(carbon_intensities)
+    capacity = np.asarray(servers) * np.asarray(capacities)
+    requests, obj_val = solve_transport(request_rates, capacity, latencies, np.ones(latencies.shape, dtype=bool))
+    if requests is None:
+        return np.zeros((n_regions, n_regions)), obj_val
+    return requests, obj_val
+
+
+def sched_reqs_overflow_transport(
+    request_rates, capacities, latencies, carbon_intensities, servers, max_latency=None, objective="carbon"
+):
+    """
+    CAS that never fails: when the servers cannot take every request, as few requests as possible
+    are left over. The leftover requests are not part of the allocation, request_rates[i] minus the
+    row sum of region i is dropped. Solved as a transportation problem with an extra destination of
+    unlimited capacity that costs more than any real one.
+
+    Args:
+        request_rates: request_rates[i] is the number of requests from region i
+        capacities: capacities[i] is the average capacity per server in region i
+        latencies: latencies[i][j] is the latency from region i to j
+        carbon_intensities: carbon_intensities[i] is the carbon intensity in region i
+        servers: servers[i] is the number of servers in region i
+        max_latency: max_latency is the maximum latency allowed, only used when minimizing carbon.
+        Defaults to None.
+        objective: What to minimize, carbon/latency. Defaults to "carbon".
+    Returns:
+        return1: x[i][j] is the number of requests from region i that should
+        be sent to region j, without the leftover requests.
+        return2: objective value of the requests that were placed.
+    """
+    latencies = np.asarray(latencies, dtype=float)
+    n_regions = len(carbon_intensities)
+    if objective == "carbon":
+        cost = np.broadcast_to(np.asarray(carbon_intensities, dtype=float), (n_regions, n_regions))
+        mask = latencies <= max_latency if max_latency is not None else np.ones(latencies.shape, dtype=bool)
+    else:
+        cost = latencies
+        mask = np.ones(latencies.shape, dtype=bool)
+    capacity = np.asarray(servers) * np.asarray(capacities)
+    request_rates = np.asarray(request_rates)
+
+    # Column n_regions is the leftover destination
+    overflow_cost = np.full((n_regions, 1), max(float(np.max(cost)), 1.0) * n_regions * 10)
+    requests, _ = solve_transport(
+        request_rates,
+        np.append(capacity, request_rates.sum()),
+        np.hstack([cost, overflow_cost]),
+        np.hstack([mask, np.ones((n_regions, 1), dtype=bool)]),
+    )
+    placed = requests[:, :n_regions]
+    obj_val = float(np.sum(placed * cost))
+    return placed, obj_val
@@ -1,6 +1,8 @@
 from numpy import deprecate
 from scheduler.constants import REGION_EUROPE, REGION_NORTH_AMERICA, REGION_ORIGINAL, REGION_NORTH_AMERICA_OLD
+from scheduler.store import get_trace, CARBON_INTENSITY_COLUMN, REQUESTS_COLUMN
 from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
 import os
 
@@ -14,21 +16,55 @@ def save_file(conf, plot):
         plot: Converts data from the plot object to dataframe
     """
     df = plot.build_df()
+    df.to_csv(saved_path(conf), index=False)
+
+
+def saved_path(conf, extension="csv"):
+    """Path in /saved of the results of a run, YYYY-MM-DD_<fingerprint of the arguments>
+
+    Args:
+        conf: Runtime configurations to retrieve latency, max_servers, timesteps
+        extension: File extension. Defaults to "csv".
+
+    Returns:
+        Path of the file, the saved folder is created if needed
+    """
     date_created = datetime.now().strftime("%Y-%m-%d")
     if not os.path.exists("saved"):
         os.makedirs("saved")
 
-    fingerprint = [
-        str(conf.start_date) + "_",
-        str(conf.type_scheduler),
+    values = fingerprint(conf)
+    name = [
+        str(values["start_date"]) + "_",
+        str(values["type_scheduler"]),
         "_latency_",
-        str(conf.latency),
+        str(values["latency"]),
         "_max_servers_",
-        str(conf.max_servers),
+        str(values["max_servers"]),
         "_timesteps_",
-        str(conf.timesteps),
+        str(values["timesteps"]),
     ]
-    df.to_csv(f"saved/{date_created}_{''.join(fingerprint)}.csv", index=False)
+    if conf.label:
+        name.append("_" + conf.label)
+    return f"saved/{date_created}_{''.join(name)}.{extension}"
+
+
+def fingerprint(conf):
+    """The runtime configurations that identify a run
+
+    Args:
+        conf: Runtime configurations
+
+    Returns:
+        Dict of start_date, type_scheduler, latency, max_servers and timesteps
+    """
+    return {
+        "start_date": conf.start_date,
+        "type_scheduler": conf.type_scheduler,
+        "latency": conf.latency,
+        "max_servers": conf.max_servers,
+        "timesteps": conf.timesteps,
+    }
 
 
 @deprecate
@@ -87,23 +123,12 @@ def load_carbon_intensity(path, offset, conf, date="2021-01-01"):
     Returns:
         Returns dataframe with carbon intensity data for region, indexed by hours [0,...,24]
     """
-    df = pd.read_csv(path)
+    trace = get_trace(path, CARBON_INTENSITY_COLUMN, name="electricity map data")
     start_date = datetime.fromisoformat(date).replace(tzinfo=timezone.utc)
-    timestamp = int(start_date.timestamp())
-
-    index = df.index[df["timestamp"] == timestamp]
-    assert len(index) > 0, f"Date [{start_date}] does not exist in electricity map data"
-
-    start = index[0] + offset
-    assert start > 0, start
-
-    end = start + conf.timesteps + 24
-    assert end < len(df), "The selected interval overflows the electricity map data"
+    values = trace.window(int(start_date.timestamp()), conf.timesteps + 24, offset)
 
     # TODO: Consider whether avg or take everything
-    df = df["carbon_intensity_avg"].iloc[start:end].reset_index(drop=True)
-
-    return df
+    return pd.Series(values, name=CARBON_INTENSITY_COLUMN, copy=False)
 
 
 def load_request_rate(path, offset, conf, date="2021-01-01"):
@@ -119,22 +144,11 @@ def load_request_rate(path, offset, conf, date="2021-01-01"):
     Returns:
         Returns dataframe with request rate data for region, indexed by hours [0,...,24]
     """
-    df = pd.read_csv(path)
+    trace = get_trace(path, REQUESTS_COLUMN, name="request rate data")
     start_date = datetime.fromisoformat(date).replace(tzinfo=timezone.utc, year=2021)
-    timestamp = int(start_date.timestamp())
-
-    index = df.index[df["timestamp"] == timestamp]
-    assert len(index) > 0, f"Date [{start_date}] does not exist in request rate data"
-
-    start = index[0] + offset
-    assert start > 0, start
+    values = trace.window(int(start_date.timestamp()), conf.timesteps + 24, offset)
 
-    end = start + conf.timesteps + 24
-    assert end < len(df), "The selected interval overflows the reqeust rate data"
-
-    df = df["requests"].iloc[start:end].reset_index(drop=True)
-
-    return df
+    return pd.Series(values.astype(np.int64), name=REQUESTS_COLUMN)
 
 
 # NOT RELEVANT, BACKUP
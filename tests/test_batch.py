@@ -0,0 +1,49 @@
+import pytest
+import numpy as np
+
+from scheduler.batch import evaluate
+from scheduler.milp_sched import place_servers_carbon_greedy, place_servers_latency_greedy
+
+
+@pytest.fixture
+def latencies():
+    return np.array([[5, 30, 60], [30, 5, 40], [60, 40, 5]], dtype=float)
+
+
+def test_matches_milp_without_server_cap(latencies):
+    rng = np.random.default_rng(2)
+    request_rates = rng.integers(0, 1000, size=(4, 3))
+    carbon_intensities = rng.uniform(10, 500, size=(4, 3))
+
+    carbon = evaluate(request_rates, carbon_intensities, latencies, "carbon", max_latency=50, server_capacity=100)
+    latency = evaluate(request_rates, carbon_intensities, latencies, "latency", server_capacity=100)
+    for t in range(4):
+        _, requests, obj_val = place_servers_carbon_greedy(
+            request_rates[t], [100] * 3, latencies, carbon_intensities[t], 1000, 50
+        )
+        assert carbon["carbon_emissions"][t] == pytest.approx(obj_val)
+        assert np.array_equal(carbon["requests"][t], requests)
+
+        _, requests, obj_val = place_servers_latency_greedy(
+            request_rates[t], [100] * 3, latencies, carbon_intensities[t], 1000
+        )
+        assert np.sum(latency["requests"][t] * latencies) == pytest.approx(obj_val)
+
+
+def test_scenario_axis(latencies):
+    request_rates = np.array([[100, 200, 300]])
+    carbon_intensities = np.array([[[300, 200, 100]], [[100, 200, 300]]])
+
+    result = evaluate(
+        request_rates, carbon_intensities, latencies, "carbon", max_latency=50, max_servers=6, server_capacity=100
+    )
+    assert result["requests"].shape == (2, 1, 3, 3)
+    # Scenario 0: region 0 may only reach 0 and 1, the others go to 2
+    assert result["requests"][0, 0].tolist() == [[0, 100, 0], [0, 0, 200], [0, 0, 300]]
+    assert result["servers"][0, 0].tolist() == [0, 1, 5]
+    assert result["requests"][1, 0].tolist() == [[100, 0, 0], [200, 0, 0], [0, 300, 0]]
+    assert result["carbon_emissions"][1, 0] == 300 * 100 + 300 * 200
+    assert result["feasible"].tolist() == [[True], [True]]
+
+    result = evaluate(request_rates, carbon_intensities, latencies, "carbon", max_latency=4, max_servers=6)
+    assert result["feasible"].tolist() == [[False], [False]]
@@ -0,0 +1,37 @@
+import numpy as np
+
+from scheduler.cache import SolutionCache, solution_key
+
+
+def test_solution_key():
+    key = solution_key("cas", [1, 2], np.array([[0.5, 1.0]]), 50)
+    assert key == solution_key("cas", np.array([1, 2]), [[0.5, 1.0]], 50)
+    assert key != solution_key("cas", [1, 2], np.array([[0.5, 1.0]]), 51)
+    assert key != solution_key("cas", [1, 2, 0], np.array([[0.5, 1.0]]), 50)
+
+
+def test_lru_eviction():
+    cache = SolutionCache(maxsize=2)
+    cache.put("a", (np.array([1]), 1.0))
+    cache.put("b", (np.array([2]), 2.0))
+    assert cache.get("a")[1] == 1.0  # a is now the most recently used
+    cache.put("c", (np.array([3]), 3.0))
+
+    assert cache.get("b") is None
+    assert cache.get("c")[1] == 3.0
+    assert cache.stats() == {"hits": 2, "disk_hits": 0, "misses": 1, "size": 2}
+
+    # Callers get copies, so mutating a solution does not change the cache
+    cache.get("c")[0][0] = 0
+    assert cache.get("c")[0][0] == 3
+
+
+def test_disk_tier(tmp_path):
+    SolutionCache(directory=str(tmp_path)).put("a", (np.array([1, 2]), 3.0))
+
+    # A fresh cache, e.g. in another process, finds the solution on disk
+    cache = SolutionCache(directory=str(tmp_path))
+    servers, obj_val = cache.get("a")
+    assert servers.tolist() == [1, 2] and obj_val == 3.0
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.get("a") is not None and cache.hits == 1
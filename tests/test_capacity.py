@@ -0,0 +1,157 @@
+import json
+
+import numpy as np
+import pytest
+
+from scheduler.cache import get_solution_cache
+from scheduler.capacity import CapacityModel, ServerClass, load_capacity_model
+from scheduler.constants import REGION_LOCATIONS
+from scheduler.milp_sched import (
+    cheapest_server_mix,
+    place_servers_carbon_greedy,
+    place_servers_latency_greedy,
+    request_capacities,
+    schedule_requests,
+)
+from scheduler.parser import parse_arguments
+from scheduler.region import Region
+from scheduler.request import RequestBatch
+from scheduler.server import ServerManager
+from scheduler.util import get_regions
+
+
+def write_classes(tmp_path):
+    path = tmp_path / "classes.json"
+    config = {
+        "classes": {"small": {"capacity": 10, "cost": 1}, "large": {"capacity": 40, "cost": 3}},
+        "regions": {"DE": {"large": 30}, "US-CAL-CISO": {"small": 5}},
+    }
+    path.write_text(json.dumps(config))
+    return str(path)
+
+
+def test_load_capacity_model(tmp_path):
+    conf = parse_arguments(["-p", "europe", "--server-classes", write_classes(tmp_path)])
+    model = load_capacity_model(conf, get_regions(conf))
+    assert model.class_names == ["small", "large"]
+    assert model.costs.tolist() == [1, 3]
+    assert model.capacities[0].tolist() == [10, 30]
+    assert model.capacities[1].tolist() == [10, 40]
+    assert model.uniform_capacity is None
+
+    conf = parse_arguments(["-c", "10"])
+    model = load_capacity_model(conf, get_regions(conf))
+    assert model.n_classes == 1 and model.uniform_capacity == 10
+
+
+def test_cheapest_mix():
+    capacities = [[10, 40], [10, 30]]
+    costs = [1, 3]
+    # 3 small cost as much as 1 large, 45 requests fit on 1 large and 1 small
+    servers, cost = cheapest_server_mix([45, 0], capacities, costs, max_servers=10)
+    assert servers.tolist() == [[1, 1], [0, 0]] and cost == 4
+    # Only 2 servers are allowed for 60 requests
+    servers, cost = cheapest_server_mix([0, 60], capacities, costs, max_servers=2)
+    assert servers.tolist() == [[0, 0], [0, 2]] and cost == 6
+    _, cost = cheapest_server_mix([0, 61], capacities, costs, max_servers=2)
+    assert cost < 0
+
+
+def test_place_servers_per_class():
+    request_rates = [45, 25]
+    capacities = np.array([[10, 40], [10, 40]])
+    latencies = [[0, 10], [10, 0]]
+    carbon_intensities = [100, 100]
+
+    servers, requests, obj_val = place_servers_carbon_greedy(
+        request_rates, capacities, latencies, carbon_intensities, 10, 5, server_costs=[1, 2.5]
+    )
+    # Requests stay in their region, 1 large + 1 small is cheaper than 5 small and 1 large than 3 small
+    assert requests.tolist() == [[45, 0], [0, 25]]
+    assert servers.tolist() == [[1, 1], [0, 1]]
+    assert obj_val == 7000 + 6
+
+    servers, requests, obj_val = place_servers_latency_greedy(
+        request_rates, capacities, latencies, carbon_intensities, 10, server_costs=[1, 2.5]
+    )
+    assert requests.tolist() == [[45, 0], [0, 25]]
+    assert servers.tolist() == [[1, 1], [0, 1]]
+    assert obj_val == 6
+
+
+def test_move_per_class(tmp_path):
+    conf = parse_arguments(["-p", "europe", "--server-classes", write_classes(tmp_path)])
+    regions = [
+        Region(name=region, location=0, carbon_intensity=10, requests_per_hour=None) for region in get_regions(conf)
+    ]
+    server_manager = ServerManager(conf, regions=regions)
+
+    server_manager.move([[1, 1], [2, 0], [0, 0], [0, 0], [0, 0], [0, 0]])
+    assert server_manager.servers_per_class()[:2] == [[1, 1], [2, 0]]
+    assert server_manager.capacity_per_region().tolist()[:2] == [40, 20]
+    assert [s.server_class for s in server_manager.servers] == ["small", "large", "small", "small"]
+
+    # Servers only move within their class and take the capacity of their class in the new region
+    plan = server_manager.move([[0, 0], [2, 1], [0, 0], [1, 0], [0, 0], [0, 0]])
+    assert sorted(zip(plan.moves, plan.classes)) == [((0, 1, 1), 1), ((0, 3, 1), 0)]
+    assert server_manager.servers_per_region() == [0, 3, 0, 1, 0, 0]
+    assert server_manager.capacity_per_region().tolist() == [0, 60, 0, 10, 0, 0]
+    assert server_manager.capacity_per_region(request_update_interval=2).tolist() == [0, 30, 0, 5, 0, 0]
+
+    # A placement without classes places servers of the first class
+    server_manager.move([0, 0, 0, 0, 0, 1])
+    assert server_manager.servers_per_class()[5] == [1, 0]
+
+
+def test_server_class():
+    model = CapacityModel(["a"], [ServerClass("only", 5, cost=2)])
+    assert model.uniform_capacity is None
+    assert model.capacities.tolist() == [[5]]
+
+
+def test_request_capacities(tmp_path):
+    conf = parse_arguments(["-p", "europe", "--server-classes", write_classes(tmp_path)])
+    regions = [
+        Region(name=region, location=0, carbon_intensity=10, requests_per_hour=None) for region in get_regions(conf)
+    ]
+    server_manager = ServerManager(conf, regions=regions)
+    server_manager.move([[1, 1], [3, 0], [0, 2], [0, 0], [0, 0], [0, 0]])
+
+    for intervals in [1, 3, 6]:
+        capacities, servers = request_capacities(server_manager, intervals)
+        capacity = np.array(capacities) * np.array(servers)
+        # Integer division per server, e.g. 30 // 6 + 10 // 6 for the first region
+        assert capacity.tolist() == server_manager.capacity_per_region(intervals).tolist()
+
+        # The CAS capacity is exactly what send() places
+        _, dropped = server_manager.send(np.diag(capacity), intervals)
+        assert dropped.tolist() == [0] * 6
+        server_manager.reset()
+        _, dropped = server_manager.send(np.diag(capacity + 1), intervals)
+        assert dropped.tolist() == [1] * 6
+        server_manager.reset()
+
+
+def test_schedule_requests_cache_per_fallback(tmp_path):
+    argv = ["-p", "europe", "-c", "60", "-r", "60", "--solution-cache-dir", str(tmp_path)]
+    conf = parse_arguments(argv)
+    regions = [
+        Region(name=region, location=REGION_LOCATIONS[region], carbon_intensity=10, requests_per_hour=None)
+        for region in get_regions(conf)
+    ]
+    server_manager = ServerManager(conf, regions=regions)
+    server_manager.move([1, 0, 0, 0, 0, 0])
+    batches = [RequestBatch(region.name, 100 if i == 0 else 0, region) for i, region in enumerate(regions)]
+    cache = get_solution_cache(conf)
+
+    # An infeasible interval raises and is not cached
+    with pytest.raises(Exception):
+        schedule_requests(conf, batches, server_manager, 0, 1, carbon_intensities=[10] * 6)
+    assert len(cache) == 0
+
+    # Forecast runs drop what does not fit, a perfect run with the same inputs still raises
+    forecast = parse_arguments(argv + ["--forecast", "ewma"])
+    _, _, requests = schedule_requests(forecast, batches, server_manager, 0, 1, carbon_intensities=[10] * 6)
+    assert len(cache) == 1 and np.sum(requests) == 60
+    with pytest.raises(Exception):
+        schedule_requests(conf, batches, server_manager, 0, 1, carbon_intensities=[10] * 6)
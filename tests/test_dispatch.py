@@ -0,0 +1,41 @@
+import numpy as np
+
+from scheduler.dispatch import AliasTable, SmoothWeightedRoundRobin, build_selectors
+
+
+def test_alias_table():
+    weights = [0, 30, 10, 60]
+    table = AliasTable(weights)
+
+    # Every draw is one of the non-zero weights
+    assert {table.sample() for _ in range(1000)} == {1, 2, 3}
+    assert table.sample(u=0.0) != 0
+
+    sampled = np.bincount(table.sample_batch(100_000, np.random.default_rng(0)), minlength=4) / 100_000
+    assert np.allclose(sampled, np.array(weights) / 100, atol=0.01)
+
+
+def test_smooth_weighted_round_robin():
+    selector = SmoothWeightedRoundRobin([5, 1, 1])
+    assert selector.sample_batch(7).tolist() == [0, 0, 0, 1, 2, 0, 0]
+
+    # Batches continue the cycle where single samples left it
+    selector = SmoothWeightedRoundRobin([4, 2, 3])
+    singles = SmoothWeightedRoundRobin([4, 2, 3])
+    assert selector.sample() == singles.sample()
+    assert selector.sample_batch(20).tolist() == [singles.sample() for _ in range(20)]
+
+    # Only the requested window is generated, not whole cycles of millions of requests
+    selector = SmoothWeightedRoundRobin([2_000_000, 0, 1_000_000])
+    assert selector.sample_batch(3).tolist() == [0, 2, 0]
+    assert np.bincount(selector.sample_batch(2_999_997), minlength=3).tolist() == [1_999_998, 0, 999_999]
+    assert selector.position == 0
+
+    # Every cycle hits each destination exactly its weight
+    selector = SmoothWeightedRoundRobin([3, 0, 7])
+    assert np.bincount(selector.sample_batch(30), minlength=3).tolist() == [9, 0, 21]
+
+
+def test_build_selectors():
+    selectors = build_selectors([[1, 1], [0, 0]], "round_robin")
+    assert isinstance(selectors[0], SmoothWeightedRoundRobin) and selectors[1] is None
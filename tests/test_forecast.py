@@ -0,0 +1,57 @@
+import pytest
+import numpy as np
+
+from scheduler.forecast import EWMA, HoltWinters, SeasonalNaive, history_available
+from scheduler.parser import parse_arguments
+from scheduler.region import load_regions
+from scheduler.transport import sched_reqs_overflow_transport
+
+
+def daily(n_days, n_regions=2):
+    hours = np.arange(24 * n_days)
+    return 100 + 50 * np.sin(2 * np.pi * hours / 24)[:, None] * np.arange(1, n_regions + 1)
+
+
+def test_seasonal_naive():
+    model = SeasonalNaive(season=3)
+    for y in [[1, 10], [2, 20], [3, 30]]:
+        model.update(y)
+    assert model.predict().tolist() == [1, 10]
+    model.update([4, 40])
+    assert model.predict().tolist() == [2, 20]
+
+
+def test_ewma():
+    model = EWMA(alpha=0.5)
+    model.update([10.0])
+    model.update([20.0])
+    assert model.predict().tolist() == [15.0]
+
+
+def test_holt_winters_learns_season():
+    y = daily(5)
+    model = HoltWinters()
+    for h in range(len(y) - 1):
+        model.update(y[h])
+    assert model.predict() == pytest.approx(y[-1], rel=0.01)
+
+
+def test_overflow_leaves_leftover_out():
+    latencies = np.array([[5, 30], [30, 5]], dtype=float)
+    requests, obj_val = sched_reqs_overflow_transport([250, 20], [100, 100], latencies, [10, 20], [1, 1], 50)
+    # Both servers are filled and the 70 requests of region 0 that do not fit are not allocated
+    assert requests.tolist() == [[100, 80], [0, 20]]
+    assert obj_val == 100 * 10 + 100 * 20
+
+
+def test_history_available():
+    conf = parse_arguments(["-p", "europe", "-t", "6", "-d", "2021-10-22"])
+    assert history_available(conf, load_regions(conf))
+    # The traces start on 2021-10-20, 12 hours are not enough
+    conf = parse_arguments(["-p", "europe", "-t", "6", "-d", "2021-10-20T12:00"])
+    assert not history_available(conf, load_regions(conf))
+
+
+def test_horizon_rejects_forecast():
+    with pytest.raises(SystemExit):
+        parse_arguments(["--horizon", "4", "--forecast", "ewma"])
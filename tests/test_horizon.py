@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from scheduler.horizon import RollingHorizonProvisioner
+from scheduler.milp_sched import place_servers_horizon
+from scheduler.parser import parse_arguments
+from scheduler.region import Region
+from scheduler.resolution import Timeline
+from scheduler.server import ServerManager
+from scheduler.constants import REGION_LOCATIONS
+from scheduler.util import get_regions
+
+
+@pytest.fixture
+def server_manager():
+    conf = parse_arguments(["--horizon", "4", "-m", "8", "-l", "1000", "-c", "100"])
+    rng = np.random.default_rng(3)
+    regions = [
+        Region(
+            name,
+            REGION_LOCATIONS[name],
+            pd.Series(rng.uniform(50, 500, 30)),
+            pd.Series(rng.integers(50, 150, 30)),
+        )
+        for name in get_regions(conf)
+    ]
+    return ServerManager(conf, regions=regions)
+
+
+def test_provisioner_reuses_plan(server_manager):
+    provisioner = RollingHorizonProvisioner(server_manager.conf, server_manager)
+    assert provisioner.step == 2
+
+    for t in range(6):
+        servers = provisioner.servers_per_region(t)
+        rates = [region.get_requests_per_interval(t) for region in server_manager.regions]
+        assert sum(servers) <= server_manager.conf.max_servers
+        assert sum(servers) * server_manager.conf.server_capacity >= sum(rates)
+        server_manager.move(servers)
+
+    # Plans are made at t=0, 2 and 4
+    assert provisioner.solves == 3
+
+
+def test_migration_cost_reduces_churn():
+    latencies = np.full((2, 2), 10.0)
+    request_rates = [[50, 50]] * 4
+    # The cheapest region alternates every hour
+    carbon_intensities = [[100, 101], [101, 100], [100, 101], [101, 100]]
+
+    _, requests, _ = place_servers_horizon(request_rates, [100, 100], latencies, carbon_intensities, 3, 50)
+    assert requests.sum(axis=1).tolist() == [[100, 0], [0, 100], [100, 0], [0, 100]]
+
+    servers, requests, obj_val = place_servers_horizon(
+        request_rates, [100, 100], latencies, carbon_intensities, 3, 50, initial_servers=[1, 0], migration_cost=1000
+    )
+    assert servers.tolist() == [[1, 0]] * 4
+    assert obj_val == pytest.approx(np.sum(requests.sum(axis=1) * np.array(carbon_intensities)))
+
+
+def test_provisioner_plans_interpolated_peaks(server_manager):
+    conf = parse_arguments(["--horizon", "4", "-m", "8", "-l", "1000", "-c", "100", "--interpolate", "-t", "5"])
+    timeline = Timeline(server_manager.regions, conf.timesteps + 1, 6, interpolate=True)
+    provisioner = RollingHorizonProvisioner(conf, server_manager, timeline=timeline)
+
+    # Hours of the run are planned for their busiest interval, hours past it keep the hourly rates
+    rates = provisioner.request_rates(4, 4)
+    assert np.array_equal(rates[:2], timeline.peak_rates(4, 2))
+    assert np.array_equal(rates[2:], server_manager.request_rates[:, 6:8].T)
+    assert np.all(rates[:2] >= server_manager.request_rates[:, 4:6].T)
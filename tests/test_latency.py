@@ -0,0 +1,67 @@
+import pytest
+import numpy as np
+
+from scheduler.region import Region
+from scheduler.latency import (
+    LatencyMatrix,
+    cloudping_latencies,
+    haversine_distances,
+    haversine_latencies,
+    latency_from_distance,
+    region_latencies,
+)
+from scheduler.constants import REGION_LOCATIONS, REGION_ORIGINAL
+
+
+def test_latency_matrix_lookup():
+    matrix = LatencyMatrix(["A", "B", "A"], [[0, 1, 2], [3, 4, 5], [6, 7, 8]])
+
+    # First occurrence of a duplicated name is used
+    assert matrix.get("A", "B") == 1
+    assert matrix.get("B", "A") == 3
+    assert "B" in matrix and "C" not in matrix
+    assert matrix.submatrix(["B", "A"]).tolist() == [[4, 3], [1, 0]]
+
+    with pytest.raises(ValueError):
+        matrix.values[0, 0] = 1
+
+
+def test_cloudping_loaded_once():
+    assert cloudping_latencies() is cloudping_latencies()
+    assert cloudping_latencies().get("FR", "FR") < cloudping_latencies().get("FR", "SE")
+
+
+def test_region_latencies_shared():
+    regions = [Region(name, REGION_LOCATIONS[name], None, None) for name in REGION_ORIGINAL]
+    latencies = region_latencies(regions)
+
+    assert latencies is region_latencies(regions)
+    assert not latencies.flags.writeable
+    for i, src in enumerate(regions):
+        for j, dst in enumerate(regions):
+            assert latencies[i, j] == pytest.approx(src.latency(dst))
+    assert np.allclose(latencies, latencies.T)
+
+
+def test_haversine_latencies_match_region_latency():
+    rng = np.random.default_rng(0)
+    points = np.column_stack([rng.uniform(-90, 90, 200), rng.uniform(-180, 180, 200)])
+    names = [f"edge{i}" for i in range(len(points))]
+    locations = dict(zip(names, points))
+
+    matrix = haversine_latencies(names, locations)
+    assert matrix is haversine_latencies(names, locations)
+    assert matrix.values.shape == (200, 200)
+
+    regions = [Region(name, location, None, None) for name, location in locations.items()]
+    for i, j in rng.integers(0, 200, size=(50, 2)):
+        assert matrix.values[i, j] == pytest.approx(regions[i].latency(regions[j]))
+    assert np.allclose(np.diag(matrix.values), latency_from_distance(0))
+
+
+def test_haversine_latencies_default_locations():
+    matrix = haversine_latencies(REGION_ORIGINAL)
+    i, j = matrix.index["US-CAL-CISO"], matrix.index["US-TEX-ERCO"]
+    assert matrix.values[i, j] == pytest.approx(
+        latency_from_distance(haversine_distances([(30, -120)], [(30, -95)])[0, 0])
+    )
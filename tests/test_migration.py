@@ -0,0 +1,84 @@
+import numpy as np
+
+from scheduler.migration import plan_migrations
+from scheduler.milp_sched import place_servers_carbon_greedy
+from scheduler.parser import parse_arguments
+from scheduler.region import Region
+from scheduler.server import ServerManager
+from scheduler.util import get_regions
+
+
+def test_plan_migrations():
+    plan = plan_migrations([3, 0, 2, 1], [1, 2, 2, 3])
+    assert plan.moves == [(0, 1, 2)]
+    assert plan.n_moved == 2
+    assert plan.started.tolist() == [0, 0, 0, 2]
+    assert plan.stopped.tolist() == [0, 0, 0, 0]
+
+    plan = plan_migrations([4, 0, 0, 2], [0, 1, 1, 0])
+    assert plan.moves == [(0, 1, 1), (0, 2, 1)]
+    assert plan.stopped.tolist() == [2, 0, 0, 2]
+    assert plan.started.tolist() == [0, 0, 0, 0]
+
+    # Nothing to move
+    plan = plan_migrations([1, 2], [1, 2])
+    assert len(plan) == 0 and plan.started.sum() == 0 and plan.stopped.sum() == 0
+
+
+def test_plan_migrations_minimal():
+    rng = np.random.default_rng(0)
+    for _ in range(100):
+        current, target = rng.integers(0, 10, (2, 20))
+        plan = plan_migrations(current, target)
+        surplus = np.maximum(current - target, 0).sum()
+        deficit = np.maximum(target - current, 0).sum()
+        assert plan.n_moved == min(surplus, deficit)
+        assert len(plan) < 2 * len(current)
+
+        result = current - plan.stopped + plan.started
+        for source, destination, n in plan.moves:
+            assert n > 0 and source != destination
+            result[source] -= n
+            result[destination] += n
+        assert result.tolist() == target.tolist()
+
+
+def test_move_takes_capacity_of_destination():
+    conf = parse_arguments(["-c", "10"])
+    regions = [
+        Region(name=region, location=0, carbon_intensity=10, requests_per_hour=None) for region in get_regions(conf)
+    ]
+    server_manager = ServerManager(conf, regions=regions)
+    server_manager.capacity_model.capacities[1] = 30
+    server_manager.move([2, 0, 0, 1])
+    server_manager.server_utilizations[:] = [5, 5, 5]
+
+    plan = server_manager.move([1, 1, 0, 0])
+    assert plan.moves == [(0, 1, 1)]
+    assert plan.stopped.tolist() == [[0], [0], [0], [1]]
+    assert server_manager.moved_servers == 1
+    # The first server of region 0 moved to region 1, it warms up empty with the capacity there
+    assert server_manager.server_capacities.tolist() == [10, 30]
+    assert server_manager.server_utilizations.tolist() == [5, 0]
+
+
+def test_migration_cost():
+    request_rates = [100, 100]
+    capacities = [100, 100]
+    latencies = [[0, 10], [10, 0]]
+    carbon_intensities = [100, 99]
+
+    servers, requests, _ = place_servers_carbon_greedy(request_rates, capacities, latencies, carbon_intensities, 4, 20)
+    assert servers[0] == 0 and requests[:, 1].sum() == 200
+
+    # Moving a server saves 100 in carbon, less than it costs
+    servers, _, obj_val = place_servers_carbon_greedy(
+        request_rates, capacities, latencies, carbon_intensities, 4, 20, current_servers=[1, 1], migration_cost=500
+    )
+    assert servers.tolist() == [1, 1]
+    assert obj_val == 19900
+
+    servers, _, _ = place_servers_carbon_greedy(
+        request_rates, capacities, latencies, carbon_intensities, 4, 20, current_servers=[1, 1], migration_cost=50
+    )
+    assert servers.tolist() == [0, 2]
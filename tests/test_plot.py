@@ -0,0 +1,99 @@
+import gc
+import os
+import numpy as np
+
+from scheduler.plot import Plot
+from scheduler.server import ServerManager
+from scheduler.region import Region
+from scheduler.parser import parse_arguments
+from scheduler.util import get_regions
+
+
+def add_rows(plot, conf, n_rows):
+    regions = [Region(name, 0, None, None) for name in get_regions(conf)]
+    server_manager = ServerManager(conf, regions=regions)
+    server_manager.move([1] * len(regions))
+    latency = np.full((len(regions), len(regions)), 10.0)
+    rng = np.random.default_rng(0)
+    for k in range(n_rows):
+        requests_per_region = np.diag(rng.integers(0, 100, len(regions)))
+        served, dropped = server_manager.send(requests_per_region)
+        plot.add(
+            server_manager, latency, [100.0] * len(regions), requests_per_region, dropped, k // 6, k % 6, 6, served
+        )
+        server_manager.reset()
+
+
+def test_plot_buffer():
+    conf = parse_arguments(["-t", "1"])
+    plot = Plot(conf)
+    assert plot.data.shape == (2 * 6, len(plot.columns))
+
+    # The buffer grows if more rows than expected are added
+    add_rows(plot, conf, 20)
+    df = plot.build_df()
+    assert df.shape == (20, len(plot.columns))
+    assert np.shares_memory(df.to_numpy(), plot.data)
+    assert df["timestep"].tolist() == [k // 6 for k in range(20)]
+    assert np.array_equal(plot.get(7), df.iloc[7].to_numpy())
+
+
+def test_plot_unscheduled_requests():
+    conf = parse_arguments(["-t", "1"])
+    plot = Plot(conf)
+    regions = [Region(name, 0, None, None) for name in get_regions(conf)]
+    server_manager = ServerManager(conf, regions=regions)
+    server_manager.move([1] * len(regions))
+    n = len(regions)
+    requests_per_region = np.diag([10] * n)
+    served, dropped = server_manager.send(requests_per_region)
+    unscheduled = np.array([5] + [0] * (n - 1))
+    plot.add(
+        server_manager, np.full((n, n), 10.0), [100.0] * n, requests_per_region, dropped, 0, 0, 6, served, unscheduled
+    )
+
+    # Unscheduled requests are dropped at their source, without carbon emissions or latency
+    row = plot.build_df().iloc[0]
+    assert row["total_requests"] == 10 * n + 5
+    assert row["total_dropped_requests"] == 5
+    assert row["total_carbon_emissions"] == 10 * n * 100.0
+    assert row["mean_latency"] == 10.0
+
+
+def test_plot_spill():
+    conf = parse_arguments(["-t", "1"])
+    plot = Plot(conf)
+    add_rows(plot, conf, 20)
+
+    # Three rows fit in the buffer
+    spilled = Plot(conf, memory_budget=3 * len(plot.columns) * 8)
+    add_rows(spilled, conf, 20)
+    assert len(spilled.data) == 3
+    assert len(spilled.chunks) == 6
+
+    assert spilled.build_df().equals(plot.build_df())
+    assert np.array_equal(spilled.get(4), plot.get(4))
+    assert np.array_equal(spilled.get(19), plot.get(19))
+
+    spill_dir = spilled.spill_dir
+    assert os.path.isdir(spill_dir)
+    spilled.close()
+    assert os.path.isdir(spill_dir)
+    spilled.cleanup()
+    assert not os.path.exists(spill_dir) and spilled.chunks == []
+
+    # A plot that is collected takes its chunks along
+    collected = Plot(conf, memory_budget=3 * len(plot.columns) * 8)
+    add_rows(collected, conf, 20)
+    spill_dir = collected.spill_dir
+    del collected
+    gc.collect()
+    assert not os.path.exists(spill_dir)
+
+
+def test_plot_to_file(tmp_path):
+    conf = parse_arguments(["-t", "1", "--plot-file", str(tmp_path / "summary.png")])
+    plot = Plot(conf)
+    add_rows(plot, conf, 12)
+    plot.plot(path=conf.plot_file)
+    assert (tmp_path / "summary.png").stat().st_size > 0
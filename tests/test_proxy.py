@@ -0,0 +1,118 @@
+import asyncio
+import numpy as np
+
+from scheduler.proxy import RoutingDaemon, RoutingTable, StubBackend
+
+
+def test_routing_table():
+    table = RoutingTable(["A", "B", "C"], [[0, 30, 10], [0, 0, 0], [5, 0, 5]])
+
+    # Regions without scheduled requests keep them
+    assert table.route(1) == 1
+    assert table.route_batch(1, 3).tolist() == [1, 1, 1]
+
+    routed = np.bincount([table.route(0) for _ in range(4000)], minlength=3)
+    assert routed[0] == 0 and 2700 < routed[1] < 3300
+
+
+def test_daemon_routes_and_forwards():
+    async def run():
+        stubs = {name: StubBackend(name) for name in ["A", "B"]}
+        backends = {name: await stub.start() for name, stub in stubs.items()}
+        daemon = RoutingDaemon(["A", "B"], [[0, 1], [0, 1]], backends)
+        host, port = await daemon.start()
+
+        reader, writer = await asyncio.open_connection(host, port)
+        answers = []
+        for line in ["A", "A hello", "C"]:
+            writer.write(f"{line}\n".encode())
+            answers.append((await reader.readline()).decode().strip())
+
+        # A new schedule is used from the next request on
+        daemon.update([[1, 0], [1, 0]])
+        writer.write(b"B\n")
+        answers.append((await reader.readline()).decode().strip())
+
+        writer.close()
+        daemon.close()
+        for stub in stubs.values():
+            stub.close()
+        return answers, stubs["B"].handled
+
+    answers, handled = asyncio.run(run())
+    assert answers == ["B", "B hello", "ERROR unknown region C", "A"]
+    assert handled == 1
+
+
+def test_refresh_swaps_tables():
+    class Schedule:
+        def __init__(self):
+            self.calls = 0
+
+        def next(self):
+            self.calls += 1
+            return [[0, 1], [1, 0]]
+
+    async def run():
+        daemon = RoutingDaemon(["A", "B"])
+        assert daemon.table.route_name("A") == "A"
+        refresh = asyncio.create_task(daemon.refresh(Schedule(), 0.01))
+        await asyncio.sleep(0.05)
+        refresh.cancel()
+        return daemon
+
+    daemon = asyncio.run(run())
+    assert daemon.updates > 0
+    assert daemon.table.route_name("A") == "B"
+
+
+def test_refresh_waits_for_the_first_interval():
+    class Schedule:
+        def __init__(self):
+            self.calls = 0
+
+        def next(self):
+            self.calls += 1
+            return [[0, 1], [1, 0]]
+
+    async def run():
+        schedule = Schedule()
+        daemon = RoutingDaemon(["A", "B"])
+        refresh = asyncio.create_task(daemon.refresh(schedule, 10))
+        await asyncio.sleep(0.05)
+        refresh.cancel()
+        return schedule.calls, daemon
+
+    calls, daemon = asyncio.run(run())
+    # The table the daemon was started with serves the whole first interval
+    assert calls == 0 and daemon.updates == 0
+    assert daemon.table.route_name("A") == "A"
+
+
+def test_unreachable_backend():
+    async def run():
+        stub = StubBackend("B")
+        backend = await stub.start()
+        # Nothing listens on the port of a closed server
+        closed = StubBackend("A")
+        unreachable = await closed.start()
+        closed.close()
+        await closed.server.wait_closed()
+
+        daemon = RoutingDaemon(["A", "B"], [[1, 0], [0, 1]], {"A": unreachable, "B": backend})
+        host, port = await daemon.start()
+        reader, writer = await asyncio.open_connection(host, port)
+        answers = []
+        for line in ["A hello", "B hello", "A again"]:
+            writer.write(f"{line}\n".encode())
+            answers.append((await reader.readline()).decode().strip())
+
+        writer.close()
+        daemon.close()
+        stub.close()
+        return answers, daemon.backend_errors
+
+    answers, errors = asyncio.run(run())
+    # The client connection survives and the other backends are still reached
+    assert answers == ["ERROR backend of A unreachable", "B hello", "ERROR backend of A unreachable"]
+    assert errors == 2
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from scheduler.parser import parse_arguments
+from scheduler.resolution import interpolate_hourly, split_hourly
+
+
+def test_split_conserves_requests():
+    hourly = np.array([[100, 7], [50, 0], [61, 3]])
+    split = split_hourly(hourly, 6)
+
+    assert split.shape == (3, 6, 2)
+    assert split.dtype == np.int64
+    assert np.array_equal(split.sum(axis=1), hourly)
+    # Requests ramp down from the first hour to the second
+    assert np.all(np.diff(split[0, :, 0]) <= 0)
+
+
+def test_flat_split():
+    split = split_hourly([10, 60], 4, interpolate=False)
+    assert split.tolist() == [[3, 3, 2, 2], [15, 15, 15, 15]]
+
+
+def test_interpolate_hourly():
+    carbon = interpolate_hourly([100.0, 200.0], 2)
+    assert carbon.tolist() == [[100, 125], [175, 200]]
+
+
+def test_intervals_divide_the_hour():
+    assert parse_arguments(["-r", "15"]).request_update_interval == 15
+    # 8 intervals of 7 minutes would leave 4 minutes of every hour unscheduled
+    with pytest.raises(SystemExit):
+        parse_arguments(["-r", "7"])
@@ -1 +1,106 @@
 import pytest
+import numpy as np
+
+from scheduler.milp_sched import (
+    RequestScheduler,
+    check_reachable,
+    feasible_pairs,
+    place_servers_carbon_greedy,
+    sched_reqs_carbon_greedy,
+    sched_reqs_latency_greedy,
+)
+from scheduler.transport import sched_reqs_carbon_transport, sched_reqs_latency_transport
+
+
+@pytest.fixture
+def latencies():
+    return np.array([[5, 30, 60], [30, 5, 40], [60, 40, 5]], dtype=float)
+
+
+def test_request_scheduler_resolve(latencies):
+    scheduler = RequestScheduler(latencies, "carbon", max_latency=50)
+    rng = np.random.default_rng(1)
+    for _ in range(4):
+        request_rates = rng.integers(0, 100, size=3)
+        carbon_intensities = rng.uniform(10, 500, size=3)
+        capacities = [100, 100, 100]
+        servers = [1, 1, 1]
+
+        requests, obj_val = scheduler.solve(request_rates, capacities, carbon_intensities, servers)
+        expected, expected_obj_val = sched_reqs_carbon_greedy(
+            request_rates, capacities, latencies, carbon_intensities, servers, 50
+        )
+
+        assert obj_val == pytest.approx(expected_obj_val)
+        assert np.all(requests.sum(axis=1) == request_rates)
+        assert np.all(requests.sum(axis=0) <= 100)
+        assert requests[0, 2] == 0 and requests[2, 0] == 0
+
+
+def test_request_scheduler_infeasible(latencies):
+    scheduler = RequestScheduler(latencies, "latency")
+    requests, obj_val = scheduler.solve([10, 10, 10], [5, 5, 5], [1, 1, 1], [1, 1, 1])
+    assert obj_val < 0
+
+    # Recovers once the servers can handle the load again
+    requests, obj_val = scheduler.solve([10, 10, 10], [5, 5, 5], [1, 1, 1], [2, 2, 2])
+    assert obj_val == pytest.approx(30 * 5)
+    assert np.all(requests == np.diag([10, 10, 10]))
+    assert sched_reqs_latency_greedy([10, 10, 10], [5, 5, 5], latencies, [1, 1, 1], [2, 2, 2])[1] == obj_val
+
+
+def test_transport_matches_milp(latencies):
+    rng = np.random.default_rng(2)
+    for _ in range(5):
+        request_rates = rng.integers(0, 100, size=3)
+        carbon_intensities = rng.uniform(10, 500, size=3)
+        capacities = [60, 60, 60]
+        servers = rng.integers(1, 3, size=3)
+
+        expected, expected_obj_val = sched_reqs_carbon_greedy(
+            request_rates, capacities, latencies, carbon_intensities, servers, 50
+        )
+        requests, obj_val = sched_reqs_carbon_transport(
+            request_rates, capacities, latencies, carbon_intensities, servers, 50
+        )
+        assert obj_val == pytest.approx(expected_obj_val)
+        if obj_val >= 0:
+            assert np.all(requests.sum(axis=1) == request_rates)
+            assert np.all(requests.sum(axis=0) <= servers * 60)
+            assert requests[0, 2] == 0 and requests[2, 0] == 0
+
+        expected, expected_obj_val = sched_reqs_latency_greedy(
+            request_rates, capacities, latencies, carbon_intensities, servers
+        )
+        requests, obj_val = sched_reqs_latency_transport(
+            request_rates, capacities, latencies, carbon_intensities, servers
+        )
+        assert obj_val == pytest.approx(expected_obj_val)
+
+
+def test_transport_infeasible(latencies):
+    requests, obj_val = sched_reqs_carbon_transport([20, 0, 0], [5, 5, 5], latencies, [1, 1, 1], [1, 1, 1], 50)
+    assert obj_val < 0
+    assert np.all(requests == 0)
+
+
+def test_feasible_pairs():
+    latencies = [[5, 20, 40], [20, 5, 30], [40, 30, 5]]
+    assert feasible_pairs(latencies, 25) == [(0, 0), (0, 1), (1, 0), (1, 1), (2, 2)]
+    assert len(feasible_pairs(latencies)) == 9
+    assert feasible_pairs([[5, 30], [30, 50]], 25) == [(0, 0)]
+
+
+def test_unreachable_region():
+    latencies = [[5, 30], [30, 50]]
+    # Region 1 has no destination within 25, which only matters once it has requests
+    requests, obj_val = sched_reqs_carbon_greedy([10, 0], [100, 100], latencies, [10, 20], [1, 1], 25)
+    assert requests.tolist() == [[10, 0], [0, 0]] and obj_val == 100
+    _, _, obj_val = place_servers_carbon_greedy([10, 0], [100, 100], latencies, [10, 20], 2, 25)
+    assert obj_val == 100
+
+    # Instead of an infeasible model, the region is named
+    with pytest.raises(ValueError, match="of region 1$"):
+        sched_reqs_carbon_greedy([10, 5], [100, 100], latencies, [10, 20], [1, 1], 25)
+    with pytest.raises(ValueError, match="of C$"):
+        check_reachable(latencies, 25, [[0, 0], [0, 5]], ["A", "C"])
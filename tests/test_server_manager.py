@@ -3,6 +3,7 @@ from scheduler.server import ServerManager
 from scheduler.region import Region
 from scheduler.parser import parse_arguments
 
+import numpy as np
 import pandas as pd
 
 from scheduler.util import get_regions
@@ -54,3 +55,106 @@ def test_manager():
 
     # Assert each server has a load of an task = 1
     assert server_manager.utilization_left_regions() == [conf.server_capacity - 1 for _ in range(4)]
+
+
+def test_manager_arrays():
+    conf = parse_arguments(["-c", "10"])
+    region_names = get_regions(conf)
+    regions = [Region(name=region, location=0, carbon_intensity=10, requests_per_hour=None) for region in region_names]
+    server_manager = ServerManager(conf, regions=regions)
+
+    server_manager.move([3, 0, 2, 1])
+    assert len(server_manager) == 6
+    assert server_manager.capacity_per_region().tolist() == [30, 0, 20, 10]
+
+    # Servers of a region are filled in order
+    server_manager.send(np.array([[15, 0, 0, 0], [0, 0, 5, 0], [0, 0, 0, 0], [0, 0, 0, 0]]))
+    assert server_manager.utilization_left_regions() == [15, 0, 15, 10]
+    assert [s.utilization for s in server_manager.servers if s.region.name == region_names[0]] == [10, 5, 0]
+
+    # The first servers of a region are removed, the utilization of the others is kept
+    server_manager.move([1, 2, 2, 0])
+    assert server_manager.servers_per_region() == [1, 2, 2, 0]
+    assert server_manager.utilization_left_regions() == [10, 20, 15, 0]
+
+    server_manager.reset()
+    assert server_manager.utilization_left_regions() == [10, 20, 20, 0]
+
+
+def test_manager_move_many_servers():
+    conf = parse_arguments([])
+    region_names = get_regions(conf)
+    regions = [Region(name=region, location=0, carbon_intensity=10, requests_per_hour=None) for region in region_names]
+    server_manager = ServerManager(conf, regions=regions)
+
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        servers_per_region = rng.integers(0, 25_000, size=len(region_names))
+        server_manager.move(servers_per_region)
+        assert server_manager.servers_per_region() == servers_per_region.tolist()
+
+
+def test_manager_send_drops():
+    conf = parse_arguments(["-c", "10"])
+    region_names = get_regions(conf)
+    regions = [Region(name=region, location=0, carbon_intensity=10, requests_per_hour=None) for region in region_names]
+    server_manager = ServerManager(conf, regions=regions)
+    server_manager.move([2, 1, 0, 3])
+
+    requests_per_region = np.array([[5, 4, 1, 10], [20, 0, 0, 20], [0, 3, 0, 0], [0, 0, 0, 0]])
+    served, dropped = server_manager.send(requests_per_region)
+
+    assert dropped.tolist() == [5, 0, 1, 0]
+    assert served.tolist() == [20, 7, 0, 30]
+    assert server_manager.utilization_left_regions() == [0, 3, 0, 0]
+    assert [s.utilization for s in server_manager.servers] == [10, 10, 7, 10, 10, 10]
+
+    # Same distribution as the server-by-server fill
+    for i, region in enumerate(region_names):
+        server_manager.reset()
+        servers = [s for s in server_manager.servers if s.region.name == region]
+        loads = server_manager.build_server_loads(servers, int(requests_per_region[:, i].sum()))
+        expected = server_manager.build_loads(requests_per_region.sum(axis=0))
+        assert [load for _, load in loads] == expected[server_manager.server_regions == i].tolist()
+
+    # A server handles its capacity divided by the number of intervals per hour
+    server_manager.reset()
+    served, dropped = server_manager.send(requests_per_region, request_update_interval=2)
+    assert served.tolist() == [10, 5, 0, 15]
+    assert dropped.tolist() == [15, 2, 1, 15]
+
+
+def test_trace_matrices():
+    conf = parse_arguments([])
+    region_names = get_regions(conf)
+    regions = [
+        Region(
+            name=region,
+            location=0,
+            carbon_intensity=pd.Series([10.0 * i, 20.0 * i]),
+            requests_per_hour=pd.Series([i, 2 * i]),
+        )
+        for i, region in enumerate(region_names)
+    ]
+    server_manager = ServerManager(conf, regions=regions)
+
+    assert isinstance(regions[1].carbon_intensity, np.ndarray)
+    assert regions[1].get_requests_per_interval(1) == 2
+    assert server_manager.carbon_intensities[:, 1].tolist() == [0, 20, 40, 60]
+    assert server_manager.request_rates.shape == (len(region_names), 2)
+    with pytest.raises(ValueError):
+        server_manager.request_rates[0, 0] = 1
+
+
+def test_manager_other_regions():
+    conf = parse_arguments([])
+    # More regions than the region kind of conf has
+    regions = [Region(f"region_{i}", (0, 0), 0, None) for i in range(10)]
+    server_manager = ServerManager(conf, regions=regions)
+    assert server_manager.capacity_model.capacities.shape == (10, 1)
+
+    server_manager.move([1] * 10)
+    assert server_manager.servers_per_region() == [1] * 10
+    plan = server_manager.move([0] * 9 + [10])
+    assert plan.n_moved == 9
+    assert server_manager.capacity_per_region().tolist() == [0] * 9 + [10 * conf.server_capacity]
@@ -0,0 +1,57 @@
+import pytest
+import pandas as pd
+
+from scheduler.plot import Plot
+from scheduler.sink import StreamingPlot
+from scheduler.parser import parse_arguments
+from tests.test_plot import add_rows
+
+
+def test_streaming_csv(tmp_path):
+    conf = parse_arguments(["-t", "1", "--stream-every", "4"])
+    plot = Plot(conf)
+    add_rows(plot, conf, 10)
+
+    path = tmp_path / "results.csv"
+    streaming = StreamingPlot(conf, str(path))
+    add_rows(streaming, conf, 10)
+    assert streaming.data.shape == (4, len(streaming.columns))
+
+    # Two batches are on disk, the rest is still buffered
+    assert len(pd.read_csv(path)) == 8
+    pd.testing.assert_frame_equal(streaming.build_df(), plot.build_df())
+    assert (streaming.get(3) == plot.get(3)).all()
+    assert (streaming.get(9) == plot.get(9)).all()
+
+    streaming.close()
+    pd.testing.assert_frame_equal(pd.read_csv(path), plot.build_df())
+
+
+def test_streaming_parquet(tmp_path):
+    pytest.importorskip("pyarrow")
+    conf = parse_arguments(["-t", "1", "--stream-every", "4", "--stream-format", "parquet"])
+    plot = Plot(conf)
+    add_rows(plot, conf, 10)
+
+    path = tmp_path / "results.parquet"
+    streaming = StreamingPlot(conf, str(path))
+    add_rows(streaming, conf, 10)
+    streaming.close()
+
+    assert len(list(path.iterdir())) == 3
+    pd.testing.assert_frame_equal(pd.read_parquet(path), plot.build_df())
+
+
+def test_streaming_default_interval(tmp_path):
+    conf = parse_arguments(["-t", "1", "-r", "20"])
+    path = tmp_path / "results.csv"
+    streaming = StreamingPlot(conf, str(path))
+    # Flushed once per hour of intervals without --stream-every, as soon as the hour is complete
+    assert streaming.chunk_rows == 3
+    add_rows(streaming, conf, 2)
+    assert not path.exists()
+    add_rows(streaming, conf, 1)
+    assert len(pd.read_csv(path)) == 3
+
+    with pytest.raises(AssertionError, match="at least 1 interval"):
+        StreamingPlot(conf, str(path), every=0)
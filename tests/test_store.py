@@ -0,0 +1,66 @@
+import os
+import pytest
+import numpy as np
+import pandas as pd
+
+from scheduler.store import REQUESTS_COLUMN, Trace, convert, find, get_trace, load_trace, select, store_paths
+
+
+def test_load_trace(tmp_path):
+    path = tmp_path / "trace.csv"
+    pd.DataFrame({"timestamp": [0, 3600, 3600, 7200], "requests": [1, 2, 3, 4]}).to_csv(path, index=False)
+    store_dir = tmp_path / "store"
+
+    timestamps, values = load_trace(str(path), "requests", store_dir=str(store_dir))
+    assert timestamps.dtype == np.int64 and values.dtype == np.float64
+    assert values.tolist() == [1, 2, 3, 4]
+    assert all(os.path.exists(p) for p in store_paths(str(path), "requests", store_dir=str(store_dir)))
+
+    # Duplicated timestamps resolve to the first row, like the CSV lookup did
+    assert find(timestamps, 3600) == 1
+    assert find(timestamps, 1800) is None
+    assert find(timestamps, 10800) is None
+
+    ts, vs = select(timestamps, values, 3600, 7200)
+    assert ts.tolist() == [3600, 3600] and vs.tolist() == [2, 3]
+
+
+def test_trace_window():
+    trace = Trace(np.arange(0, 10 * 3600, 3600), np.arange(10.0), name="test data")
+
+    window = trace.window(3 * 3600, 4, offset=-1)
+    assert window.tolist() == [2, 3, 4, 5]
+    assert np.shares_memory(window, trace.values)
+
+    with pytest.raises(AssertionError, match="does not exist in test data"):
+        trace.window(1800, 4)
+    with pytest.raises(AssertionError, match="overflows the test data"):
+        trace.window(6 * 3600, 4)
+
+
+def test_trace_loaded_once():
+    path = "api/requests.csv"
+    assert get_trace(path, REQUESTS_COLUMN) is get_trace(path, REQUESTS_COLUMN)
+
+
+def test_convert_atomic(tmp_path, monkeypatch):
+    path = tmp_path / "trace.csv"
+    pd.DataFrame({"timestamp": [0, 3600], "requests": [1, 2]}).to_csv(path, index=False)
+    store_dir = tmp_path / "store"
+    convert(str(path), "requests", store_dir=str(store_dir))
+    convert(str(path), "requests", store_dir=str(store_dir))
+    assert sorted(os.listdir(store_dir)) == sorted(
+        os.path.basename(p) for p in store_paths(str(path), "requests", store_dir=str(store_dir))
+    )
+
+    # A conversion that fails halfway leaves neither a partial file nor a temporary one
+    other = tmp_path / "other.csv"
+    pd.DataFrame({"timestamp": [0], "requests": [1]}).to_csv(other, index=False)
+
+    def fail(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(np, "save", fail)
+    with pytest.raises(OSError):
+        convert(str(other), "requests", store_dir=str(store_dir))
+    assert len(os.listdir(store_dir)) == 2
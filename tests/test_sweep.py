@@ -0,0 +1,61 @@
+import pytest
+
+from scheduler.sweep import build_runs, load_grid, sweep
+from scheduler.parser import parse_arguments
+from scheduler.util import saved_path
+
+
+def test_build_runs():
+    grid = load_grid('{"latency": [20, 50], "type_scheduler": "carbon"}')
+    assert grid == {"latency": [20, 50], "type_scheduler": ["carbon"]}
+
+    runs = build_runs(grid, ["-l", "10", "-t", "2"])
+    assert len(runs) == 2
+    confs = [parse_arguments(argv) for argv in runs]
+    assert [conf.latency for conf in confs] == [20, 50]
+    assert all(conf.timesteps == 2 and conf.no_plot for conf in confs)
+
+
+def test_build_runs_flags():
+    runs = build_runs({"interpolate": [True, False]}, ["-t", "2"])
+    assert [parse_arguments(argv).interpolate for argv in runs] == [True, False]
+    assert "True" not in runs[0] and "--interpolate" not in runs[1]
+
+
+def test_sweep_invalid_arguments():
+    with pytest.raises(SystemExit):
+        sweep({"latency": ["fast"]}, ["-t", "1"], workers=2)
+
+
+def test_sweep_serial():
+    base_argv = ["-p", "europe", "-t", "1", "-r", "30", "-d", "2021-10-22", "-m", "60"]
+    df = sweep({"type_scheduler": ["carbon", "latency"], "max_servers": [1, 60]}, base_argv, workers=1)
+
+    assert len(df) == 4
+    assert df.loc[df["max_servers"] == 1, "error"].str.len().gt(0).all()
+    ok = df[df["error"] == ""]
+    assert len(ok) == 2
+    carbon = ok.loc[ok["type_scheduler"] == "carbon", "total_carbon_emissions"].item()
+    latency = ok.loc[ok["type_scheduler"] == "latency", "total_carbon_emissions"].item()
+    assert carbon <= latency
+    # Cache lookups are reported per run, not for the whole worker
+    assert (df["cache_hits"] + df["cache_disk_hits"] + df["cache_misses"] > 0).all()
+
+
+def test_rows_and_saved_names_per_grid_point():
+    grid = {"solver": ["cbc", "transport"], "request-update-interval": [30, 60]}
+    runs = build_runs(grid, ["-t", "1"])
+    labels = [parse_arguments(argv).label for argv in runs]
+    assert labels[0] == "solver_cbc_request_update_interval_30"
+    # Every grid point is saved under its own name
+    assert len({saved_path(parse_arguments(argv)) for argv in runs}) == 4
+
+    base_argv = ["-p", "europe", "-t", "1", "-d", "2021-10-22", "-m", "60"]
+    df = sweep(grid, base_argv, workers=1)
+    assert (df["error"] == "").all()
+    assert sorted(zip(df["solver"], df["request_update_interval"])) == [
+        ("cbc", 30),
+        ("cbc", 60),
+        ("transport", 30),
+        ("transport", 60),
+    ]